@@ -1,10 +1,14 @@
 from ..database import async_session_factory
-from ..core.config import settings
-from pydantic import SecretStr
+from ..core.llm import DEFAULT_MODEL
+from ..services.llm_dispatcher import LLMDispatcher, create_llm_dispatcher
+from ..services.llm_cache import LLMResponseCache
+from ..services.progress import ProgressBroker
+from ..services.answer_library import LibraryMatch
+from typing import Optional, Tuple
+import json
 import logging
-from openai import AsyncAzureOpenAI
 from ..models import QuestionStatus
-from ..crud import questions, llm_responses
+from ..crud import llm_responses
 
 logger = logging.getLogger("rfpai.agents.data_contextualization_agent")
 
@@ -14,53 +18,133 @@ class DataContextualizationAgent:
     Contextualizes and forms an answer to the provided question.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        llm: Optional[LLMDispatcher] = None,
+        cache: Optional[LLMResponseCache] = None,
+        progress: Optional[ProgressBroker] = None,
+    ):
         """
         Initializes an instance of the agent.
+
+        Args:
+            llm (Optional[LLMDispatcher]): The dispatcher to send LLM calls through.
+                A private one is created if not given.
+            cache (Optional[LLMResponseCache]): Completion cache consulted before
+                calling the LLM. Nothing is cached if not given.
+            progress (Optional[ProgressBroker]): Broker to report question
+                progress to. Nothing is reported if not given.
         """
-        key = SecretStr(settings.AZURE_OPENAI_KEY)
-        if not key:
-            raise ValueError("Azure AI Foundry key not found.")
-
-        endpoint = SecretStr(settings.AZURE_OPENAI_ENDPOINT)
-        if not endpoint:
-            raise ValueError("Azure AI Foundry endpoint not found.")
-
-        self._model = "gpt-4o-mini"
-        self._client = AsyncAzureOpenAI(
-            api_key=key.get_secret_value(),
-            api_version="2025-01-01-preview",
-            azure_endpoint=endpoint.get_secret_value(),
-        )
+        self._model = DEFAULT_MODEL
+        self._llm = llm or create_llm_dispatcher()
+        self._cache = cache
+        self._progress = progress
         logger.info("Data Contextualization agent initialized.")
 
-    async def process(self, question_id: int):
+    async def generate_final_answer(
+        self, question: str, document: str
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Answers a question from its knowledge context, already in the tone and
+        format rewrite_with_mphasis would give it.
+
+        Args:
+            question (str): The question to answer.
+            document (str): Knowledge context retrieved for the question.
+
+        Returns:
+            Tuple[str, Optional[int]]: The answer and the tokens used, None if
+            the answer came from the cache.
+        """
+        prompt = f"""
+        You are writing answers to RFP questions on behalf of Mphasis. Answer the question using the document as a reference;
+        if the answer is not found in it use your knowledge to answer it. Do not specify that you did not find the answer in the document.
+        Do not use any markdown. Use a minimum of 4 points and a maximum of 5 points with 3 lines each.
+        If the question is like "Your way of xyz", or "How would you handle it" write it to sound like Mphasis is writing it.
+        Do not do this for definitions etc, make sure the answer is contextualized and makes sense with the question.
+
+        Respond with a JSON object of the form {{"answer": "<the answer>"}}.
+
+        Document:
+        {document}
+
+        Question: \"\"\"{question}\"\"\"
+        """
+        temperature = 0.3
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._cache.make_key(self._model, temperature, prompt)
+            cached = await self._cache.aget(cache_key)
+            if cached is not None:
+                return cached, None
+
+        response = await self._llm.complete(
+            model=self._model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            response_format={"type": "json_object"},
+        )
+        content = response.choices[0].message.content.strip()
+        try:
+            content = str(json.loads(content)["answer"]).strip()
+        except (ValueError, KeyError, TypeError):
+            logger.warning("LLM: Single pass answer was not valid JSON, using it as is.")
+        content = content.replace("\n\n", "\n")
+        if cache_key is not None:
+            await self._cache.aput(cache_key, content)
+        usage = getattr(response, "usage", None)
+        return content, usage.total_tokens if usage is not None else None
+
+    async def process_library_match(
+        self, question_id: int, question_text: str, match: LibraryMatch
+    ):
         """
-        Contextualizes and forms an answer to the question provided.
+        Answers a question from an SME-approved answer to a similar question.
+
+        Reusable matches are stored verbatim; weaker matches are used as the
+        draft for a single contextualization call, skipping data retrieval.
+        No database connection is held during that call.
+
+        Args:
+            question_id (int): The question to answer.
+            question_text (str): Text of the question.
+            match (LibraryMatch): The approved answer found in the answer library.
         """
-        logger.info("Starting data contextualization for question_id: %s", question_id)
+        logger.info(
+            "Answering question_id: %s from evaluation %s (similarity %.2f)",
+            question_id,
+            match.eval_id,
+            match.similarity,
+        )
+        if match.reusable:
+            response, status = match.answer, "library_reuse"
+        else:
+            response = await self.rewrite_with_mphasis(question_text, match.answer)
+            status = "library_adapted"
+            self._report(question_id, "contextualized")
         async with async_session_factory() as session:
-            question = await questions.get_question(session, question_id)
-            if question is None:
-                logger.error(
-                    "Could not find question with question_id: %s", question_id
-                )
-                return
-            response = await self.rewrite_with_mphasis(
-                question.question_text, question.question_context
-            )
             db_response = await llm_responses.create_llm_response(
                 session,
                 question_id,
                 response,
-                model_id=self._model,
-                retrieved_context=question.question_context,
-            )
-            logger.info(
-                "Data contextualization completed for question_id: %s with llm_response id: %s",
-                question_id,
-                db_response.response_id,
+                model_id="answer_library" if match.reusable else self._model,
+                retrieved_context=(
+                    f"Approved answer from evaluation {match.eval_id} "
+                    f"(similarity {match.similarity:.2f}) to: {match.question_text}"
+                ),
+                status=status,
+                question_status=QuestionStatus.PENDING_REVIEW,
             )
+        self._report(question_id, "persisted")
+        logger.info(
+            "Answered question_id: %s from the answer library with llm_response id: %s",
+            question_id,
+            db_response.response_id,
+        )
+
+    def _report(self, question_id: int, stage: str) -> None:
+        if self._progress is not None:
+            self._progress.question_event(question_id, stage)
 
     async def rewrite_with_mphasis(self, question, answer):
         prompt = f"""
@@ -75,11 +159,21 @@ class DataContextualizationAgent:
 
         Rewritten answer:
         """
-        response = await self._client.chat.completions.create(
+        temperature = 0.4
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._cache.make_key(self._model, temperature, prompt)
+            cached = await self._cache.aget(cache_key)
+            if cached is not None:
+                return cached
+
+        response = await self._llm.complete(
             model=self._model,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.4,
+            temperature=temperature,
         )
         content = response.choices[0].message.content.strip()
         content = content.replace("\n\n", "\n")
+        if cache_key is not None:
+            await self._cache.aput(cache_key, content)
         return content
@@ -1,82 +1,131 @@
-from sqlalchemy.orm import Session
+import asyncio
+import json
+import time
+from openai import BadRequestError
 from ..database import async_session_factory
-import os
-import fitz
-from typing import Dict, List
-from pptx import Presentation
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from ..core.config import settings
-from pydantic import SecretStr
+from ..core.llm import DEFAULT_MODEL
+from ..services.llm_dispatcher import LLMDispatcher, create_llm_dispatcher
+from ..services.llm_cache import LLMResponseCache
+from ..services.progress import ProgressBroker
+from ..knowledge.store import KnowledgeStore, load_knowledge_store
 import logging
-from openai import AsyncAzureOpenAI
 from ..models import QuestionStatus
-from ..crud import questions
+from ..crud import llm_responses
 
 logger = logging.getLogger("rfpai.agents.data_retrieval_agent")
 
+# Completion tokens reserved per answer in a batched request.
+BATCH_ANSWER_TOKENS = 400
+
+# Structured output of a batched request: one answer per question id.
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "rfp_answers",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "answers": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            "answer": {"type": "string"},
+                        },
+                        "required": ["id", "answer"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["answers"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# (question_id, question_text, knowledge context)
+BatchItem = Tuple[int, str, str]
+
+# Answers one question from its knowledge context: (answer, tokens used).
+SingleAnswer = Callable[[str, str], Awaitable[Tuple[str, Optional[int]]]]
+
 
 class DataRetrievalAgent:
     """
     Agent responsible for retrieving relevant data via RAG and KM.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        knowledge: Optional[KnowledgeStore] = None,
+        llm: Optional[LLMDispatcher] = None,
+        cache: Optional[LLMResponseCache] = None,
+        progress: Optional[ProgressBroker] = None,
+    ):
         """
         Initializes an instance of the agent.
+
+        Args:
+            knowledge (Optional[KnowledgeStore]): A loaded knowledge store to share.
+                Loaded from the knowledge folder if not given.
+            llm (Optional[LLMDispatcher]): The dispatcher to send LLM calls through.
+                A private one is created if not given.
+            cache (Optional[LLMResponseCache]): Completion cache consulted before
+                calling the LLM. Nothing is cached if not given.
+            progress (Optional[ProgressBroker]): Broker to report question
+                progress to. Nothing is reported if not given.
         """
-        self.knowledge = self._get_context()
-        key = SecretStr(settings.AZURE_OPENAI_KEY)
-        if not key:
-            raise ValueError("Azure AI Foundry key not found.")
-
-        endpoint = SecretStr(settings.AZURE_OPENAI_ENDPOINT)
-        if not endpoint:
-            raise ValueError("Azure AI Foundry endpoint not found.")
-
-        self._model = "gpt-4o-mini"
-        self._client = AsyncAzureOpenAI(
-            api_key=key.get_secret_value(),
-            api_version="2025-01-01-preview",
-            azure_endpoint=endpoint.get_secret_value(),
-        )
+        self.knowledge = knowledge or load_knowledge_store()
+        self._model = DEFAULT_MODEL
+        self._llm = llm or create_llm_dispatcher()
+        self._cache = cache
+        self._progress = progress
         logger.info("Data Retrieval agent initialized.")
 
-    async def process(self, question_id: int):
+    async def retrieve_contexts(self, question_texts: List[str]) -> List[str]:
         """
-        Retrieves data and updates the context column of the stored question.
+        Retrieves the knowledge context of many questions in one batched pass.
 
-        NOTE: This function will draft a complete response and save it in context. Need to improve the RAG system first.
+        Args:
+            question_texts (List[str]): The questions, e.g. every question of an RFP.
+
+        Returns:
+            List[str]: The prompt-ready context of each question, in the same order.
         """
-        logger.info("Starting data retrieval for question_id: %s", question_id)
-        async with async_session_factory() as session:
-            question = await questions.get_question(session, question_id)
-            if question is None:
-                logger.error(
-                    "Could not find question with question_id: %s", question_id
-                )
-                return
-            response = await self.generate_response(question.question_text)
-            await questions.update_question_context(
-                session, question_id, new_context=response["Answer"]
-            )
-            logger.info("Data retrieval completed for question_id: %s", question_id)
+        return await asyncio.to_thread(
+            self.knowledge.get_contexts, question_texts, settings.RETRIEVAL_TOP_K
+        )
 
-    async def generate_response(self, question: str) -> Dict:
+    async def generate_response(
+        self, question: str, document: Optional[str] = None
+    ) -> Dict:
         """
-        Generate a response to a given question.
+        Generate a response to a given question, grounded in the knowledge chunks
+        most relevant to it.
 
         Args:
             question: The question we need to generate a response for.
+            document: Pre-retrieved knowledge context. Retrieved if not given.
 
         Returns:
             Dictionary in the format {"Answer": response}
         """
+        if document is None:
+            # Embedding the query may be CPU or network bound, so keep it off the event loop.
+            document = await asyncio.to_thread(
+                self.knowledge.get_context, question, settings.RETRIEVAL_TOP_K
+            )
         prompt = f"""
         You are an assistant who generates relevant answers for users. Answer the following question in around 5 points with around 3 lines each.
         Do not use any markdown. The document is provided as a reference, if the answer is not found in it use your knowledge to answer it.
         Do not specify that you did not find the answer in the document. Simply provide the answer.
 
         Document:
-        {self.knowledge}
+        {document}
 
         Question: {question}
 
@@ -86,109 +135,202 @@ class DataRetrievalAgent:
         Answer:
         """
 
+        temperature = 0.2
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._cache.make_key(self._model, temperature, prompt)
+            cached = await self._cache.aget(cache_key)
+            if cached is not None:
+                logger.info("LLM: Cache hit for question: %s", question)
+                return {"Answer": cached}
+
         logger.info("LLM: Generating response for question: %s", question)
-        response = await self._client.chat.completions.create(
+        response = await self._llm.complete(
             model=self._model,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
+            temperature=temperature,
         )
         content = response.choices[0].message.content.strip()
         logger.info("LLM: Generated response for question: %s", question)
         content = content.replace("\n\n", "\n")
+        if cache_key is not None:
+            await self._cache.aput(cache_key, content)
         return {"Answer": content}
 
-    def _get_context(self):
+    async def process_batch(
+        self, items: List[BatchItem], answer_singly: Optional[SingleAnswer] = None
+    ):
         """
-        **WILL NOT WORK WITH MORE THAN A FEW KNOWLEDGE FILES**
-        Retrieves the context of the question.
+        Answers many questions with batched completions and stores the answers
+        as LLM responses with status "batched". The batch prompt carries the
+        Mphasis contextualization instructions, so the answers are final.
 
-        NOTE: This was implemented in a few hours as a temporary fix. NOT SCALABLE + WILL CRASH
-        Should be prioritized to setup a vector store as a better temporary measure or register the app on Azure
-        so that it can access Copilot/KM/Sharepoint files w/ Azure AI Search. Currently it just reads everything
-        in /knowledge and returns all the text.
+        Args:
+            items (List[BatchItem]): (question_id, question_text, context) of
+                every question to answer.
+            answer_singly (Optional[SingleAnswer]): Answers a question left out of
+                its batch, see generate_responses.
         """
-        files = self.get_all_supported_files("knowledge/")
-        context = ""
-        for file in files:
-            tempcontent = self._load_file_text(file)
-
-            if not tempcontent or "[ERROR]" in tempcontent:
-                logger.warning(f"⚠️ Could not load content from: {file}")
-                continue
-            logger.info(f"Extracted content from: {file}")
-            context += tempcontent + "\n"
-        return context
-
-    def _load_file_text(self, file_path):
+        logger.info("Starting batched generation for %d questions", len(items))
+        start = time.perf_counter()
+        answers = await self.generate_responses(items, answer_singly)
+        generation_time_ms = int((time.perf_counter() - start) * 1000)
+        for question_id, _, _ in items:
+            self._report(question_id, "contextualized")
+        async with async_session_factory() as session:
+            await llm_responses.create_llm_responses(
+                session,
+                [
+                    {
+                        "question_id": question_id,
+                        "response": answers[question_id],
+                        "model_id": self._model,
+                        "retrieved_context": context,
+                        "generation_time_ms": generation_time_ms,
+                        "status": "batched",
+                    }
+                    for question_id, _, context in items
+                ],
+                question_status=QuestionStatus.PENDING_REVIEW,
+            )
+        for question_id, _, _ in items:
+            self._report(question_id, "persisted")
+        logger.info("Batched generation completed for %d questions", len(items))
+
+    async def generate_responses(
+        self, items: List[BatchItem], answer_singly: Optional[SingleAnswer] = None
+    ) -> Dict[int, str]:
         """
-        **WILL NOT WORK WITH MORE THAN A FEW KNOWLEDGE FILES**
-        Loads the text from the file.
+        Answers many questions in their final, contextualized form.
+
+        Questions are packed into as few completions as the token budget allows
+        (see plan_batches), each asking for a JSON object with one answer per
+        question id. Questions whose answer is missing from a batch, or whose
+        batch could not be parsed, are retried one at a time with answer_singly.
 
-        NOTE: This was implemented in a few hours as a temporary fix. NOT SCALABLE + WILL CRASH
-        Should be prioritized to setup a vector store as a better temporary measure or register the app on Azure
-        so that it can access Copilot/KM/Sharepoint files w/ Azure AI Search
         Args:
-            file_path (str): The path to the file.
+            items (List[BatchItem]): (question_id, question_text, context) triples.
+            answer_singly (Optional[SingleAnswer]): Answers one question from its
+                context, e.g. DataContextualizationAgent.generate_final_answer.
+                Defaults to generate_response, whose answer is only a draft.
 
         Returns:
-            str: The text from the file.
+            Dict[int, str]: The answer to every question, by question_id.
         """
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == ".pdf":
-            return self._load_pdf_text(file_path)
-        elif ext == ".txt":
-            return self._load_txt_text(file_path)
-        elif ext in [".ppt", ".pptx"]:
-            return self._load_pptx_text(file_path)
-        return None
-
-    def get_all_supported_files(
-        self, root_folder, extensions=[".pdf", ".txt", ".ppt", ".pptx"]
-    ):
+        batches = self.plan_batches(items)
+        logger.info(
+            "LLM: Answering %d questions in %d batched requests", len(items), len(batches)
+        )
+        answers: Dict[int, str] = {}
+        for batch_answers in await asyncio.gather(
+            *(self._generate_batch(batch) for batch in batches)
+        ):
+            answers.update(batch_answers)
+
+        missing = [item for item in items if item[0] not in answers]
+        if missing:
+            logger.warning(
+                "LLM: %d answers missing from batched responses, retrying them singly",
+                len(missing),
+            )
+            answer_singly = answer_singly or self._draft_answer
+            retried = await asyncio.gather(
+                *(answer_singly(text, context) for _, text, context in missing)
+            )
+            for (question_id, _, _), (answer, _) in zip(missing, retried):
+                answers[question_id] = answer
+        return answers
+
+    def plan_batches(self, items: List[BatchItem]) -> List[List[BatchItem]]:
         """
-        **WILL NOT WORK WITH MORE THAN A FEW KNOWLEDGE FILES**
-        Gets all the files in the root folder and its subfolders with the given extensions.
+        Greedily packs questions into batches that fit the per-request token
+        budget: LLM_BATCH_MAX_TOKENS, further reduced so that LLM_MAX_CONCURRENCY
+        requests fit in one minute of LLM_TOKENS_PER_MINUTE. Questions with
+        large contexts therefore get small batches, short ones large batches.
+        """
+        budget = min(
+            settings.LLM_BATCH_MAX_TOKENS,
+            settings.LLM_TOKENS_PER_MINUTE // max(1, settings.LLM_MAX_CONCURRENCY),
+        )
+        batches: List[List[BatchItem]] = []
+        batch: List[BatchItem] = []
+        used = 0
+        for item in items:
+            cost = (len(item[1]) + len(item[2])) // 4 + BATCH_ANSWER_TOKENS
+            if batch and (
+                used + cost > budget or len(batch) >= settings.LLM_BATCH_MAX_QUESTIONS
+            ):
+                batches.append(batch)
+                batch, used = [], 0
+            batch.append(item)
+            used += cost
+        if batch:
+            batches.append(batch)
+        return batches
 
-        NOTE: This was implemented in a few hours as a temporary fix. NOT SCALABLE + WILL CRASH
-        Should be prioritized to setup a vector store as a better temporary measure or register the app on Azure
-        so that it can access Copilot/KM/Sharepoint files w/ Azure AI Search
+    async def _generate_batch(self, batch: List[BatchItem]) -> Dict[int, str]:
+        entries = "\n".join(
+            json.dumps({"id": str(question_id), "question": text, "document": context})
+            for question_id, text, context in batch
+        )
+        # The contextualization instructions of generate_final_answer, so batched
+        # answers read like those of the other modes.
+        prompt = f"""
+        You are writing answers to RFP questions on behalf of Mphasis. Answer every question below using its own document as a reference;
+        if the answer is not found in it use your knowledge to answer it. Do not specify that you did not find the answer in the document.
+        Do not use any markdown inside the answers. Use a minimum of 4 points and a maximum of 5 points with 3 lines each.
+        If a question is like "Your way of xyz", or "How would you handle it" write its answer to sound like Mphasis is writing it.
+        Do not do this for definitions etc, make sure each answer is contextualized and makes sense with its question.
 
-        Args:
-            root_folder (str): The root folder to search for files.
-            extensions (list): The extensions of the files to search for.
+        Respond with a JSON object {{"answers": [{{"id": "<question id>", "answer": "<answer>"}}]}} containing exactly one
+        entry for each question id.
 
-        Returns:
-            List[str]: A list of file paths that match the given extensions.
+        Questions:
+        {entries}
         """
-        matched_files = []
-        for root, dirs, files in os.walk(root_folder):
-            for file in files:
-                if os.path.splitext(file)[1].lower() in extensions:
-                    matched_files.append(os.path.join(root, file))
-        return matched_files
-
-    def _load_pdf_text(self, file_path):
-        try:
-            doc = fitz.open(file_path)
-            return "\n".join(page.get_text() for page in doc)
-        except Exception as e:
-            return f"[PDF READ ERROR]: {e}"
 
-    def _load_txt_text(self, file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read()
-        except Exception as e:
-            return f"[TEXT READ ERROR]: {e}"
+        temperature = 0.3
+        cache_key = None
+        content = None
+        if self._cache is not None:
+            cache_key = self._cache.make_key(self._model, temperature, prompt)
+            content = await self._cache.aget(cache_key)
+
+        if content is None:
+            try:
+                response = await self._llm.complete(
+                    model=self._model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    max_tokens=BATCH_ANSWER_TOKENS * len(batch) + 100,
+                    response_format=BATCH_RESPONSE_FORMAT,
+                )
+            except BadRequestError as e:
+                logger.warning("LLM: Batched request rejected, answering singly: %s", e)
+                return {}
+            content = response.choices[0].message.content
 
-    def _load_pptx_text(self, file_path):
+        ids = {str(question_id): question_id for question_id, _, _ in batch}
+        answers: Dict[int, str] = {}
         try:
-            prs = Presentation(file_path)
-            text = ""
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        text += shape.text + "\n"
-            return text
-        except Exception as e:
-            return f"[PPT READ ERROR]: {e}"
+            for entry in json.loads(content)["answers"]:
+                question_id = ids.get(str(entry["id"]))
+                answer = str(entry["answer"]).strip()
+                if question_id is not None and answer:
+                    answers[question_id] = answer.replace("\n\n", "\n")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("LLM: Could not parse batched response: %s", e)
+            return {}
+        if cache_key is not None and len(answers) == len(batch):
+            await self._cache.aput(cache_key, content)
+        return answers
+
+    async def _draft_answer(
+        self, question: str, document: str
+    ) -> Tuple[str, Optional[int]]:
+        response = await self.generate_response(question, document)
+        return response["Answer"], None
+
+    def _report(self, question_id: int, stage: str) -> None:
+        if self._progress is not None:
+            self._progress.question_event(question_id, stage)
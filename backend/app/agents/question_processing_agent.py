@@ -52,11 +52,13 @@ class QuestionProcessingAgent:
                 return
 
             try:
-                for question in question_list:
-                    await questions.create_question(session, rfp_id, question)
-                    logger.info(
-                        "Successfully extracted question with text: %s", question
-                    )
+                # One multi-row insert, so a failure leaves no partial question set.
+                await questions.create_questions(session, rfp_id, question_list)
+                logger.info(
+                    "Successfully extracted %d questions for rfp_id: %s",
+                    len(question_list),
+                    rfp_id,
+                )
             except Exception as e:
                 logger.error(
                     "Failed to save questions for rfp_id %s: %s",
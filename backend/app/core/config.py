@@ -5,6 +5,106 @@ class Settings(BaseSettings):
     AZURE_OPENAI_ENDPOINT: str
     AZURE_OPENAI_KEY: str
     AZURE_SQL_CONNECTION_STRING: str
+
+    # Knowledge retrieval
+    KNOWLEDGE_DIR: str = "knowledge/"
+    KNOWLEDGE_INDEX_DIR: str = "knowledge_index/"
+    KNOWLEDGE_CHUNK_SIZE: int = 200
+    KNOWLEDGE_CHUNK_OVERLAP: int = 40
+    RETRIEVAL_TOP_K: int = 5
+    # Processes used to extract new/changed knowledge files; 0 uses every core
+    KNOWLEDGE_EXTRACTION_WORKERS: int = 0
+    # "lexical" (BM25), "semantic" (embeddings) or "hybrid" (both, rank fused);
+    # the last two build an embedding index on start-up, so they are opt-in
+    RETRIEVAL_MODE: str = "lexical"
+    # "hashing" (offline, deterministic) or "azure" (embedding deployment)
+    EMBEDDING_BACKEND: str = "hashing"
+    EMBEDDING_DIMENSION: int = 256
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT: str = "text-embedding-3-small"
+
+    # Azure OpenAI quota; every chat completion goes through LLMDispatcher
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_REQUESTS_PER_MINUTE: int = 300
+    LLM_TOKENS_PER_MINUTE: int = 150000
+    LLM_MAX_RETRIES: int = 6
+
+    # Local cache of completions, keyed by prompt and knowledge version
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "cache/llm_cache.sqlite3"
+    LLM_CACHE_MAX_MB: int = 256
+
+    # Reuse of SME-approved answers from past evaluations
+    ANSWER_LIBRARY_ENABLED: bool = True
+    ANSWER_LIBRARY_MIN_SCORE: int = 4
+    # Similarity at which a vetted answer is reused verbatim
+    ANSWER_LIBRARY_REUSE_THRESHOLD: float = 0.92
+    # Similarity at which a vetted answer is adapted with one LLM call
+    ANSWER_LIBRARY_ADAPT_THRESHOLD: float = 0.8
+
+    # Questions repeated within an RFP are answered once and the answer is
+    # shared; near-duplicates are found by MinHash over character shingles
+    DEDUP_ENABLED: bool = True
+    # Jaccard similarity of the shingles from which questions are duplicates
+    DEDUP_THRESHOLD: float = 0.85
+    DEDUP_SHINGLE_SIZE: int = 5
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_BANDS: int = 16
+
+    # Default answer pipeline: "two_pass" (draft, then contextualize),
+    # "single_pass" (one structured completion) or "batched" (many questions
+    # per completion); overridable per request
+    GENERATION_MODE: str = "two_pass"
+    # Upper bounds on a batched completion; batches are also kept small enough
+    # for LLM_MAX_CONCURRENCY of them to fit in one minute of token quota
+    LLM_BATCH_MAX_QUESTIONS: int = 25
+    LLM_BATCH_MAX_TOKENS: int = 16000
+    # Generation jobs run at once; FairScheduler shares the capacity below
+    # between them, so this can be well above the number of busy RFPs
+    GENERATION_WORKERS: int = 8
+    # A running job's owner renews its heartbeat this often; a job whose
+    # heartbeat is older than GENERATION_JOB_STALE_S is queued again
+    GENERATION_JOB_HEARTBEAT_S: float = 15.0
+    GENERATION_JOB_STALE_S: float = 60.0
+    # Question tasks in flight across all RFPs
+    GENERATION_MAX_IN_FLIGHT: int = 32
+
+    # Stage pipeline of the two_pass and single_pass modes: workers per stage
+    # and the bound of the queue in front of each stage
+    PIPELINE_QUEUE_SIZE: int = 64
+    PIPELINE_RETRIEVAL_WORKERS: int = 2
+    # Questions looked up in the knowledge index together
+    PIPELINE_RETRIEVAL_BATCH: int = 16
+    PIPELINE_DRAFT_WORKERS: int = 16
+    PIPELINE_CONTEXTUALIZATION_WORKERS: int = 16
+    PIPELINE_PERSISTENCE_WORKERS: int = 4
+    # Answers stored together with one multi-row insert
+    PIPELINE_PERSISTENCE_BATCH: int = 16
+
+    # Question level work queue shared by every node (python -m app.worker);
+    # when enabled, jobs are split into work items instead of run in-process
+    WORK_QUEUE_ENABLED: bool = False
+    # Work queue workers run inside the API process itself
+    WORK_QUEUE_LOCAL_WORKERS: int = 1
+    WORK_QUEUE_BATCH_SIZE: int = 10
+    WORK_QUEUE_LEASE_S: int = 120
+    WORK_QUEUE_MAX_ATTEMPTS: int = 3
+    WORK_QUEUE_POLL_S: float = 2.0
+    # How often each worker fails the items whose last allowed lease expired
+    WORK_QUEUE_REAP_S: float = 30.0
+
+    # Database connection pool, shared by every session of the process. Up to
+    # DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW connections are open at once; a
+    # checkout waits DB_POOL_TIMEOUT_S for one before failing
+    DB_POOL_SIZE: int = 10
+    DB_POOL_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_S: float = 30.0
+    # Connections older than this are replaced; keep it under the server's idle
+    # timeout (Azure SQL closes connections idle for 30 minutes)
+    DB_POOL_RECYCLE_S: int = 1800
+    # Test connections with a round-trip on every checkout; with a recycle
+    # time below the idle timeout this can usually be turned off
+    DB_POOL_PRE_PING: bool = True
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 
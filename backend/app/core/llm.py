@@ -0,0 +1,48 @@
+from pydantic import SecretStr
+from openai import AsyncAzureOpenAI, AzureOpenAI
+from .config import settings
+
+DEFAULT_MODEL = "gpt-4o-mini"
+API_VERSION = "2025-01-01-preview"
+
+
+def create_llm_client() -> AsyncAzureOpenAI:
+    """
+    Creates an Azure OpenAI client from the configured key and endpoint.
+
+    Returns:
+        AsyncAzureOpenAI: The client. It keeps its own connection pool, so one
+        instance should be shared by everything in the process. Its built-in
+        retries are disabled because LLMDispatcher retries with rate limit
+        awareness.
+    Raises:
+        ValueError: If the key or endpoint is not configured.
+    """
+    return AsyncAzureOpenAI(max_retries=0, **_client_kwargs())
+
+
+def create_embedding_client() -> AzureOpenAI:
+    """
+    Creates a synchronous Azure OpenAI client for building and querying
+    embeddings, which happens in worker threads rather than on the event loop.
+
+    Raises:
+        ValueError: If the key or endpoint is not configured.
+    """
+    return AzureOpenAI(**_client_kwargs())
+
+
+def _client_kwargs() -> dict:
+    key = SecretStr(settings.AZURE_OPENAI_KEY)
+    if not key.get_secret_value():
+        raise ValueError("Azure AI Foundry key not found.")
+
+    endpoint = SecretStr(settings.AZURE_OPENAI_ENDPOINT)
+    if not endpoint.get_secret_value():
+        raise ValueError("Azure AI Foundry endpoint not found.")
+
+    return {
+        "api_key": key.get_secret_value(),
+        "api_version": API_VERSION,
+        "azure_endpoint": endpoint.get_secret_value(),
+    }
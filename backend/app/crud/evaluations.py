@@ -1,13 +1,64 @@
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, exc
+from sqlalchemy.orm import aliased
+from sqlalchemy import insert, select, exc, func
 import logging
 
 from .. import models
+from . import rfps
+from .llm_responses import latest_response_id
 
 logger = logging.getLogger(__name__)
 
 
+async def _count_scores(db: AsyncSession, evaluations: List[Dict[str, Any]]) -> None:
+    """
+    Moves the score_total and score_count of the RFPs of the evaluated
+    responses from the score of each response's latest evaluation to that of
+    its last new one. Runs before the new evaluations are inserted.
+    """
+    scores = {row["response_id"]: row.get("score") for row in evaluations}
+    newer = aliased(models.Evaluation)
+    result = await db.execute(
+        select(
+            models.LLMResponse.response_id,
+            models.Question.rfp_id,
+            models.Evaluation.score,
+        )
+        .select_from(models.LLMResponse)
+        .join(
+            models.Question,
+            models.Question.question_id == models.LLMResponse.question_id,
+        )
+        .outerjoin(
+            models.Evaluation,
+            models.Evaluation.eval_id
+            == select(func.max(newer.eval_id))
+            .where(newer.response_id == models.LLMResponse.response_id)
+            .scalar_subquery(),
+        )
+        .where(models.LLMResponse.response_id.in_(scores))
+    )
+    changes = []
+    for response_id, rfp_id, previous in result.all():
+        for score, sign in ((previous, -1), (scores[response_id], 1)):
+            if score is not None:
+                changes.append((rfp_id, "score_total", sign * score))
+                changes.append((rfp_id, "score_count", sign))
+    await rfps.add_to_summaries(db, rfps.merge_summary_changes(changes))
+
+
+async def _rfp_of_response(db: AsyncSession, response_id: int) -> int:
+    return await db.scalar(
+        select(models.Question.rfp_id)
+        .join(
+            models.LLMResponse,
+            models.LLMResponse.question_id == models.Question.question_id,
+        )
+        .where(models.LLMResponse.response_id == response_id)
+    )
+
+
 async def create_evaluation(
     db: AsyncSession,
     response_id: int,
@@ -40,6 +91,7 @@ async def create_evaluation(
         sme_comments=sme_comments,
     )
     try:
+        await _count_scores(db, [{"response_id": response_id, "score": score}])
         db.add(db_evaluation)
         await db.commit()
         await db.refresh(db_evaluation)
@@ -56,6 +108,45 @@ async def create_evaluation(
         raise
 
 
+async def create_evaluations(
+    db: AsyncSession, evaluations: List[Dict[str, Any]], commit: bool = True
+) -> List[int]:
+    """
+    Creates many Evaluation records with one multi-row INSERT.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy database session.
+        evaluations (List[Dict[str, Any]]): The column values of each evaluation,
+            as the keyword arguments of create_evaluation; response_id is required.
+        commit (bool): Whether to commit. Callers inserting related rows pass
+            False and commit once, so the rows are stored together or not at all.
+
+    Returns:
+        List[int]: The IDs of the new evaluations, in the order of evaluations.
+    Raises:
+        Exception: If there's a database error during creation.
+    """
+    if not evaluations:
+        return []
+    try:
+        await _count_scores(db, evaluations)
+        result = await db.execute(
+            insert(models.Evaluation).returning(
+                models.Evaluation.eval_id, sort_by_parameter_order=True
+            ),
+            evaluations,
+        )
+        eval_ids = list(result.scalars().all())
+        if commit:
+            await db.commit()
+        logger.info(f"Created {len(eval_ids)} Evaluations")
+        return eval_ids
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error creating {len(evaluations)} Evaluations: {e}", exc_info=True)
+        raise
+
+
 async def get_evaluation(
     db: AsyncSession, evaluation_id: int
 ) -> Optional[models.Evaluation]:
@@ -105,6 +196,66 @@ async def get_evaluations_by_response(
     return evaluations
 
 
+async def get_review_state(
+    db: AsyncSession, rfp_id: int
+) -> List[
+    Tuple[
+        int,
+        str,
+        Optional[int],
+        Optional[str],
+        Optional[int],
+        Optional[str],
+        Optional[int],
+        Optional[str],
+    ]
+]:
+    """
+    Retrieves every question of an RFP with its latest response and the latest
+    evaluation of that response, in one query.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        rfp_id (int): The ID of the RFP.
+
+    Returns:
+        List[Tuple]: (question_id, question_text, response_id, response,
+        eval_id, fine_tuned_response, score, sme_comments) rows ordered by
+        question ID;
+        the response and evaluation columns are None where there is none.
+    """
+    newer = aliased(models.Evaluation)
+    latest_eval_id = (
+        select(func.max(newer.eval_id))
+        .where(newer.response_id == models.LLMResponse.response_id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            models.Question.question_id,
+            models.Question.question_text,
+            models.LLMResponse.response_id,
+            models.LLMResponse.response,
+            models.Evaluation.eval_id,
+            models.Evaluation.fine_tuned_response,
+            models.Evaluation.score,
+            models.Evaluation.sme_comments,
+        )
+        .select_from(models.Question)
+        .outerjoin(
+            models.LLMResponse,
+            models.LLMResponse.response_id
+            == latest_response_id(models.Question.question_id),
+        )
+        .outerjoin(models.Evaluation, models.Evaluation.eval_id == latest_eval_id)
+        .where(models.Question.rfp_id == rfp_id)
+        .order_by(models.Question.question_id)
+    )
+    rows = [tuple(row) for row in result.all()]
+    logger.debug(f"Retrieved review state of {len(rows)} questions for RFP ID={rfp_id}.")
+    return rows
+
+
 async def update_evaluation(
     db: AsyncSession,
     evaluation_id: int,
@@ -142,6 +293,9 @@ async def update_evaluation(
             db_evaluation.sme_comments = sme_comments
 
         try:
+            await rfps.recount_summary(
+                db, await _rfp_of_response(db, db_evaluation.response_id)
+            )
             await db.commit()
             await db.refresh(db_evaluation)
             logger.info(f"Updated Evaluation ID={evaluation_id}.")
@@ -176,6 +330,9 @@ async def delete_evaluation(db: AsyncSession, evaluation_id: int) -> bool:
     if db_evaluation:
         try:
             await db.delete(db_evaluation)
+            await rfps.recount_summary(
+                db, await _rfp_of_response(db, db_evaluation.response_id)
+            )
             await db.commit()
             logger.info(f"Deleted Evaluation ID={evaluation_id}")
             return True
@@ -190,3 +347,48 @@ async def delete_evaluation(db: AsyncSession, evaluation_id: int) -> bool:
             f"Attempted to delete non-existent Evaluation ID={evaluation_id}"
         )
         return False
+
+
+async def get_approved_answers(
+    db: AsyncSession, min_score: int
+) -> List[Tuple[int, str, str, int]]:
+    """
+    Retrieves SME-approved answers: evaluations scored at least min_score,
+    together with the text of the question they answer.
+
+    The SME's fine-tuned response is preferred; the original response is used
+    when the SME approved it without edits.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        min_score (int): Lowest score that counts as approved.
+
+    Returns:
+        List[Tuple[int, str, str, int]]: (eval_id, question_text, answer, score)
+        rows, newest evaluation first.
+    """
+    answer = func.coalesce(
+        func.nullif(models.Evaluation.fine_tuned_response, ""),
+        models.Evaluation.original_response,
+    )
+    result = await db.execute(
+        select(
+            models.Evaluation.eval_id,
+            models.Question.question_text,
+            answer,
+            models.Evaluation.score,
+        )
+        .join(
+            models.LLMResponse,
+            models.LLMResponse.response_id == models.Evaluation.response_id,
+        )
+        .join(
+            models.Question,
+            models.Question.question_id == models.LLMResponse.question_id,
+        )
+        .where(models.Evaluation.score >= min_score, answer.is_not(None))
+        .order_by(models.Evaluation.eval_id.desc())
+    )
+    rows = [tuple(row) for row in result.all()]
+    logger.debug(f"Retrieved {len(rows)} approved answers with score >= {min_score}.")
+    return rows
@@ -0,0 +1,419 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import exists, insert, literal, or_, select, update, exc
+import logging
+
+from .. import models
+from ..models import JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+async def create_job(
+    db: AsyncSession, rfp_id: int, mode: str, priority: int = 0
+) -> models.GenerationJob:
+    """
+    Creates a queued generation job for an RFP.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        rfp_id (int): The RFP to generate answers for.
+        mode (str): The generation mode to run the job with.
+        priority (int): Scheduling priority; higher runs first and gets a
+            larger share of the generation capacity.
+
+    Returns:
+        models.GenerationJob: The newly created job, with its ID populated.
+    Raises:
+        Exception: If there's a database error during creation.
+    """
+    db_job = models.GenerationJob(
+        rfp_id=rfp_id, mode=mode, priority=priority, status=JobStatus.QUEUED
+    )
+    try:
+        db.add(db_job)
+        await db.commit()
+        await db.refresh(db_job)
+        logger.info(f"Created GenerationJob: ID={db_job.job_id} for RFP ID={rfp_id}")
+        return db_job
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error creating job for RFP ID '{rfp_id}': {e}", exc_info=True)
+        raise
+
+
+async def create_job_unless_active(
+    db: AsyncSession, rfp_id: int, mode: str, priority: int = 0
+) -> Tuple[models.GenerationJob, bool]:
+    """
+    Creates a queued generation job for an RFP, unless the RFP already has a
+    QUEUED or RUNNING one. The check and the insert are a single statement, so
+    two requests racing to generate the same RFP do not both create a job.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        rfp_id (int): The RFP to generate answers for.
+        mode (str): The generation mode to run the job with.
+        priority (int): Scheduling priority of the new job.
+
+    Returns:
+        Tuple[models.GenerationJob, bool]: The new job and True, or the RFP's
+        active job and False.
+    Raises:
+        Exception: If there's a database error during creation.
+    """
+    jobs = models.GenerationJob
+    active = exists().where(
+        jobs.rfp_id == rfp_id,
+        jobs.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+    )
+    try:
+        inserted = await db.execute(
+            insert(jobs).from_select(
+                ["rfp_id", "mode", "priority", "status"],
+                select(
+                    literal(rfp_id),
+                    literal(mode),
+                    literal(priority),
+                    literal(JobStatus.QUEUED, jobs.status.type),
+                ).where(~active),
+            )
+        )
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error creating job for RFP ID '{rfp_id}': {e}", exc_info=True)
+        raise
+    # An active job blocks newer ones, so the latest job is the one created
+    # here or the active one (unless it finished in the meantime).
+    db_job = await get_latest_job(db, rfp_id)
+    if inserted.rowcount:
+        logger.info(f"Created GenerationJob: ID={db_job.job_id} for RFP ID={rfp_id}")
+    return db_job, bool(inserted.rowcount)
+
+
+async def get_job(db: AsyncSession, job_id: int) -> Optional[models.GenerationJob]:
+    """
+    Retrieves a generation job by its ID.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        job_id (int): The ID of the job.
+
+    Returns:
+        Optional[models.GenerationJob]: The job if found, None otherwise.
+    """
+    result = await db.execute(
+        select(models.GenerationJob).where(models.GenerationJob.job_id == job_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_latest_job(
+    db: AsyncSession, rfp_id: int
+) -> Optional[models.GenerationJob]:
+    """
+    Retrieves the most recently submitted generation job of an RFP.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        rfp_id (int): The RFP.
+
+    Returns:
+        Optional[models.GenerationJob]: The job, None if the RFP was never generated.
+    """
+    result = await db.execute(
+        select(models.GenerationJob)
+        .where(models.GenerationJob.rfp_id == rfp_id)
+        .order_by(models.GenerationJob.job_id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_jobs_by_status(
+    db: AsyncSession, statuses: List[JobStatus], rfp_id: Optional[int] = None
+) -> List[models.GenerationJob]:
+    """
+    Retrieves all jobs in any of the given states, oldest first.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        statuses (List[JobStatus]): The states to select.
+        rfp_id (Optional[int]): Only select the jobs of this RFP.
+
+    Returns:
+        List[models.GenerationJob]: The matching jobs.
+    """
+    statement = select(models.GenerationJob).where(
+        models.GenerationJob.status.in_(statuses)
+    )
+    if rfp_id is not None:
+        statement = statement.where(models.GenerationJob.rfp_id == rfp_id)
+    result = await db.execute(statement.order_by(models.GenerationJob.job_id))
+    return result.scalars().all()
+
+
+async def update_job_progress(
+    db: AsyncSession,
+    job_id: int,
+    processed_questions: int,
+    total_questions: Optional[int] = None,
+) -> None:
+    """
+    Records how many of a job's questions have been answered.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        job_id (int): The ID of the job.
+        processed_questions (int): Questions answered so far.
+        total_questions (Optional[int]): Questions in the job, if known.
+
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    db_job = await get_job(db, job_id)
+    if db_job is None:
+        logger.warning(f"Attempted to update non-existent GenerationJob ID={job_id}")
+        return
+    db_job.processed_questions = processed_questions
+    if total_questions is not None:
+        db_job.total_questions = total_questions
+    try:
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(
+            f"Error updating progress of GenerationJob ID={job_id}: {e}", exc_info=True
+        )
+        raise
+
+
+async def start_job(db: AsyncSession, job_id: int, owner: str) -> bool:
+    """
+    Moves a QUEUED job to RUNNING under an owner with a single conditional
+    update, so a job cancelled after it was picked up is never started, and of
+    several processes that queued the same job exactly one runs it.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        job_id (int): The ID of the job.
+        owner (str): Identifies the process that runs the job.
+
+    Returns:
+        bool: True if this call started the job, False if it is missing, was
+        started elsewhere or already finished or cancelled.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        result = await db.execute(
+            update(models.GenerationJob)
+            .where(
+                models.GenerationJob.job_id == job_id,
+                models.GenerationJob.status == JobStatus.QUEUED,
+            )
+            .values(
+                status=JobStatus.RUNNING,
+                started_at=now,
+                error=None,
+                owner=owner,
+                heartbeat_at=now,
+            )
+        )
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error starting GenerationJob ID={job_id}: {e}", exc_info=True)
+        raise
+    if result.rowcount:
+        logger.info(f"GenerationJob ID={job_id} is now {JobStatus.RUNNING.value}")
+    return bool(result.rowcount)
+
+
+async def renew_job_heartbeats(db: AsyncSession, owner: str, job_ids: List[int]) -> int:
+    """
+    Records that an owner is still running its jobs.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        owner (str): The process running the jobs.
+        job_ids (List[int]): The jobs it runs.
+
+    Returns:
+        int: The number of jobs still RUNNING under this owner.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    if not job_ids:
+        return 0
+    try:
+        result = await db.execute(
+            update(models.GenerationJob)
+            .where(
+                models.GenerationJob.job_id.in_(job_ids),
+                models.GenerationJob.owner == owner,
+                models.GenerationJob.status == JobStatus.RUNNING,
+            )
+            .values(heartbeat_at=datetime.now(timezone.utc))
+        )
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error renewing heartbeats of {owner}: {e}", exc_info=True)
+        raise
+    return result.rowcount
+
+
+async def clear_job_owner(db: AsyncSession, job_id: int) -> None:
+    """
+    Leaves a RUNNING job to nobody in particular, e.g. once it is split into
+    work items that workers on any node finish.
+
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    try:
+        await db.execute(
+            update(models.GenerationJob)
+            .where(models.GenerationJob.job_id == job_id)
+            .values(owner=None, heartbeat_at=None)
+        )
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(
+            f"Error clearing the owner of GenerationJob ID={job_id}: {e}", exc_info=True
+        )
+        raise
+
+
+async def requeue_orphaned_jobs(
+    db: AsyncSession, stale_before: datetime
+) -> List[models.GenerationJob]:
+    """
+    Moves RUNNING jobs whose owner stopped heartbeating back to QUEUED.
+
+    Each job is moved with its own conditional update, so of several processes
+    reclaiming the same job exactly one gets it, and a job whose owner renewed
+    its heartbeat in the meantime is left alone.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        stale_before (datetime): Jobs whose last heartbeat is older are orphaned.
+
+    Returns:
+        List[models.GenerationJob]: The jobs this call re-queued.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    jobs = models.GenerationJob
+    orphaned = (
+        jobs.status == JobStatus.RUNNING,
+        jobs.owner.is_not(None),
+        or_(jobs.heartbeat_at.is_(None), jobs.heartbeat_at < stale_before),
+    )
+    result = await db.execute(select(jobs).where(*orphaned).order_by(jobs.job_id))
+    candidates = result.scalars().all()
+    owners = {job.job_id: job.owner for job in candidates}
+    requeued = []
+    try:
+        for job in candidates:
+            result = await db.execute(
+                update(jobs)
+                .where(jobs.job_id == job.job_id, *orphaned)
+                .values(
+                    status=JobStatus.QUEUED, started_at=None, owner=None, heartbeat_at=None
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                requeued.append(job)
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error re-queueing orphaned GenerationJobs: {e}", exc_info=True)
+        raise
+    for job in requeued:
+        logger.info(f"GenerationJob ID={job.job_id} of {owners[job.job_id]} is queued again")
+    return requeued
+
+
+async def finish_running_job(
+    db: AsyncSession,
+    job_id: int,
+    status: JobStatus,
+    error: Optional[str] = None,
+) -> bool:
+    """
+    Moves a RUNNING job to a final state with a single conditional update, so
+    that of several processes racing to finish the same job exactly one wins.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        job_id (int): The ID of the job.
+        status (JobStatus): SUCCEEDED or FAILED.
+        error (Optional[str]): Failure reason, for FAILED jobs.
+
+    Returns:
+        bool: True if this call finished the job, False if it was not RUNNING.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    try:
+        result = await db.execute(
+            update(models.GenerationJob)
+            .where(
+                models.GenerationJob.job_id == job_id,
+                models.GenerationJob.status == JobStatus.RUNNING,
+            )
+            .values(status=status, error=error, finished_at=datetime.now(timezone.utc))
+        )
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error finishing GenerationJob ID={job_id}: {e}", exc_info=True)
+        raise
+    if result.rowcount:
+        logger.info(f"GenerationJob ID={job_id} is now {status.value}")
+    return bool(result.rowcount)
+
+
+async def cancel_job(db: AsyncSession, job_id: int) -> bool:
+    """
+    Moves a QUEUED or RUNNING job to CANCELLED with a single conditional
+    update, so a job that finishes at the same moment keeps its outcome.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        job_id (int): The ID of the job.
+
+    Returns:
+        bool: True if this call cancelled the job, False if it had already
+        finished.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    try:
+        result = await db.execute(
+            update(models.GenerationJob)
+            .where(
+                models.GenerationJob.job_id == job_id,
+                models.GenerationJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+            )
+            .values(
+                status=JobStatus.CANCELLED,
+                error="Cancelled",
+                finished_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error cancelling GenerationJob ID={job_id}: {e}", exc_info=True)
+        raise
+    if result.rowcount:
+        logger.info(f"GenerationJob ID={job_id} is now cancelled")
+    return bool(result.rowcount)
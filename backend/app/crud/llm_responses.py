@@ -1,13 +1,40 @@
-from typing import Optional, List
+from typing import Any, AsyncIterator, Dict, Optional, List, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, exc
+from sqlalchemy.orm import aliased
+from sqlalchemy import exists, func, insert, select, update, exc
 import logging
 
 from .. import models
+from ..models import QuestionStatus
+from . import rfps
 
 logger = logging.getLogger(__name__)
 
 
+async def _count_answered(
+    db: AsyncSession, question_ids: Set[int], response_ids: List[int]
+) -> None:
+    """
+    Adds the questions answered for the first time by the just inserted
+    response_ids to their RFP's answered_count.
+    """
+    earlier = aliased(models.LLMResponse)
+    result = await db.execute(
+        select(models.Question.rfp_id, func.count())
+        .where(
+            models.Question.question_id.in_(question_ids),
+            ~exists().where(
+                earlier.question_id == models.Question.question_id,
+                earlier.response_id.not_in(response_ids),
+            ),
+        )
+        .group_by(models.Question.rfp_id)
+    )
+    await rfps.add_to_summaries(
+        db, {rfp_id: {"answered_count": n} for rfp_id, n in result.all()}
+    )
+
+
 async def create_llm_response(
     db: AsyncSession,
     question_id: int,
@@ -18,6 +45,7 @@ async def create_llm_response(
     generation_time_ms: Optional[int] = None,
     tokens_used: Optional[int] = None,
     status: str = "initial_draft",  # Can be an Enum later if more defined states are needed but i kept it simple for now
+    question_status: Optional[QuestionStatus] = None,
 ) -> models.LLMResponse:
     """
     Creates a new LLMResponse record in the database, linked to a Question.
@@ -32,6 +60,9 @@ async def create_llm_response(
         generation_time_ms (Optional[int]): Time taken for LLM generation.
         tokens_used (Optional[int]): Number of tokens consumed.
         status (str): Status of the LLM response (e.g., "initial_draft", "refined").
+        question_status (Optional[QuestionStatus]): If given, the parent Question is
+            moved to this status in the same transaction, so a response is never
+            stored without its question being marked as answered.
 
     Returns:
         models.LLMResponse: The newly created LLMResponse ORM object, with its ID populated.
@@ -50,6 +81,14 @@ async def create_llm_response(
     )
     try:
         db.add(db_llm_response)
+        await db.flush()
+        await _count_answered(db, {question_id}, [db_llm_response.response_id])
+        if question_status is not None:
+            await db.execute(
+                update(models.Question)
+                .where(models.Question.question_id == question_id)
+                .values(status=question_status)
+            )
         await db.commit()
         await db.refresh(db_llm_response)
         logger.info(
@@ -66,6 +105,58 @@ async def create_llm_response(
         raise
 
 
+async def create_llm_responses(
+    db: AsyncSession,
+    responses: List[Dict[str, Any]],
+    question_status: Optional[QuestionStatus] = None,
+    commit: bool = True,
+) -> List[int]:
+    """
+    Creates many LLMResponse records with one multi-row INSERT.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy database session.
+        responses (List[Dict[str, Any]]): The column values of each response, as
+            the keyword arguments of create_llm_response; question_id and
+            response are required.
+        question_status (Optional[QuestionStatus]): If given, the parent Questions
+            are moved to this status in the same transaction.
+        commit (bool): Whether to commit. Callers inserting related rows pass
+            False and commit once, so the rows are stored together or not at all.
+
+    Returns:
+        List[int]: The IDs of the new responses, in the order of responses.
+    Raises:
+        Exception: If there's a database error during creation.
+    """
+    if not responses:
+        return []
+    try:
+        result = await db.execute(
+            insert(models.LLMResponse).returning(
+                models.LLMResponse.response_id, sort_by_parameter_order=True
+            ),
+            responses,
+        )
+        response_ids = list(result.scalars().all())
+        question_ids = {row["question_id"] for row in responses}
+        await _count_answered(db, question_ids, response_ids)
+        if question_status is not None:
+            await db.execute(
+                update(models.Question)
+                .where(models.Question.question_id.in_(question_ids))
+                .values(status=question_status)
+            )
+        if commit:
+            await db.commit()
+        logger.info(f"Created {len(response_ids)} LLMResponses")
+        return response_ids
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error creating {len(responses)} LLMResponses: {e}", exc_info=True)
+        raise
+
+
 async def get_llm_response(
     db: AsyncSession, response_id: int
 ) -> Optional[models.LLMResponse]:
@@ -96,23 +187,106 @@ async def get_llm_responses_by_question(
     db: AsyncSession, question_id: int
 ) -> models.LLMResponse:
     """
-    Retrieves the LLM response associated with a specific Question.
+    Retrieves the most recent LLM response associated with a specific Question.
 
     Args:
         db (Session): The SQLAlchemy database session.
         question_id (int): The ID of the parent Question.
 
     Returns:
-        List[models.LLMResponse]: A list of LLMResponse ORM objects.
+        models.LLMResponse: The latest LLMResponse ORM object, None if there is none.
     """
     result = await db.execute(
-        select(models.LLMResponse).where(models.LLMResponse.question_id == question_id)
+        select(models.LLMResponse)
+        .where(models.LLMResponse.question_id == question_id)
+        .order_by(models.LLMResponse.response_id.desc())
+        .limit(1)
     )
     llm_responses = result.scalars().first()
     logger.debug(f"Retrieved LLM response for Question ID={question_id}.")
     return llm_responses
 
 
+def latest_response_id(question_id):
+    """
+    Correlated subquery of the ID of the newest response of question_id, a
+    question ID column of the enclosing query. It is a single seek per
+    question on ix_llm_responses_question_id_response_id.
+    """
+    newer = aliased(models.LLMResponse)
+    return (
+        select(func.max(newer.response_id))
+        .where(newer.question_id == question_id)
+        .scalar_subquery()
+    )
+
+
+async def get_latest_llm_responses(
+    db: AsyncSession, question_ids: List[int]
+) -> Dict[int, models.LLMResponse]:
+    """
+    Retrieves the most recent LLM response of many Questions in one query.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        question_ids (List[int]): The IDs of the parent Questions.
+
+    Returns:
+        Dict[int, models.LLMResponse]: Question ID to its latest LLMResponse;
+        questions without a response are absent.
+    """
+    if not question_ids:
+        return {}
+    result = await db.execute(
+        select(models.LLMResponse).where(
+            models.LLMResponse.response_id.in_(
+                select(func.max(models.LLMResponse.response_id))
+                .where(models.LLMResponse.question_id.in_(question_ids))
+                .group_by(models.LLMResponse.question_id)
+            )
+        )
+    )
+    responses = {row.question_id: row for row in result.scalars().all()}
+    logger.debug(f"Retrieved latest LLM responses of {len(responses)} Questions.")
+    return responses
+
+
+async def stream_answer_sheet(
+    db: AsyncSession, rfp_id: int, batch_size: int = 500
+) -> AsyncIterator[Tuple[int, str, Optional[str]]]:
+    """
+    Streams every question of an RFP with its latest response, in question
+    order, from a single query.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        rfp_id (int): The ID of the RFP.
+        batch_size (int): Rows fetched from the database at a time.
+
+    Yields:
+        Tuple[int, str, Optional[str]]: (question_id, question_text, response)
+        rows; response is None for questions without one.
+    """
+    result = await db.stream(
+        select(
+            models.Question.question_id,
+            models.Question.question_text,
+            models.LLMResponse.response,
+        )
+        .select_from(models.Question)
+        .outerjoin(
+            models.LLMResponse,
+            models.LLMResponse.response_id
+            == latest_response_id(models.Question.question_id),
+        )
+        .where(models.Question.rfp_id == rfp_id)
+        .order_by(models.Question.question_id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in result:
+        yield tuple(row)
+
+
 async def update_llm_response(
     db: AsyncSession,
     response_id: int,
@@ -174,7 +348,13 @@ async def delete_llm_response(db: AsyncSession, response_id: int) -> bool:
     db_llm_response = await get_llm_response(db, response_id)
     if db_llm_response:
         try:
+            rfp_id = await db.scalar(
+                select(models.Question.rfp_id).where(
+                    models.Question.question_id == db_llm_response.question_id
+                )
+            )
             await db.delete(db_llm_response)
+            await rfps.recount_summary(db, rfp_id)
             await db.commit()
             logger.info(f"Deleted LLMResponse ID={response_id}")
             return True
@@ -1,12 +1,13 @@
-from typing import Any, Dict, Optional, List
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from typing import Dict, Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, insert, update
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import SQLAlchemyError as exc
 import logging
 
 from .. import models
 from ..models import QuestionStatus
+from . import rfps
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +43,7 @@ async def create_question(
     )
     try:
         db.add(db_question)
+        await rfps.add_to_summaries(db, {rfp_id: {"question_count": 1}})
         await db.commit()
         await db.refresh(db_question)
         logger.info(
@@ -56,6 +58,55 @@ async def create_question(
         raise
 
 
+async def create_questions(
+    db: AsyncSession,
+    rfp_id: int,
+    question_texts: List[str],
+    status: QuestionStatus = QuestionStatus.EXTRACTED,
+    commit: bool = True,
+) -> List[int]:
+    """
+    Creates many Question records of an RFP with one multi-row INSERT.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy database session.
+        rfp_id (int): The ID of the parent RFP.
+        question_texts (List[str]): The text of each question.
+        status (QuestionStatus): The status of the new questions.
+        commit (bool): Whether to commit. Callers inserting related rows pass
+            False and commit once, so the rows are stored together or not at all.
+
+    Returns:
+        List[int]: The IDs of the new questions, in the order of question_texts.
+    Raises:
+        Exception: If there's a database error during creation.
+    """
+    if not question_texts:
+        return []
+    try:
+        result = await db.execute(
+            insert(models.Question).returning(
+                models.Question.question_id, sort_by_parameter_order=True
+            ),
+            [
+                {"rfp_id": rfp_id, "question_text": text, "status": status}
+                for text in question_texts
+            ],
+        )
+        question_ids = list(result.scalars().all())
+        await rfps.add_to_summaries(db, {rfp_id: {"question_count": len(question_ids)}})
+        if commit:
+            await db.commit()
+        logger.info(f"Created {len(question_ids)} Questions for RFP ID={rfp_id}")
+        return question_ids
+    except exc as e:
+        await db.rollback()
+        logger.error(
+            f"Error creating questions for RFP ID '{rfp_id}': {e}", exc_info=True
+        )
+        raise
+
+
 async def get_question(db: AsyncSession, question_id: int) -> Optional[models.Question]:
     """
     Retrieves a Question record by its primary key ID.
@@ -92,6 +143,53 @@ async def get_questions_by_rfp(db: AsyncSession, rfp_id: int) -> List[models.Que
     return questions
 
 
+async def update_question_duplicates(
+    db: AsyncSession, duplicate_of: Dict[int, Optional[int]]
+) -> int:
+    """
+    Links questions to the earlier question they duplicate, or unlinks them.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy database session.
+        duplicate_of (Dict[int, Optional[int]]): Question ID to the ID of the
+            question it duplicates, None to unlink it.
+
+    Returns:
+        int: The number of questions updated.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    if not duplicate_of:
+        return 0
+    try:
+        await db.execute(
+            update(models.Question),
+            [
+                {"question_id": question_id, "duplicate_of": original}
+                for question_id, original in duplicate_of.items()
+            ],
+        )
+        await db.commit()
+        logger.info(f"Updated duplicate links of {len(duplicate_of)} questions")
+        return len(duplicate_of)
+    except exc as e:
+        await db.rollback()
+        logger.error(f"Error updating duplicate links of questions: {e}", exc_info=True)
+        raise
+
+
+async def count_duplicate_questions(db: AsyncSession, rfp_id: int) -> int:
+    """
+    Counts the questions of an RFP that share the answer of an earlier one.
+    """
+    result = await db.execute(
+        select(func.count()).where(
+            models.Question.rfp_id == rfp_id, models.Question.duplicate_of.is_not(None)
+        )
+    )
+    return result.scalar_one()
+
+
 async def update_question_context(
     db: AsyncSession, question_id: int, new_context: str
 ) -> Optional[models.Question]:
@@ -175,6 +273,7 @@ async def delete_question(db: AsyncSession, question_id: int) -> bool:
     if db_question:
         try:
             await db.delete(db_question)
+            await rfps.recount_summary(db, db_question.rfp_id)
             await db.commit()
             logger.info(f"Deleted Question ID={question_id}")
             return True
@@ -1,8 +1,10 @@
 import logging
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import exc
-from typing import List, Optional
+from sqlalchemy.orm import aliased
+from sqlalchemy import exc, exists, func, update
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from .. import models
 from ..models import RFPStatus
@@ -68,24 +70,153 @@ async def get_rfp(db: AsyncSession, rfp_id: int) -> Optional[models.RFP]:
     return rfp
 
 
-async def get_rfps(db: AsyncSession, skip: int = 0, limit: int = 5) -> List[models.RFP]:
+async def list_rfps(
+    db: AsyncSession,
+    limit: int,
+    before_id: Optional[int] = None,
+    status: Optional[RFPStatus] = None,
+    uploaded_from: Optional[datetime] = None,
+    uploaded_to: Optional[datetime] = None,
+) -> Tuple[List[models.RFP], Optional[int]]:
     """
-    Retrieves a list of RFP records. Retrieves a default of the 5 newest objects.
+    Retrieves a page of RFP records, newest first, with keyset pagination:
+    a page starts below the last ID of the previous one, so it costs the same
+    however deep it is. Unfiltered or filtered by status, a page is read
+    straight off an index; upload dates are checked along the way.
 
     Args:
         db (AsyncSession): The SQLAlchemy async database session.
-        skip (int): The number of records to skip (offset).
         limit (int): The maximum number of records to return.
+        before_id (Optional[int]): Cursor of the page: only RFPs with a lower ID
+            are returned. None for the first page.
+        status (Optional[RFPStatus]): Only return RFPs in this status.
+        uploaded_from (Optional[datetime]): Only return RFPs uploaded at or after this time.
+        uploaded_to (Optional[datetime]): Only return RFPs uploaded before this time.
 
     Returns:
-        List[models.RFP]: A list of RFP ORM objects.
+        Tuple[List[models.RFP], Optional[int]]: The RFP ORM objects, and the
+        cursor of the next page, None on the last page.
     """
+    query = select(models.RFP)
+    if before_id is not None:
+        query = query.where(models.RFP.rfp_id < before_id)
+    if status is not None:
+        query = query.where(models.RFP.status == status)
+    if uploaded_from is not None:
+        query = query.where(models.RFP.uploaded_at >= uploaded_from)
+    if uploaded_to is not None:
+        query = query.where(models.RFP.uploaded_at < uploaded_to)
+    # One row past the page tells whether there is a next one.
     result = await db.execute(
-        select(models.RFP).order_by(models.RFP.rfp_id.desc()).offset(skip).limit(limit)
+        query.order_by(models.RFP.rfp_id.desc()).limit(limit + 1)
     )
-    rfps = result.scalars().all()
-    logger.debug(f"Retrieved {len(rfps)} RFPs (skip={skip}, limit={limit}).")
-    return rfps
+    rfps = list(result.scalars().all())
+    next_cursor = rfps[limit - 1].rfp_id if len(rfps) > limit else None
+    logger.debug(
+        f"Retrieved {min(len(rfps), limit)} RFPs (before_id={before_id}, "
+        f"status={status}, limit={limit})."
+    )
+    return rfps[:limit], next_cursor
+
+
+def summary_counts(rfp_id: Any) -> Dict[str, Any]:
+    """
+    Correlated subqueries counting the summary columns of an RFP from its
+    questions, responses and evaluations, by column name.
+
+    Args:
+        rfp_id (Any): The RFP ID, or the RFP ID column of the enclosing statement.
+
+    Returns:
+        Dict[str, Any]: Summary column name to its scalar subquery.
+    """
+    question = aliased(models.Question)
+    response = aliased(models.LLMResponse)
+    evaluation = aliased(models.Evaluation)
+    newer = aliased(models.Evaluation)
+    answered = exists().where(response.question_id == question.question_id)
+    latest_evaluation = (
+        select(func.max(newer.eval_id))
+        .where(newer.response_id == response.response_id)
+        .scalar_subquery()
+    )
+    scored = (
+        select(evaluation.score)
+        .select_from(question)
+        .join(response, response.question_id == question.question_id)
+        .join(evaluation, evaluation.eval_id == latest_evaluation)
+        .where(question.rfp_id == rfp_id, evaluation.score.is_not(None))
+    )
+    return {
+        "question_count": select(func.count())
+        .where(question.rfp_id == rfp_id)
+        .scalar_subquery(),
+        "answered_count": select(func.count())
+        .where(question.rfp_id == rfp_id, answered)
+        .scalar_subquery(),
+        "score_total": scored.with_only_columns(
+            func.coalesce(func.sum(evaluation.score), 0)
+        ).scalar_subquery(),
+        "score_count": scored.with_only_columns(func.count()).scalar_subquery(),
+    }
+
+
+async def recount_summary(db: AsyncSession, rfp_id: int) -> None:
+    """
+    Recounts the summary columns of an RFP from scratch, for changes too rare
+    to track incrementally (edits and deletions). Does not commit.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        rfp_id (int): The ID of the RFP.
+    """
+    await db.execute(
+        update(models.RFP)
+        .where(models.RFP.rfp_id == rfp_id)
+        .values(**summary_counts(rfp_id))
+    )
+    logger.debug(f"Recounted the summary of RFP ID={rfp_id}.")
+
+
+async def add_to_summaries(
+    db: AsyncSession, changes: Dict[int, Dict[str, int]]
+) -> None:
+    """
+    Adds to the summary columns of RFPs, in the transaction writing the rows
+    they count. Does not commit.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        changes (Dict[int, Dict[str, int]]): RFP ID to the amount added to each
+            summary column, e.g. {3: {"question_count": 20}}.
+    """
+    for rfp_id, amounts in changes.items():
+        amounts = {column: n for column, n in amounts.items() if n}
+        if not amounts:
+            continue
+        await db.execute(
+            update(models.RFP)
+            .where(models.RFP.rfp_id == rfp_id)
+            .values(
+                {
+                    column: getattr(models.RFP, column) + n
+                    for column, n in amounts.items()
+                }
+            )
+        )
+
+
+def merge_summary_changes(
+    changes: Iterable[Tuple[int, str, int]],
+) -> Dict[int, Dict[str, int]]:
+    """
+    Sums (rfp_id, column, amount) changes into the argument of add_to_summaries.
+    """
+    merged: Dict[int, Dict[str, int]] = {}
+    for rfp_id, column, n in changes:
+        amounts = merged.setdefault(rfp_id, {})
+        amounts[column] = amounts.get(column, 0) + n
+    return merged
 
 
 async def update_rfp_status(
@@ -0,0 +1,411 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, func, or_, select, update, exc
+import logging
+
+from .. import models
+from ..models import WorkStatus
+
+logger = logging.getLogger(__name__)
+
+# Dialects that can claim rows with SELECT ... FOR UPDATE SKIP LOCKED, or its
+# SQL Server equivalent.
+SKIP_LOCKED_DIALECTS = {"postgresql", "mysql", "mariadb", "oracle", "mssql"}
+
+# SQL Server spells SKIP LOCKED as table hints.
+MSSQL_SKIP_LOCKED_HINT = "WITH (UPDLOCK, READPAST, ROWLOCK)"
+
+
+async def create_work_items(
+    db: AsyncSession,
+    job_id: int,
+    rfp_id: int,
+    question_ids: List[int],
+    mode: str,
+    priority: int = 0,
+) -> int:
+    """
+    Queues one work item per question of a generation job.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        job_id (int): The job the questions belong to.
+        rfp_id (int): The RFP the questions belong to.
+        question_ids (List[int]): The questions to answer.
+        mode (str): The generation mode to answer them with.
+        priority (int): The job's priority; higher priority items are claimed
+            first.
+
+    Returns:
+        int: The number of work items created.
+    Raises:
+        Exception: If there's a database error during creation.
+    """
+    try:
+        db.add_all(
+            models.WorkItem(
+                job_id=job_id,
+                rfp_id=rfp_id,
+                question_id=question_id,
+                mode=mode,
+                priority=priority,
+                status=WorkStatus.PENDING,
+            )
+            for question_id in question_ids
+        )
+        await db.commit()
+        logger.info(f"Queued {len(question_ids)} work items for GenerationJob ID={job_id}")
+        return len(question_ids)
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(
+            f"Error queueing work items for GenerationJob ID={job_id}: {e}",
+            exc_info=True,
+        )
+        raise
+
+
+def _claimable(now: datetime, max_attempts: int):
+    # Pending items, and items whose worker stopped renewing its lease.
+    return and_(
+        models.WorkItem.attempts < max_attempts,
+        or_(
+            models.WorkItem.status == WorkStatus.PENDING,
+            and_(
+                models.WorkItem.status == WorkStatus.LEASED,
+                models.WorkItem.lease_expires_at < now,
+            ),
+        ),
+    )
+
+
+async def fail_expired_work_items(
+    db: AsyncSession, max_attempts: int
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Marks FAILED the items whose lease expired after their last allowed
+    attempt, e.g. because the worker holding them crashed. Their worker never
+    releases them, so the caller finishes their questions and jobs.
+
+    The expired items are selected first and then failed one by one with a
+    conditional update, which every dialect supports (MySQL has no
+    UPDATE ... RETURNING); an item renewed or failed by another worker in
+    between is left out.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        max_attempts (int): Claims allowed per item.
+
+    Returns:
+        List[Tuple[int, int, int, int]]: The (item_id, job_id, rfp_id,
+        question_id) of each item failed by this call.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    expired_lease = (
+        models.WorkItem.status == WorkStatus.LEASED,
+        models.WorkItem.lease_expires_at < datetime.now(timezone.utc),
+        models.WorkItem.attempts >= max_attempts,
+    )
+    try:
+        result = await db.execute(
+            select(
+                models.WorkItem.item_id,
+                models.WorkItem.job_id,
+                models.WorkItem.rfp_id,
+                models.WorkItem.question_id,
+            )
+            .where(*expired_lease)
+            .order_by(models.WorkItem.item_id)
+        )
+        expired = []
+        for row in result.all():
+            failed = await db.execute(
+                update(models.WorkItem)
+                .where(models.WorkItem.item_id == row.item_id, *expired_lease)
+                .values(
+                    status=WorkStatus.FAILED,
+                    lease_owner=None,
+                    claim_token=None,
+                    lease_expires_at=None,
+                    error="Lease expired too many times",
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if failed.rowcount:
+                expired.append(tuple(row))
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error failing expired work items: {e}", exc_info=True)
+        raise
+    if expired:
+        logger.warning(
+            f"Failed {len(expired)} work items whose last allowed lease expired"
+        )
+    return expired
+
+
+async def claim_work_items(
+    db: AsyncSession,
+    owner: str,
+    limit: int,
+    lease_s: float,
+    max_attempts: int,
+) -> List[models.WorkItem]:
+    """
+    Leases up to limit claimable work items to a worker.
+
+    Where the database supports it the rows are selected with
+    SELECT ... FOR UPDATE SKIP LOCKED (UPDLOCK/READPAST hints on SQL Server),
+    so concurrent workers never wait on or claim each other's rows. Other
+    databases (SQLite) claim with a single UPDATE ... WHERE item_id IN
+    (SELECT ...), which they execute atomically, and read the claimed rows
+    back by claim token.
+
+    Items whose lease expired are claimable again, unless they used up
+    max_attempts; fail_expired_work_items fails those.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        owner (str): Identifier of the claiming worker.
+        limit (int): Maximum number of items to claim.
+        lease_s (float): Lease duration; renew it with renew_leases.
+        max_attempts (int): Claims allowed per item.
+
+    Returns:
+        List[models.WorkItem]: The claimed items, highest priority and then
+        oldest first.
+    Raises:
+        Exception: If there's a database error while claiming.
+    """
+    now = datetime.now(timezone.utc)
+    expires = now + timedelta(seconds=lease_s)
+    token = uuid.uuid4().hex
+    dialect = db.get_bind().dialect.name
+    leased_values = dict(
+        status=WorkStatus.LEASED,
+        lease_owner=owner,
+        claim_token=token,
+        lease_expires_at=expires,
+        attempts=models.WorkItem.attempts + 1,
+    )
+    try:
+        candidates = (
+            select(models.WorkItem.item_id)
+            .where(_claimable(now, max_attempts))
+            .order_by(models.WorkItem.priority.desc(), models.WorkItem.item_id)
+            .limit(limit)
+        )
+        if dialect in SKIP_LOCKED_DIALECTS:
+            if dialect == "mssql":
+                candidates = candidates.with_hint(
+                    models.WorkItem, MSSQL_SKIP_LOCKED_HINT, dialect_name="mssql"
+                )
+            else:
+                candidates = candidates.with_for_update(skip_locked=True)
+            item_ids = (await db.execute(candidates)).scalars().all()
+            if item_ids:
+                await db.execute(
+                    update(models.WorkItem)
+                    .where(models.WorkItem.item_id.in_(item_ids))
+                    .values(**leased_values)
+                )
+        else:
+            await db.execute(
+                update(models.WorkItem)
+                .where(models.WorkItem.item_id.in_(candidates.scalar_subquery()))
+                .values(**leased_values)
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error claiming work items for worker {owner}: {e}", exc_info=True)
+        raise
+
+    # The claiming UPDATE bypasses the session, so refresh items it already holds.
+    result = await db.execute(
+        select(models.WorkItem)
+        .where(models.WorkItem.claim_token == token)
+        .order_by(models.WorkItem.item_id)
+        .execution_options(populate_existing=True)
+    )
+    items = result.scalars().all()
+    if items:
+        logger.debug(f"Worker {owner} claimed {len(items)} work items")
+    return items
+
+
+async def renew_leases(
+    db: AsyncSession, owner: str, item_ids: List[int], lease_s: float
+) -> int:
+    """
+    Extends the leases a worker still holds (its heartbeat).
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        owner (str): Identifier of the worker.
+        item_ids (List[int]): Items the worker is still working on.
+        lease_s (float): New lease duration from now.
+
+    Returns:
+        int: The number of leases renewed. Items that were reclaimed by another
+        worker after the lease expired are not renewed.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    if not item_ids:
+        return 0
+    try:
+        result = await db.execute(
+            update(models.WorkItem)
+            .where(
+                models.WorkItem.item_id.in_(item_ids),
+                models.WorkItem.lease_owner == owner,
+                models.WorkItem.status == WorkStatus.LEASED,
+            )
+            .values(
+                lease_expires_at=datetime.now(timezone.utc) + timedelta(seconds=lease_s)
+            )
+        )
+        await db.commit()
+        return result.rowcount
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error renewing leases of worker {owner}: {e}", exc_info=True)
+        raise
+
+
+async def finish_work_item(
+    db: AsyncSession,
+    item_id: int,
+    owner: str,
+    error: Optional[str] = None,
+    max_attempts: int = 1,
+) -> None:
+    """
+    Releases a leased work item as DONE, or after a failure either back to
+    PENDING for another attempt or as FAILED once max_attempts is reached.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        item_id (int): The work item.
+        owner (str): Identifier of the worker holding the lease.
+        error (Optional[str]): Failure reason, None on success.
+        max_attempts (int): Claims allowed per item.
+
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    values = dict(lease_owner=None, claim_token=None, lease_expires_at=None, error=error)
+    statement = update(models.WorkItem).where(
+        models.WorkItem.item_id == item_id, models.WorkItem.lease_owner == owner
+    )
+    try:
+        if error is None:
+            await db.execute(statement.values(status=WorkStatus.DONE, **values))
+        else:
+            # The first update clears lease_owner, so at most one of them applies.
+            await db.execute(
+                statement.where(models.WorkItem.attempts < max_attempts).values(
+                    status=WorkStatus.PENDING, **values
+                )
+            )
+            await db.execute(
+                statement.where(models.WorkItem.attempts >= max_attempts).values(
+                    status=WorkStatus.FAILED, **values
+                )
+            )
+        await db.commit()
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error releasing work item ID={item_id}: {e}", exc_info=True)
+        raise
+
+
+async def cancel_work_items(db: AsyncSession, job_id: int) -> int:
+    """
+    Cancels the PENDING and LEASED work items of a job. Workers still holding
+    a cancelled item lose their lease: they can neither renew nor release it.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        job_id (int): The job.
+
+    Returns:
+        int: The number of work items cancelled.
+    Raises:
+        Exception: If there's a database error during the update.
+    """
+    try:
+        result = await db.execute(
+            update(models.WorkItem)
+            .where(
+                models.WorkItem.job_id == job_id,
+                models.WorkItem.status.in_([WorkStatus.PENDING, WorkStatus.LEASED]),
+            )
+            .values(
+                status=WorkStatus.CANCELLED,
+                lease_owner=None,
+                claim_token=None,
+                lease_expires_at=None,
+            )
+        )
+        await db.commit()
+        logger.info(f"Cancelled {result.rowcount} work items of GenerationJob ID={job_id}")
+        return result.rowcount
+    except exc.SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(
+            f"Error cancelling work items of GenerationJob ID={job_id}: {e}",
+            exc_info=True,
+        )
+        raise
+
+
+async def get_cancelled_rfp_ids(db: AsyncSession, item_ids: List[int]) -> Set[int]:
+    """
+    Finds which of the given work items were cancelled.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        item_ids (List[int]): Items a worker is working on.
+
+    Returns:
+        Set[int]: The RFPs of the cancelled items.
+    """
+    if not item_ids:
+        return set()
+    result = await db.execute(
+        select(models.WorkItem.rfp_id)
+        .where(
+            models.WorkItem.item_id.in_(item_ids),
+            models.WorkItem.status == WorkStatus.CANCELLED,
+        )
+        .distinct()
+    )
+    return set(result.scalars().all())
+
+
+async def count_work_items(db: AsyncSession, job_id: int) -> Dict[WorkStatus, int]:
+    """
+    Counts the work items of a job by status.
+
+    Args:
+        db (AsyncSession): The SQLAlchemy async database session.
+        job_id (int): The job.
+
+    Returns:
+        Dict[WorkStatus, int]: Number of items in each status; absent statuses are 0.
+    """
+    result = await db.execute(
+        select(models.WorkItem.status, func.count())
+        .where(models.WorkItem.job_id == job_id)
+        .group_by(models.WorkItem.status)
+    )
+    counts = {status: 0 for status in WorkStatus}
+    counts.update(dict(result.all()))
+    return counts
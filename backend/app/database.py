@@ -1,14 +1,99 @@
+import time
+from collections import deque
+from typing import Dict
+
 from app.core.config import settings
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Checkout waits kept for the percentiles in pool_stats().
+WAIT_SAMPLES = 1000
+
+
+class _PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+
+pool_metrics = _PoolMetrics()
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool recording how long checkouts wait for a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.waits.append(time.perf_counter() - start)
+        pool_metrics.checkouts += 1
+        return connection
+
+
+def _engine_options(url: str) -> Dict:
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if make_url(url).database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; there is nothing to pool.
+        return options
+    return {
+        **options,
+        "poolclass": MeteredQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_S,
+        "pool_recycle": settings.DB_POOL_RECYCLE_S,
+    }
 
 
 DATABASE_URL = settings.AZURE_SQL_CONNECTION_STRING
 
-async_engine = create_async_engine(DATABASE_URL, pool_pre_ping=True)
+async_engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 
 async_session_factory = async_sessionmaker(
     bind=async_engine, class_=AsyncSession, expire_on_commit=False
 )
 
 Base = declarative_base()
+
+
+def pool_stats() -> Dict:
+    """
+    Live state of the connection pool, to size DB_POOL_SIZE and
+    DB_POOL_MAX_OVERFLOW for the load.
+    """
+    pool = async_engine.sync_engine.pool
+    waits = sorted(pool_metrics.waits)
+
+    def ms(q):
+        if not waits:
+            return None
+        return round(1000 * waits[min(len(waits) - 1, int(q * len(waits)))], 2)
+
+    stats = {
+        "pool": type(pool).__name__,
+        "checkouts": pool_metrics.checkouts,
+        "timeouts": pool_metrics.timeouts,
+        "wait_p50_ms": ms(0.5),
+        "wait_p95_ms": ms(0.95),
+        "wait_max_ms": ms(1.0),
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+        )
+    return stats
@@ -0,0 +1,82 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, List
+
+from .extraction import Segment
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    """
+    a an and are as at be by for from has have how in is it its of on or our
+    that the their this to was what when where which who will with you your
+    """.split()
+)
+
+
+@dataclass
+class Chunk:
+    """
+    A retrievable piece of a knowledge document.
+    """
+
+    chunk_id: int
+    source: str
+    location: str
+    text: str
+
+    def label(self) -> str:
+        """
+        Human readable reference to where the chunk came from.
+        """
+        return f"{self.source}, {self.location}"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases and splits text into index terms, dropping stopwords.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[str]: The index terms in order of appearance.
+    """
+    return [t for t in _TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_segments(
+    source: str,
+    segments: Iterable[Segment],
+    chunk_size: int,
+    overlap: int,
+    start_id: int = 0,
+) -> List[Chunk]:
+    """
+    Splits page/slide segments into overlapping word windows.
+
+    Chunks never cross a segment boundary, so every chunk can be traced back to
+    a single page or slide.
+
+    Args:
+        source (str): Name of the document the segments belong to.
+        segments (Iterable[Segment]): (location, text) pairs from extraction.
+        chunk_size (int): Maximum number of words per chunk.
+        overlap (int): Number of words shared by consecutive chunks of a segment.
+        start_id (int): The chunk_id to assign to the first chunk.
+
+    Returns:
+        List[Chunk]: The chunks, numbered consecutively from start_id.
+    """
+    step = max(chunk_size - overlap, 1)
+    chunks = []
+    for location, text in segments:
+        words = text.split()
+        for start in range(0, len(words), step):
+            window = words[start : start + chunk_size]
+            chunks.append(
+                Chunk(start_id + len(chunks), source, location, " ".join(window))
+            )
+            if start + chunk_size >= len(words):
+                break
+    return chunks
@@ -0,0 +1,138 @@
+import logging
+import math
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .chunking import tokenize
+
+logger = logging.getLogger("rfpai.knowledge.embeddings")
+
+
+class Embedder:
+    """
+    Interface for turning text into fixed size, L2 normalized float32 vectors.
+
+    Implementations must be deterministic for a given name, since the name is
+    stored next to the persisted vectors and a mismatch forces a rebuild.
+    """
+
+    name: str = "base"
+    dimension: int = 0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds a batch of texts.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            np.ndarray: A (len(texts), dimension) float32 matrix with unit-length rows.
+        """
+        raise NotImplementedError
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scales every row to unit length in place, leaving all-zero rows untouched.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class HashingEmbedder(Embedder):
+    """
+    Offline embedder based on signed feature hashing of word unigrams and bigrams.
+
+    It needs no model or network access, which makes it suitable for local
+    development and tests, and it captures enough lexical overlap to be a
+    useful fallback in production.
+    """
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+        self._features: Dict[str, Tuple[int, float]] = {}
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            counts: Dict[str, int] = {}
+            for term in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                column, sign = self._feature(term)
+                matrix[row, column] += sign * (1.0 + math.log(count))
+        return normalize_rows(matrix)
+
+    def _feature(self, term: str) -> Tuple[int, float]:
+        feature = self._features.get(term)
+        if feature is None:
+            digest = zlib.crc32(term.encode("utf-8"))
+            feature = (digest % self.dimension, 1.0 if digest & 0x80000000 else -1.0)
+            if len(self._features) < 1_000_000:
+                self._features[term] = feature
+        return feature
+
+
+class AzureOpenAIEmbedder(Embedder):
+    """
+    Embedder backed by an Azure OpenAI embedding deployment.
+    """
+
+    def __init__(self, client, deployment: str, dimension: int, batch_size: int = 256):
+        """
+        Args:
+            client: A synchronous AzureOpenAI client.
+            deployment (str): Name of the embedding deployment.
+            dimension (int): Vector size the deployment returns.
+            batch_size (int): Number of texts sent per request.
+        """
+        self._client = client
+        self._deployment = deployment
+        self._batch_size = batch_size
+        self.dimension = dimension
+        self.name = f"azure-{deployment}-{dimension}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), self._batch_size):
+            batch = texts[start : start + self._batch_size]
+            response = self._client.embeddings.create(
+                model=self._deployment,
+                input=[text or " " for text in batch],
+                dimensions=self.dimension,
+            )
+            for item in response.data:
+                matrix[start + item.index] = item.embedding
+        return normalize_rows(matrix)
+
+
+def create_embedder(backend: str, dimension: int) -> Embedder:
+    """
+    Creates the embedder selected in the settings.
+
+    Args:
+        backend (str): "hashing" for the offline embedder or "azure" for the
+            Azure OpenAI embedding deployment.
+        dimension (int): Vector size.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == "hashing":
+        return HashingEmbedder(dimension)
+    if backend == "azure":
+        from ..core.config import settings
+        from ..core.llm import create_embedding_client
+
+        return AzureOpenAIEmbedder(
+            create_embedding_client(),
+            settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            dimension,
+        )
+    raise ValueError(f"Unknown embedding backend: {backend}")
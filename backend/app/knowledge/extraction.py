@@ -0,0 +1,213 @@
+import os
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import fitz
+from pptx import Presentation
+
+logger = logging.getLogger("rfpai.knowledge.extraction")
+
+SUPPORTED_EXTENSIONS = [".pdf", ".txt", ".ppt", ".pptx"]
+
+# A segment is a (location, text) pair, e.g. ("page 3", "..."), so that chunks
+# built from it can point back to the page or slide they came from.
+Segment = Tuple[str, str]
+
+# (start, stop) page range of a PDF, or None for the whole file.
+PageRange = Optional[Tuple[int, int]]
+
+
+@dataclass
+class ExtractionResult:
+    """
+    Outcome of extracting a single knowledge file.
+    """
+
+    path: str
+    segments: List[Segment] = field(default_factory=list)
+    elapsed_s: float = 0.0
+    error: Optional[str] = None
+
+
+def get_all_supported_files(root_folder: str, extensions=SUPPORTED_EXTENSIONS):
+    """
+    Gets all the files in the root folder and its subfolders with the given extensions.
+
+    Args:
+        root_folder (str): The root folder to search for files.
+        extensions (list): The extensions of the files to search for.
+
+    Returns:
+        List[str]: A sorted list of file paths that match the given extensions.
+    """
+    matched_files = []
+    for root, dirs, files in os.walk(root_folder):
+        for file in files:
+            if os.path.splitext(file)[1].lower() in extensions:
+                matched_files.append(os.path.join(root, file))
+    return sorted(matched_files)
+
+
+def extract_segments(file_path: str) -> List[Segment]:
+    """
+    Extracts the text of a knowledge file as a list of page/slide aware segments.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        List[Segment]: (location, text) pairs in document order.
+
+    Raises:
+        ValueError: If the file type is not supported.
+        Exception: If the underlying parser fails to read the file.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf":
+        return _extract_pdf(file_path)
+    elif ext == ".txt":
+        return _extract_txt(file_path)
+    elif ext in [".ppt", ".pptx"]:
+        return _extract_pptx(file_path)
+    raise ValueError(f"Unsupported knowledge file type: {file_path}")
+
+
+def extract_many(
+    paths: List[str], max_workers: Optional[int] = None, pages_per_task: int = 50
+) -> Iterator[ExtractionResult]:
+    """
+    Extracts many files in parallel on a process pool.
+
+    PDFs longer than pages_per_task are split into page ranges so a single large
+    document is spread across workers too. Results are yielded per file as soon
+    as all of its parts have finished, in completion order.
+
+    Args:
+        paths (List[str]): The files to extract.
+        max_workers (Optional[int]): Pool size. None uses the CPU count and 1
+            extracts in the calling process.
+        pages_per_task (int): Maximum number of PDF pages per task.
+
+    Yields:
+        ExtractionResult: The segments, worker time and error (if any) of a file.
+    """
+    tasks = [
+        (path, page_range)
+        for path in paths
+        for page_range in _plan_tasks(path, pages_per_task)
+    ]
+    if max_workers == 1 or len(tasks) <= 1:
+        for path in paths:
+            segments, elapsed, error = _run_task(path, None)
+            yield _log_result(ExtractionResult(path, segments, elapsed, error))
+        return
+
+    remaining: Dict[str, int] = {}
+    parts: Dict[str, List[Tuple[int, List[Segment]]]] = {}
+    results: Dict[str, ExtractionResult] = {}
+    for path, _ in tasks:
+        remaining[path] = remaining.get(path, 0) + 1
+        parts.setdefault(path, [])
+        results.setdefault(path, ExtractionResult(path))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_run_task, path, page_range): (path, page_range)
+            for path, page_range in tasks
+        }
+        for future in as_completed(futures):
+            path, page_range = futures[future]
+            result = results[path]
+            try:
+                segments, elapsed, error = future.result()
+            except Exception as e:  # the worker process itself died
+                segments, elapsed, error = [], 0.0, repr(e)
+            result.elapsed_s += elapsed
+            result.error = result.error or error
+            parts[path].append((page_range[0] if page_range else 0, segments))
+
+            remaining[path] -= 1
+            if remaining[path] == 0:
+                if result.error is None:
+                    for _, part in sorted(parts[path], key=lambda item: item[0]):
+                        result.segments.extend(part)
+                del parts[path]
+                yield _log_result(result)
+
+
+def _plan_tasks(path: str, pages_per_task: int) -> List[PageRange]:
+    if os.path.splitext(path)[1].lower() != ".pdf":
+        return [None]
+    try:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+    except Exception:
+        return [None]  # let the worker report the error
+    if page_count <= pages_per_task:
+        return [None]
+    return [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+
+def _run_task(
+    path: str, page_range: PageRange
+) -> Tuple[List[Segment], float, Optional[str]]:
+    """
+    Worker entry point. Returns (segments, elapsed seconds, error message).
+    """
+    started = time.perf_counter()
+    try:
+        if page_range is not None:
+            segments = _extract_pdf(path, *page_range)
+        else:
+            segments = extract_segments(path)
+        return segments, time.perf_counter() - started, None
+    except Exception as e:
+        return [], time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+def _log_result(result: ExtractionResult) -> ExtractionResult:
+    if result.error:
+        logger.warning(
+            "Could not load content from: %s (%s)", result.path, result.error
+        )
+    else:
+        logger.info(
+            "Extracted %d segments from: %s in %.2fs",
+            len(result.segments),
+            result.path,
+            result.elapsed_s,
+        )
+    return result
+
+
+def _extract_pdf(
+    file_path: str, start: int = 0, stop: Optional[int] = None
+) -> List[Segment]:
+    with fitz.open(file_path) as doc:
+        stop = doc.page_count if stop is None else stop
+        return [
+            (f"page {number + 1}", doc[number].get_text())
+            for number in range(start, stop)
+        ]
+
+
+def _extract_txt(file_path: str) -> List[Segment]:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return [("text", f.read())]
+
+
+def _extract_pptx(file_path: str) -> List[Segment]:
+    prs = Presentation(file_path)
+    segments = []
+    for number, slide in enumerate(prs.slides, start=1):
+        text = "\n".join(
+            shape.text for shape in slide.shapes if hasattr(shape, "text")
+        )
+        segments.append((f"slide {number}", text))
+    return segments
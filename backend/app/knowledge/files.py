@@ -0,0 +1,40 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+# Suffix of files being written; they are never read and may be removed.
+TEMP_SUFFIX = ".tmp"
+
+
+@contextmanager
+def replace_atomically(path: str) -> Iterator[str]:
+    """
+    Yields the path of a new, uniquely named file next to path to write to,
+    and moves it over path once the block completes.
+
+    Readers see the old file or the complete new one, never a partial write,
+    and processes writing the same path at once (e.g. uvicorn workers
+    building the index at start-up) each write a file of their own; the last
+    one to finish wins. The temporary file is removed if the block fails.
+
+    Args:
+        path (str): The file to replace.
+    """
+    directory = os.path.dirname(path) or "."
+    with tempfile.NamedTemporaryFile(
+        dir=directory,
+        prefix=os.path.basename(path) + ".",
+        suffix=TEMP_SUFFIX,
+        delete=False,
+    ) as f:
+        tmp_path = f.name
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
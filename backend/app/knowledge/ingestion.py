@@ -0,0 +1,186 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .extraction import Segment, extract_many, get_all_supported_files
+from .files import TEMP_SUFFIX, replace_atomically
+
+logger = logging.getLogger("rfpai.knowledge.ingestion")
+
+MANIFEST_FILENAME = "manifest.json"
+SEGMENT_CACHE_DIR = "segments"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class IngestionReport:
+    """
+    Summary of a single ingestion run.
+    """
+
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    Hashes the content of a file in 1MB blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class KnowledgeIngestor:
+    """
+    Keeps an on-disk manifest of the knowledge folder and a cache of the text
+    extracted from every file.
+
+    Each manifest entry records the size, mtime and content hash of a file. A
+    file whose size and mtime are unchanged is trusted without being read; a
+    file whose metadata changed is hashed and only re-extracted if its content
+    actually differs. Extracted segments are cached as gzipped JSON keyed by
+    content hash, so identical files share one cache entry.
+    """
+
+    def __init__(
+        self, knowledge_dir: str, index_dir: str, max_workers: Optional[int] = None
+    ):
+        self.knowledge_dir = knowledge_dir
+        self.index_dir = index_dir
+        self.max_workers = max_workers
+        self._manifest_path = os.path.join(index_dir, MANIFEST_FILENAME)
+        self._cache_dir = os.path.join(index_dir, SEGMENT_CACHE_DIR)
+        self.files: Dict[str, Dict] = self._load_manifest()
+
+    def sync(self) -> IngestionReport:
+        """
+        Brings the manifest and segment cache in line with the knowledge folder.
+
+        Returns:
+            IngestionReport: Which files were added, changed, removed or skipped.
+        """
+        report = IngestionReport()
+        current = {}
+        pending = {}
+
+        for path in get_all_supported_files(self.knowledge_dir):
+            rel_path = os.path.relpath(path, self.knowledge_dir)
+            stat = os.stat(path)
+            entry = self.files.get(rel_path)
+            if (
+                entry is not None
+                and entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and os.path.exists(self._cache_path(entry["sha256"]))
+            ):
+                current[rel_path] = entry
+                report.unchanged.append(rel_path)
+                continue
+
+            sha256 = file_sha256(path)
+            new_entry = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256,
+            }
+            if os.path.exists(self._cache_path(sha256)):
+                # Touched or copied but the content is already cached.
+                current[rel_path] = new_entry
+                if entry is not None and entry["sha256"] == sha256:
+                    report.unchanged.append(rel_path)
+                else:
+                    (report.changed if entry else report.added).append(rel_path)
+                continue
+            pending[path] = (rel_path, new_entry, entry is not None)
+
+        for result in extract_many(list(pending), max_workers=self.max_workers):
+            rel_path, new_entry, existed = pending[result.path]
+            if result.error:
+                report.failed.append(rel_path)
+                continue
+            self._write_segments(new_entry["sha256"], result.segments)
+            current[rel_path] = new_entry
+            (report.changed if existed else report.added).append(rel_path)
+
+        report.removed = sorted(set(self.files) - set(current) - set(report.failed))
+        self.files = current
+        self._save_manifest()
+        self._prune_cache()
+
+        logger.info(
+            "Knowledge ingestion: %d added, %d changed, %d removed, %d unchanged, %d failed.",
+            len(report.added),
+            len(report.changed),
+            len(report.removed),
+            len(report.unchanged),
+            len(report.failed),
+        )
+        return report
+
+    def content_version(self) -> str:
+        """
+        Hash over the relative path and content hash of every ingested file.
+        """
+        digest = hashlib.sha256()
+        for rel_path in sorted(self.files):
+            digest.update(f"{rel_path}:{self.files[rel_path]['sha256']}\n".encode())
+        return digest.hexdigest()
+
+    def load_segments(self, rel_path: str) -> List[Segment]:
+        """
+        Reads the cached segments of an ingested file.
+        """
+        cache_path = self._cache_path(self.files[rel_path]["sha256"])
+        with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+            return [tuple(segment) for segment in json.load(f)]
+
+    def _cache_path(self, sha256: str) -> str:
+        return os.path.join(self._cache_dir, sha256 + ".json.gz")
+
+    def _write_segments(self, sha256: str, segments: List[Segment]) -> None:
+        os.makedirs(self._cache_dir, exist_ok=True)
+        with replace_atomically(self._cache_path(sha256)) as tmp_path:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(segments, f)
+
+    def _prune_cache(self) -> None:
+        if not os.path.isdir(self._cache_dir):
+            return
+        referenced = {entry["sha256"] + ".json.gz" for entry in self.files.values()}
+        for name in os.listdir(self._cache_dir):
+            # Segments another process is still writing are not ours to remove.
+            if name not in referenced and not name.endswith(TEMP_SUFFIX):
+                os.remove(os.path.join(self._cache_dir, name))
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        if not os.path.exists(self._manifest_path):
+            return {}
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable manifest %s: %s", self._manifest_path, e)
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest["files"]
+
+    def _save_manifest(self) -> None:
+        os.makedirs(self.index_dir, exist_ok=True)
+        with replace_atomically(self._manifest_path) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "files": self.files}, f)
@@ -0,0 +1,164 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over tokenized chunks.
+
+    Postings are stored per term as parallel lists of chunk ids and term
+    frequencies so that scoring a query only touches the chunks that contain
+    at least one query term. For batches of queries the postings are also
+    laid out as a sparse term x chunk matrix of BM25 weights, built on first
+    use, so that scoring every query is a single sparse matrix product.
+    """
+
+    def __init__(
+        self,
+        postings: Dict[str, Tuple[List[int], List[int]]],
+        doc_lengths: List[int],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self._avg_length = (
+            sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        )
+        self._terms: Dict[str, int] = {}
+        self._weights: Optional[sparse.csr_matrix] = None
+
+    @classmethod
+    def build(cls, documents: Iterable[List[str]], **kwargs) -> "BM25Index":
+        """
+        Builds an index from tokenized documents. The position of each document
+        in the iterable becomes its chunk id.
+        """
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths = []
+        for doc_id, tokens in enumerate(documents):
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                ids, freqs = postings[term]
+                ids.append(doc_id)
+                freqs.append(freq)
+        return cls(dict(postings), doc_lengths, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def idf(self, term: str) -> float:
+        n_docs = len(self.doc_lengths)
+        df = len(self.postings[term][0]) if term in self.postings else 0
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query_tokens: List[str], k: int) -> List[Tuple[int, float]]:
+        """
+        Scores all chunks containing a query term and returns the best k.
+
+        Args:
+            query_tokens (List[str]): The tokenized query.
+            k (int): Number of results to return.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, score) pairs, best first.
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        k1, b, avg = self.k1, self.b, self._avg_length or 1.0
+        for term in set(query_tokens):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            idf = self.idf(term)
+            for doc_id, freq in zip(*posting):
+                norm = k1 * (1 - b + b * self.doc_lengths[doc_id] / avg)
+                scores[doc_id] += idf * freq * (k1 + 1) / (freq + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def search_many(
+        self, queries_tokens: List[List[str]], k: int
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        search for many queries at once.
+
+        The queries become a sparse query x term indicator matrix, and its
+        product with the term x chunk weight matrix scores every query against
+        every chunk in one pass; only the best k of each row are sorted.
+
+        Args:
+            queries_tokens (List[List[str]]): The tokenized queries.
+            k (int): Number of results per query.
+
+        Returns:
+            List[List[Tuple[int, float]]]: (chunk_id, score) pairs of each
+            query, best first, in the order of the queries.
+        """
+        if k <= 0:
+            return [[] for _ in queries_tokens]
+        weights = self._weight_matrix()
+        rows, columns = [], []
+        for row, tokens in enumerate(queries_tokens):
+            for term in set(tokens):
+                column = self._terms.get(term)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        queries = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)),
+            shape=(len(queries_tokens), weights.shape[0]),
+        )
+        scores = (queries @ weights).tocsr()
+
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            doc_ids, values = scores.indices[start:end], scores.data[start:end]
+            if len(values) > k:
+                best = np.argpartition(-values, k - 1)[:k]
+                doc_ids, values = doc_ids[best], values[best]
+            order = np.argsort(-values, kind="stable")
+            results.append([(int(doc_ids[i]), float(values[i])) for i in order])
+        return results
+
+    def _weight_matrix(self) -> sparse.csr_matrix:
+        if self._weights is None:
+            k1, b, avg = self.k1, self.b, self._avg_length or 1.0
+            lengths = np.asarray(self.doc_lengths, dtype=np.float64)
+            norms = k1 * (1 - b + b * lengths / avg)
+            self._terms = {term: row for row, term in enumerate(self.postings)}
+            indptr, indices, data = [0], [], []
+            for term, (ids, freqs) in self.postings.items():
+                ids = np.asarray(ids, dtype=np.int64)
+                freqs = np.asarray(freqs, dtype=np.float64)
+                indices.append(ids)
+                data.append(self.idf(term) * freqs * (k1 + 1) / (freqs + norms[ids]))
+                indptr.append(indptr[-1] + len(ids))
+            self._weights = sparse.csr_matrix(
+                (
+                    np.concatenate(data) if data else np.zeros(0),
+                    np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+                    np.asarray(indptr),
+                ),
+                shape=(len(self.postings), len(self.doc_lengths)),
+            )
+        return self._weights
+
+    def to_dict(self) -> Dict:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        postings = {term: (ids, freqs) for term, (ids, freqs) in data["postings"].items()}
+        return cls(postings, data["doc_lengths"], k1=data["k1"], b=data["b"])
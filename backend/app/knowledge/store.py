@@ -0,0 +1,290 @@
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from .chunking import Chunk, chunk_segments, tokenize
+from .embeddings import Embedder, create_embedder
+from .files import replace_atomically
+from .ingestion import KnowledgeIngestor
+from .lexical_index import BM25Index
+from .vector_index import VectorIndex
+
+logger = logging.getLogger("rfpai.knowledge.store")
+
+INDEX_FILENAME = "index.json.gz"
+FORMAT_VERSION = 1
+
+RETRIEVAL_MODES = ("lexical", "semantic", "hybrid")
+# Constant of reciprocal rank fusion; dampens the weight of the very top ranks.
+RRF_K = 60
+
+
+class KnowledgeStore:
+    """
+    Chunked, searchable view of the documents in the knowledge folder.
+
+    Chunks are always indexed lexically (BM25). When an embedder is supplied
+    they are also embedded into a memory-mapped vector index, which enables the
+    "semantic" and "hybrid" retrieval modes. Both indexes are persisted to disk
+    and reloaded on start-up as long as the content of the knowledge folder has
+    not changed since they were built.
+    """
+
+    def __init__(
+        self,
+        chunks: List[Chunk],
+        index: BM25Index,
+        fingerprint: str = "",
+        vectors: Optional[VectorIndex] = None,
+        embedder: Optional[Embedder] = None,
+        mode: str = "lexical",
+    ):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if mode != "lexical" and (vectors is None or embedder is None):
+            raise ValueError(f"Retrieval mode '{mode}' needs an embedder.")
+        self.chunks = chunks
+        self.index = index
+        self.fingerprint = fingerprint
+        self.vectors = vectors
+        self.embedder = embedder
+        self.mode = mode
+
+    @classmethod
+    def load_or_build(
+        cls,
+        knowledge_dir: str,
+        index_dir: str,
+        chunk_size: int = 200,
+        chunk_overlap: int = 40,
+        max_workers: Optional[int] = None,
+        embedder: Optional[Embedder] = None,
+        mode: str = "lexical",
+    ) -> "KnowledgeStore":
+        """
+        Syncs the knowledge folder and loads the persisted index if it is up to
+        date, otherwise rebuilds it from the cached document text.
+
+        Args:
+            knowledge_dir (str): Folder containing the knowledge documents.
+            index_dir (str): Folder the manifest, text cache and index live in.
+            chunk_size (int): Maximum number of words per chunk.
+            chunk_overlap (int): Words shared between consecutive chunks.
+            max_workers (Optional[int]): Extraction processes for new or changed files.
+            embedder (Optional[Embedder]): Embedder for the vector index. No
+                vector index is built without one.
+            mode (str): Default retrieval mode, one of RETRIEVAL_MODES.
+
+        Returns:
+            KnowledgeStore: A store ready to be searched.
+        """
+        ingestor = KnowledgeIngestor(knowledge_dir, index_dir, max_workers=max_workers)
+        ingestor.sync()
+        fingerprint = hashlib.sha256(
+            f"{FORMAT_VERSION}:{chunk_size}:{chunk_overlap}:{ingestor.content_version()}".encode()
+        ).hexdigest()
+        index_path = os.path.join(index_dir, INDEX_FILENAME)
+
+        loaded = cls._load(index_path)
+        if loaded is not None and loaded[2] == fingerprint:
+            chunks, index, _ = loaded
+            logger.info(
+                "Loaded knowledge index with %d chunks from %s", len(chunks), index_path
+            )
+        else:
+            logger.info("Building knowledge index from %d files.", len(ingestor.files))
+            chunks = []
+            for rel_path in sorted(ingestor.files):
+                chunks.extend(
+                    chunk_segments(
+                        rel_path,
+                        ingestor.load_segments(rel_path),
+                        chunk_size,
+                        chunk_overlap,
+                        start_id=len(chunks),
+                    )
+                )
+            index = cls._build_index(chunks)
+
+        vectors = None
+        if embedder is not None:
+            vectors = VectorIndex.open(index_dir)
+            if (
+                vectors is None
+                or vectors.fingerprint != fingerprint
+                or vectors.embedder_name != embedder.name
+            ):
+                vectors = VectorIndex.build(
+                    index_dir, embedder, [chunk.text for chunk in chunks], fingerprint
+                )
+
+        store = cls(chunks, index, fingerprint, vectors, embedder, mode)
+        if loaded is None or loaded[2] != fingerprint:
+            store.save(index_path)
+        return store
+
+    @staticmethod
+    def _build_index(chunks: List[Chunk]) -> BM25Index:
+        return BM25Index.build(
+            tokenize(chunk.source + " " + chunk.text) for chunk in chunks
+        )
+
+    @property
+    def version(self) -> str:
+        """
+        Identifies the indexed content; changes whenever the knowledge changes.
+        """
+        return self.fingerprint
+
+    def search(self, query: str, k: int, mode: Optional[str] = None) -> List[Chunk]:
+        """
+        Returns the k chunks most relevant to the query, best first.
+
+        Args:
+            query (str): The question to retrieve knowledge for.
+            k (int): Number of chunks to return.
+            mode (Optional[str]): Overrides the store's default retrieval mode.
+        """
+        mode = mode or self.mode
+        if mode == "lexical":
+            hits = self.index.search(tokenize(query), k)
+        elif mode == "semantic":
+            hits = self.vectors.search(self.embedder.embed([query])[0], k)
+        else:
+            hits = self._fuse(
+                self.index.search(tokenize(query), 2 * k),
+                self.vectors.search(self.embedder.embed([query])[0], 2 * k),
+                k,
+            )
+        return [self.chunks[chunk_id] for chunk_id, _ in hits]
+
+    def search_many(
+        self, queries: List[str], k: int, mode: Optional[str] = None
+    ) -> List[List[Chunk]]:
+        """
+        Retrieves the top k chunks for many queries at once.
+
+        The queries are scored together: BM25 as one sparse matrix product
+        (see BM25Index.search_many), and in the semantic and hybrid modes
+        every query is embedded in one call and scored against the whole
+        vector index in a single vectorized pass.
+
+        Args:
+            queries (List[str]): The questions to retrieve knowledge for.
+            k (int): Number of chunks per question.
+            mode (Optional[str]): Overrides the store's default retrieval mode.
+
+        Returns:
+            List[List[Chunk]]: The chunks of each query, in the order of the queries.
+        """
+        mode = mode or self.mode
+        if not queries:
+            return []
+        if mode == "lexical":
+            batches = self.index.search_many([tokenize(query) for query in queries], k)
+        else:
+            semantic = self.vectors.search_many(
+                self.embedder.embed(queries), k if mode == "semantic" else 2 * k
+            )
+            if mode == "semantic":
+                batches = semantic
+            else:
+                lexical = self.index.search_many(
+                    [tokenize(query) for query in queries], 2 * k
+                )
+                batches = [
+                    self._fuse(lexical_hits, hits, k)
+                    for lexical_hits, hits in zip(lexical, semantic)
+                ]
+        return [[self.chunks[chunk_id] for chunk_id, _ in hits] for hits in batches]
+
+    def get_contexts(
+        self, queries: List[str], k: int, mode: Optional[str] = None
+    ) -> List[str]:
+        """
+        Batched get_context: one prompt-ready reference block per query.
+        """
+        return [
+            self.format_context(chunks) for chunks in self.search_many(queries, k, mode)
+        ]
+
+    def get_context(self, query: str, k: int, mode: Optional[str] = None) -> str:
+        """
+        Formats the top k chunks for a query as a prompt-ready reference block.
+        """
+        return self.format_context(self.search(query, k, mode))
+
+    @staticmethod
+    def format_context(chunks: List[Chunk]) -> str:
+        return "\n\n".join(f"[{chunk.label()}]\n{chunk.text}" for chunk in chunks)
+
+    @staticmethod
+    def _fuse(
+        lexical: List[Tuple[int, float]], semantic: List[Tuple[int, float]], k: int
+    ) -> List[Tuple[int, float]]:
+        """
+        Reciprocal rank fusion of two ranked result lists.
+        """
+        scores: Dict[int, float] = {}
+        for hits in (lexical, semantic):
+            for rank, (chunk_id, _) in enumerate(hits):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, index_path: str) -> None:
+        """
+        Persists the chunks and index to a gzipped JSON file.
+        """
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        payload = {
+            "format_version": FORMAT_VERSION,
+            "fingerprint": self.fingerprint,
+            "chunks": [asdict(chunk) for chunk in self.chunks],
+            "index": self.index.to_dict(),
+        }
+        with replace_atomically(index_path) as tmp_path:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(payload, f)
+        logger.info("Saved knowledge index with %d chunks to %s", len(self.chunks), index_path)
+
+    @staticmethod
+    def _load(index_path: str) -> Optional[Tuple[List[Chunk], BM25Index, str]]:
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with gzip.open(index_path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable knowledge index %s: %s", index_path, e)
+            return None
+        if payload.get("format_version") != FORMAT_VERSION:
+            return None
+        chunks = [Chunk(**chunk) for chunk in payload["chunks"]]
+        return chunks, BM25Index.from_dict(payload["index"]), payload["fingerprint"]
+
+
+def load_knowledge_store() -> KnowledgeStore:
+    """
+    Loads (building or refreshing as needed) the knowledge store configured in
+    the settings.
+    """
+    embedder = None
+    if settings.RETRIEVAL_MODE != "lexical":
+        embedder = create_embedder(
+            settings.EMBEDDING_BACKEND, settings.EMBEDDING_DIMENSION
+        )
+    return KnowledgeStore.load_or_build(
+        settings.KNOWLEDGE_DIR,
+        settings.KNOWLEDGE_INDEX_DIR,
+        chunk_size=settings.KNOWLEDGE_CHUNK_SIZE,
+        chunk_overlap=settings.KNOWLEDGE_CHUNK_OVERLAP,
+        max_workers=settings.KNOWLEDGE_EXTRACTION_WORKERS or None,
+        embedder=embedder,
+        mode=settings.RETRIEVAL_MODE,
+    )
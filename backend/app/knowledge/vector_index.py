@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .embeddings import Embedder
+from .files import replace_atomically
+
+logger = logging.getLogger("rfpai.knowledge.vector_index")
+
+VECTORS_FILENAME = "vectors.npy"
+METADATA_FILENAME = "vectors.json"
+
+
+class VectorIndex:
+    """
+    Dense chunk embeddings stored as a float32 .npy matrix and opened with
+    np.memmap, so every worker process on the host shares the same pages.
+
+    Rows are unit length, so cosine similarity is a single matrix-vector product.
+    """
+
+    def __init__(self, matrix: np.ndarray, embedder_name: str, fingerprint: str):
+        self.matrix = matrix
+        self.embedder_name = embedder_name
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        index_dir: str,
+        embedder: Embedder,
+        texts: List[str],
+        fingerprint: str,
+        batch_size: int = 1024,
+    ) -> "VectorIndex":
+        """
+        Embeds the texts in batches straight into an on-disk matrix.
+
+        Args:
+            index_dir (str): Folder to write the matrix and its metadata to.
+            embedder (Embedder): The embedder to use.
+            texts (List[str]): Chunk texts, in chunk_id order.
+            fingerprint (str): Version of the chunks the vectors belong to.
+            batch_size (int): Number of texts embedded at a time.
+
+        Returns:
+            VectorIndex: The index, memory-mapped read-only.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        path = os.path.join(index_dir, VECTORS_FILENAME)
+        shape = (len(texts), embedder.dimension)
+        if not texts:
+            return cls(np.zeros(shape, dtype=np.float32), embedder.name, fingerprint)
+
+        with replace_atomically(path) as tmp_path:
+            matrix = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=np.float32, shape=shape
+            )
+            for start in range(0, len(texts), batch_size):
+                batch = texts[start : start + batch_size]
+                matrix[start : start + len(batch)] = embedder.embed(batch)
+            matrix.flush()
+            del matrix
+
+        with replace_atomically(os.path.join(index_dir, METADATA_FILENAME)) as tmp_path:
+            with open(tmp_path, "w") as f:
+                json.dump({"embedder": embedder.name, "fingerprint": fingerprint}, f)
+        logger.info("Built vector index with %d rows using %s", len(texts), embedder.name)
+        return cls.open(index_dir)
+
+    @classmethod
+    def open(cls, index_dir: str) -> Optional["VectorIndex"]:
+        """
+        Memory-maps a previously built index, or returns None if there is none.
+        """
+        path = os.path.join(index_dir, VECTORS_FILENAME)
+        metadata_path = os.path.join(index_dir, METADATA_FILENAME)
+        if not (os.path.exists(path) and os.path.exists(metadata_path)):
+            return None
+        try:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            matrix = np.load(path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable vector index %s: %s", path, e)
+            return None
+        return cls(matrix, metadata["embedder"], metadata["fingerprint"])
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """
+        Returns the k rows with the highest cosine similarity to the query.
+
+        Args:
+            query_vector (np.ndarray): A unit-length query embedding.
+            k (int): Number of results.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        n_rows = len(self)
+        if n_rows == 0 or k <= 0:
+            return []
+        scores = self.matrix @ query_vector.astype(np.float32, copy=False)
+        k = min(k, n_rows)
+        top = np.argpartition(scores, n_rows - k)[n_rows - k :]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def search_many(
+        self, query_matrix: np.ndarray, k: int, block_size: int = 128
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Top k search for many queries at once.
+
+        Queries are scored in blocks with one matrix product per block
+        (queries x chunks), and the top k of every row is selected with a single
+        argpartition over the whole block.
+
+        Args:
+            query_matrix (np.ndarray): (n_queries, dimension) unit-length embeddings.
+            k (int): Number of results per query.
+            block_size (int): Queries scored per matrix product; bounds the size
+                of the score matrix to block_size x n_chunks.
+
+        Returns:
+            List[List[Tuple[int, float]]]: Per query, (chunk_id, similarity) pairs, best first.
+        """
+        n_queries, n_rows = query_matrix.shape[0], len(self)
+        if n_rows == 0 or k <= 0:
+            return [[] for _ in range(n_queries)]
+        k = min(k, n_rows)
+        queries = query_matrix.astype(np.float32, copy=False)
+        results = []
+        for start in range(0, n_queries, block_size):
+            scores = queries[start : start + block_size] @ self.matrix.T
+            top = np.argpartition(scores, n_rows - k, axis=1)[:, n_rows - k :]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            results.extend(
+                list(zip(ids.tolist(), row_scores.tolist()))
+                for ids, row_scores in zip(top, top_scores)
+            )
+        return results
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, List
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Imported for its tables, which it registers on Base.metadata.
+from . import models
+from .database import Base
+
+logger = logging.getLogger("rfpai.migrations")
+
+# Versions applied to the database, kept apart from the application tables.
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    One versioned schema change. upgrade runs on a synchronous connection
+    inside the migration's own transaction, and must be safe on a database
+    create_all already brought up to date.
+    """
+
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def _create_tables(conn: Connection) -> None:
+    Base.metadata.create_all(conn)
+
+
+def _add_column(conn: Connection, table: str, column: str, definition: str) -> None:
+    if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return
+    add = "ADD" if conn.dialect.name == "mssql" else "ADD COLUMN"
+    conn.exec_driver_sql(f"ALTER TABLE {table} {add} {column} {definition}")
+    logger.info("Added column %s.%s", table, column)
+
+
+def _add_late_columns(conn: Connection) -> None:
+    # Columns added to tables that databases created earlier already have.
+    _add_column(
+        conn, "questions", "duplicate_of", "INTEGER NULL REFERENCES questions (question_id)"
+    )
+    _add_column(conn, "generation_jobs", "priority", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "work_items", "priority", "INTEGER NOT NULL DEFAULT 0")
+
+
+# The counts of app.crud.rfps.summary_counts as they were when the columns
+# were added. Spelled out, so later changes to the application code can't
+# change what this migration does.
+_SCORED = """
+    FROM questions q
+    JOIN llm_responses r ON r.question_id = q.question_id
+    JOIN evaluations e ON e.eval_id = (
+        SELECT MAX(n.eval_id) FROM evaluations n WHERE n.response_id = r.response_id
+    )
+    WHERE q.rfp_id = rfps.rfp_id AND e.score IS NOT NULL
+"""
+_BACKFILL_RFP_SUMMARIES = text(
+    f"""
+    UPDATE rfps SET
+        question_count = (
+            SELECT COUNT(*) FROM questions q WHERE q.rfp_id = rfps.rfp_id
+        ),
+        answered_count = (
+            SELECT COUNT(*) FROM questions q
+            WHERE q.rfp_id = rfps.rfp_id
+            AND EXISTS (SELECT 1 FROM llm_responses r WHERE r.question_id = q.question_id)
+        ),
+        score_total = (SELECT COALESCE(SUM(e.score), 0) {_SCORED}),
+        score_count = (SELECT COUNT(*) {_SCORED})
+    """
+)
+
+
+def _add_rfp_summaries(conn: Connection) -> None:
+    # Summary columns of the RFP listing, counted once for the existing RFPs.
+    for column in ("question_count", "answered_count", "score_total", "score_count"):
+        _add_column(conn, "rfps", column, "INTEGER NOT NULL DEFAULT 0")
+    conn.execute(_BACKFILL_RFP_SUMMARIES)
+    create_indexes("ix_rfps_status_rfp_id")(conn)
+
+
+def _add_job_owners(conn: Connection) -> None:
+    # Lets a process tell the jobs of a live process from those of a dead one.
+    for column, type_ in (("owner", String(255)), ("heartbeat_at", DateTime(timezone=True))):
+        _add_column(
+            conn, "generation_jobs", column, f"{type_.compile(dialect=conn.dialect)} NULL"
+        )
+
+
+def create_indexes(*names: str) -> Callable[[Connection], None]:
+    def upgrade(conn: Connection) -> None:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(conn, checkfirst=True)
+                    logger.info("Created index %s", index.name)
+
+    return upgrade
+
+
+# Indexes behind the per-RFP, per-question and per-response lookups of app.crud.
+HOT_INDEXES = (
+    "ix_questions_rfp_id_question_id",
+    "ix_llm_responses_question_id_response_id",
+    "ix_evaluations_response_id_eval_id",
+)
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Create tables", _create_tables),
+    Migration(2, "Add priority and duplicate_of columns", _add_late_columns),
+    Migration(
+        3,
+        "Index questions by RFP, responses by question and evaluations by response",
+        create_indexes(*HOT_INDEXES),
+    ),
+    Migration(4, "Add RFP summary counts and index RFPs by status", _add_rfp_summaries),
+    Migration(5, "Add owner and heartbeat of generation jobs", _add_job_owners),
+]
+
+
+async def applied_versions(engine: AsyncEngine) -> List[int]:
+    """
+    Versions of the migrations applied to the database, in order.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(_metadata.create_all)
+        result = await conn.execute(
+            select(schema_migrations.c.version).order_by(schema_migrations.c.version)
+        )
+        return list(result.scalars().all())
+
+
+async def migrate(engine: AsyncEngine) -> List[int]:
+    """
+    Applies the migrations the database has not seen yet, each in its own
+    transaction, and records them in schema_migrations.
+
+    Args:
+        engine (AsyncEngine): Engine of the database to migrate.
+
+    Returns:
+        List[int]: The versions applied by this call.
+    """
+    applied = set(await applied_versions(engine))
+    done = []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        async with engine.begin() as conn:
+            await conn.run_sync(migration.upgrade)
+            await conn.execute(
+                schema_migrations.insert().values(
+                    version=migration.version, description=migration.description
+                )
+            )
+        logger.info("Applied migration %d: %s", migration.version, migration.description)
+        done.append(migration.version)
+    return done
+
+
+if __name__ == "__main__":
+    from .database import async_engine
+
+    logging.basicConfig(level=logging.INFO)
+    versions = asyncio.run(migrate(async_engine))
+    print(f"Applied migrations: {versions or 'none, the database is up to date'}")
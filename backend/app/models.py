@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -13,6 +13,7 @@ class RFPStatus(enum.Enum):
     GENERATING_PRESENTATION = "generating_presentation"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class QuestionStatus(enum.Enum):
@@ -23,8 +24,26 @@ class QuestionStatus(enum.Enum):
     FAILED = "failed"
 
 
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class WorkStatus(enum.Enum):
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
 class RFP(Base):
     __tablename__ = "rfps"
+    # RFPs of a status, newest first (the GET /files/ listing).
+    __table_args__ = (Index("ix_rfps_status_rfp_id", "status", "rfp_id"),)
 
     rfp_id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), index=True, nullable=False)
@@ -34,6 +53,13 @@ class RFP(Base):
     presentations = relationship("Presentation", back_populates="rfp")
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     status = Column(Enum(RFPStatus), default=RFPStatus.UPLOADED, nullable=False)
+    # Summary kept up to date by app.crud as rows are written, so listing RFPs
+    # never counts their questions. The average score is score_total / score_count
+    # over the latest evaluation of each evaluated response.
+    question_count = Column(Integer, nullable=False, default=0, server_default="0")
+    answered_count = Column(Integer, nullable=False, default=0, server_default="0")
+    score_total = Column(Integer, nullable=False, default=0, server_default="0")
+    score_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     def __repr__(self):
         return f"<RFP(rfp_id={self.rfp_id}, filename='{self.filename}', status='{self.status.value}')>"
@@ -41,12 +67,16 @@ class RFP(Base):
 
 class Question(Base):
     __tablename__ = "questions"
+    # Questions of an RFP in id order (app.crud.questions, the answer sheet).
+    __table_args__ = (Index("ix_questions_rfp_id_question_id", "rfp_id", "question_id"),)
 
     question_id = Column(Integer, primary_key=True, index=True)
     rfp_id = Column(Integer, ForeignKey("rfps.rfp_id"), nullable=False)
     question_text = Column(Text, nullable=False)
     question_context = Column(Text, nullable=True)
     page_number = Column(Integer, nullable=True)
+    # Earlier question of the same RFP this one repeats; it shares its answer.
+    duplicate_of = Column(Integer, ForeignKey("questions.question_id"), nullable=True)
     extracted_at = Column(DateTime(timezone=True), server_default=func.now())
     rfp = relationship("RFP", back_populates="questions")
     llm_responses = relationship("LLMResponse", back_populates="question")
@@ -61,6 +91,10 @@ class Question(Base):
 
 class LLMResponse(Base):
     __tablename__ = "llm_responses"
+    # Latest response of a question: the last entry of the question's range.
+    __table_args__ = (
+        Index("ix_llm_responses_question_id_response_id", "question_id", "response_id"),
+    )
 
     response_id = Column(Integer, primary_key=True, index=True)
     question_id = Column(Integer, ForeignKey("questions.question_id"), nullable=False)
@@ -78,6 +112,10 @@ class LLMResponse(Base):
 
 class Evaluation(Base):
     __tablename__ = "evaluations"
+    # Evaluations of a response, latest last.
+    __table_args__ = (
+        Index("ix_evaluations_response_id_eval_id", "response_id", "eval_id"),
+    )
 
     eval_id = Column(Integer, primary_key=True, index=True)
     response_id = Column(
@@ -103,3 +141,49 @@ class Presentation(Base):
     generation_time_s = Column(Integer, nullable=True)
     rfp = relationship("RFP", back_populates="presentations")
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    rfp_id = Column(Integer, ForeignKey("rfps.rfp_id"), nullable=False)
+    mode = Column(String(20), nullable=False)
+    priority = Column(Integer, default=0, nullable=False)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    total_questions = Column(Integer, nullable=True)
+    processed_questions = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Process running the job and when it last said it still is.
+    owner = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<GenerationJob(job_id={self.job_id}, rfp_id={self.rfp_id}, status='{self.status.value}')>"
+
+
+class WorkItem(Base):
+    __tablename__ = "work_items"
+    __table_args__ = (Index("ix_work_items_status_lease", "status", "lease_expires_at"),)
+
+    item_id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("generation_jobs.job_id"), nullable=False, index=True)
+    rfp_id = Column(Integer, ForeignKey("rfps.rfp_id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.question_id"), nullable=False)
+    mode = Column(String(20), nullable=False)
+    priority = Column(Integer, default=0, nullable=False)
+    status = Column(Enum(WorkStatus), default=WorkStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    lease_owner = Column(String(100), nullable=True)
+    claim_token = Column(String(36), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<WorkItem(item_id={self.item_id}, question_id={self.question_id}, status='{self.status.value}')>"
@@ -1,28 +1,36 @@
-from app.agents.presentation_generation_agent import PresentationGenerationAgent
-from openpyxl.styles import Alignment
-from openpyxl import load_workbook
 from app.crud import evaluations
-from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from app.services.spreadsheet_parser import SpreadsheetHandler
-from fastapi.responses import FileResponse
-import asyncio
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Optional
 from ..crud import rfps, questions, llm_responses
-from ..models import RFPStatus
-from ..agents.question_processing_agent import QuestionProcessingAgent
-from ..agents.data_contextualization_agent import DataContextualizationAgent
-from ..agents.data_retrieval_agent import DataRetrievalAgent
+from ..models import QuestionStatus, RFPStatus
+from ..core.config import settings
+from ..services.generation_service import (
+    GENERATION_MODES,
+    GenerationService,
+    get_generation_service,
+)
+from ..services.progress import TERMINAL_EVENTS, poll_job_events
+from ..services.scheduler import MAX_PRIORITY, MIN_PRIORITY
 from ..database import async_session_factory
+import numpy as np
 import pandas as pd
-from sqlalchemy.orm import Session
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Response
+import asyncio
+import json
+from datetime import datetime
 import logging
 import os
-
-from app import models
+import time
 
 allowed_extensions = [".xlsx"]
 
+# Seconds between keep-alive comments on an idle event stream.
+EVENT_STREAM_HEARTBEAT_S = 15
+
+# RFPs per page of GET /files/, by default and at most.
+FILES_PAGE_SIZE = 20
+FILES_MAX_PAGE_SIZE = 100
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
@@ -65,7 +73,11 @@ async def create_upload_file(file: UploadFile = File(...)):
 
 
 @router.post("/revise/{id}")
-async def update_answers(id, file: UploadFile = File(...)):
+async def update_answers(
+    id,
+    file: UploadFile = File(...),
+    service: GenerationService = Depends(get_generation_service),
+):
     if not file.filename:
         raise HTTPException(status_code=400, detail="Invalid filename or not a file")
 
@@ -79,11 +91,12 @@ async def update_answers(id, file: UploadFile = File(...)):
     except Exception:
         raise HTTPException(status_code=500, detail="Could not upload file")
     finally:
-        print("REVISE: File saved")
         await file.close()
+    logger.info("REVISE: File saved as %s", file_location)
 
     try:
         await register_revision_for_rfp("revisedfiles/" + id + ".xlsx", id)
+        await service.refresh_answer_library()
         return {"message": "Revision saved"}
     except Exception as e:
         if os.path.exists(file_location):
@@ -94,79 +107,181 @@ async def update_answers(id, file: UploadFile = File(...)):
         )
 
 
-@router.post("/generate/{id}")
-async def generate_answers(id: int):
+@router.post("/generate/{id}", status_code=202)
+async def generate_answers(
+    id: int,
+    response: Response,
+    mode: Optional[str] = None,
+    priority: int = 0,
+    service: GenerationService = Depends(get_generation_service),
+):
     """
-    Generate answers for all questions in the specified RFP by processing them through
-    the data retrieval and data contextualization agents.
+    Queues answer generation for all questions in the specified RFP and returns
+    at once. Progress is reported by GET /jobs/{job_id}. If the RFP's answers
+    are already being generated, no job is queued and the active one is
+    returned instead, with status 200.
+
+    mode selects the pipeline, one of GENERATION_MODES; defaults to the
+    GENERATION_MODE setting. priority, from MIN_PRIORITY to MAX_PRIORITY
+    (e.g. for an urgent deadline), starts the job ahead of lower priority
+    ones and gives its questions priority + 1 times the share of the
+    generation capacity of a priority 0 RFP running at the same time.
     """
-    question_processing_agent = QuestionProcessingAgent()
-    await question_processing_agent.process(id)
+    mode = mode or settings.GENERATION_MODE
+    if mode not in GENERATION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown generation mode {mode!r}, expected one of {GENERATION_MODES}",
+        )
+    if not MIN_PRIORITY <= priority <= MAX_PRIORITY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Priority must be between {MIN_PRIORITY} and {MAX_PRIORITY}",
+        )
     async with async_session_factory() as session:
-        try:
-            rfp_questions = await questions.get_questions_by_rfp(session, id)
-
-            if not rfp_questions:
-                logger.info(f"No questions found for RFP ID {id}")
-                return {"message": f"No questions found for RFP ID {id}!"}
-
-            logger.info(f"Found {len(rfp_questions)} questions for RFP ID {id}")
+        if await rfps.get_rfp(session, id) is None:
+            raise HTTPException(status_code=404, detail=f"RFP {id} not found")
+    job, created = await service.jobs.submit(id, mode, priority)
+    if not created:
+        response.status_code = 200
+    return {
+        "message": (
+            f"Generation queued for RFP ID {id}"
+            if created
+            else f"Generation of RFP ID {id} is already {job.status.value}"
+        ),
+        "job_id": job.job_id,
+        "rfp_id": id,
+        "mode": job.mode,
+        "priority": job.priority,
+        "status": job.status.value,
+    }
+
+
+@router.post("/generate/{id}/cancel")
+async def cancel_generation(
+    id: int, service: GenerationService = Depends(get_generation_service)
+):
+    """
+    Stops the queued or running answer generation of an RFP.
 
-            data_retrieval_agent = DataRetrievalAgent()
-            contextualization_agent = DataContextualizationAgent()
+    Outstanding question tasks and LLM calls are dropped, answers stored so
+    far are kept and the RFP is marked cancelled. Generating again later only
+    answers the remaining questions.
+    """
+    async with async_session_factory() as session:
+        if await rfps.get_rfp(session, id) is None:
+            raise HTTPException(status_code=404, detail=f"RFP {id} not found")
+    cancelled = await service.jobs.cancel(id)
+    if not cancelled:
+        raise HTTPException(
+            status_code=409, detail=f"No generation is running for RFP {id}"
+        )
+    return {
+        "message": f"Generation cancelled for RFP ID {id}",
+        "rfp_id": id,
+        "job_ids": cancelled,
+        "status": RFPStatus.CANCELLED.value,
+    }
 
-            tasks = []
 
-            for question in rfp_questions:
-                if question is None:
-                    logger.error(f"Encountered None in rfp_questions for RFP ID {id}")
-                    continue
+@router.get("/generate/{id}/events")
+async def stream_generation_events(
+    id: int, service: GenerationService = Depends(get_generation_service)
+):
+    """
+    Server-Sent Events stream of the generation progress of an RFP.
 
-                question_id = question.question_id
+    Starts with a "snapshot" of the latest run, if any, then sends an event
+    each time a question is retrieved, contextualized, persisted or fails
+    ("question_failed"), with running totals, throughput and ETA. The stream
+    ends after the run's "finished" or "failed" event, or right after the
+    snapshot if the run had already ended.
 
-                logger.info(f"Processing question ID {question_id} for RFP ID {id}")
+    With WORK_QUEUE_ENABLED the questions are answered by workers in any
+    process, so the stream follows the RFP's latest job in the database
+    instead and sends a "progress" event whenever its totals change.
+    """
 
-                tasks.append(
-                    orchestrate_processing(
-                        question_id, data_retrieval_agent, contextualization_agent
+    def format_event(event: dict) -> str:
+        return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    async def job_events():
+        idle_since = time.monotonic()
+        async for event in poll_job_events(id, settings.WORK_QUEUE_POLL_S):
+            if event is not None:
+                idle_since = time.monotonic()
+                yield format_event(event)
+            elif time.monotonic() - idle_since >= EVENT_STREAM_HEARTBEAT_S:
+                idle_since = time.monotonic()
+                yield ": keep-alive\n\n"
+
+    async def events():
+        queue = service.progress.subscribe(id)
+        try:
+            snapshot = service.progress.snapshot(id)
+            if snapshot is not None:
+                yield format_event({"event": "snapshot", "question_id": None, **snapshot})
+                if snapshot["status"] in TERMINAL_EVENTS:
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=EVENT_STREAM_HEARTBEAT_S
                     )
-                )
-
-            await asyncio.gather(*tasks)
-            await write_questions(id)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event)
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            service.progress.unsubscribe(id, queue)
 
-            await rfps.update_rfp_status(session, id, RFPStatus.PENDING_REVIEW)
-            logger.info(
-                f"Completed processing {len(rfp_questions)} questions for RFP ID {id}"
-            )
-            return {
-                "message": f"Successfully processed {len(rfp_questions)} questions for RFP ID {id}!"
-            }
-        except Exception as e:
-            logger.error(f"Error in generate_answers: {e}")
-            raise HTTPException(
-                status_code=500, detail=f"Error generating answers: {str(e)}"
-            )
+    return StreamingResponse(
+        job_events() if settings.WORK_QUEUE_ENABLED else events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-async def orchestrate_processing(
-    question_id: int,
-    data_retrieval_agent: DataRetrievalAgent,
-    contextualization_agent: DataContextualizationAgent,
+@router.get("/")
+async def get_uploaded_files(
+    cursor: Optional[int] = None,
+    limit: int = FILES_PAGE_SIZE,
+    status: Optional[str] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
 ):
-    # Process through data retrieval agent
-    await data_retrieval_agent.process(question_id)
-    logger.info(f"Data retrieval completed for question ID {question_id}")
-
-    # Process through data contextualization agent
-    await contextualization_agent.process(question_id)
-    logger.info(f"Data contextualization completed for question ID {question_id}")
-
+    """
+    Lists RFPs newest first, a page at a time. Pass the next_cursor of a page
+    as cursor to get the following one; it is null on the last page.
+    """
+    if not 1 <= limit <= FILES_MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Limit must be between 1 and {FILES_MAX_PAGE_SIZE}",
+        )
+    rfp_status = None
+    if status is not None:
+        try:
+            rfp_status = RFPStatus(status)
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown RFP status {status!r}, expected one of "
+                f"{[s.value for s in RFPStatus]}",
+            )
 
-@router.get("/")
-async def get_uploaded_files():
     async with async_session_factory() as session:
-        files = await rfps.get_rfps(session)
+        files, next_cursor = await rfps.list_rfps(
+            session,
+            limit,
+            before_id=cursor,
+            status=rfp_status,
+            uploaded_from=uploaded_after,
+            uploaded_to=uploaded_before,
+        )
         file_list = []
         for rfp in files:
             rfp_json = {
@@ -174,9 +289,16 @@ async def get_uploaded_files():
                 "filename": rfp.filename,
                 "uploaded_at": rfp.uploaded_at,
                 "status": rfp.status,
+                "question_count": rfp.question_count,
+                "answered_count": rfp.answered_count,
+                "average_score": (
+                    round(rfp.score_total / rfp.score_count, 2)
+                    if rfp.score_count
+                    else None
+                ),
             }
             file_list.append(rfp_json)
-        return file_list
+        return {"items": file_list, "next_cursor": next_cursor}
 
 
 @router.get("/download/{rfp_id}")
@@ -202,8 +324,10 @@ async def download_ppt(rfp_id: str):
 
 
 @router.post("/generateppt/{rfp_id}")
-async def generate_ppt(rfp_id: str):
-    agent = PresentationGenerationAgent()
+async def generate_ppt(
+    rfp_id: str, service: GenerationService = Depends(get_generation_service)
+):
+    agent = service.presentation_agent
     try:
         await agent.process(int(rfp_id))
         return {"message": f"PPT generated successfully for RFP {rfp_id}"}
@@ -211,74 +335,52 @@ async def generate_ppt(rfp_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to generate PPT: {str(e)}")
 
 
-async def write_questions(rfp_id: int) -> None:
-    """
-    Fetches all questions for a given RFP ID and writes them to Excel.
-
-    Args:
-        rfp_id: The RFP ID to fetch questions for.
-        writer: An instance of ExcelWriter.
-        db_session: Database session/connection for fetching questions.
-    """
-    writer = SpreadsheetHandler(str(rfp_id) + ".xlsx")
+# Columns of the review state returned by evaluations.get_review_state.
+REVIEW_STATE_COLUMNS = [
+    "question_id",
+    "question_text",
+    "response_id",
+    "response",
+    "eval_id",
+    "previous_answer",
+    "previous_score",
+    "previous_comments",
+]
 
-    async with async_session_factory() as session:
-        qlist = await questions.get_questions_by_rfp(session, rfp_id)
 
-        if not qlist:
-            print(f"No questions found for RFP ID {rfp_id}")
-            return
-        qlist = sorted(qlist, key=lambda q: q.question_id)
+def _text_or_none(column: pd.Series) -> pd.Series:
+    return column.astype(str).astype(object).where(column.notna(), None)
 
-        question_dicts = []
 
-        for idx, q in enumerate(qlist):
-            ans = await llm_responses.get_llm_responses_by_question(
-                session, q.question_id
-            )
-            anstext = ans.response
-            question_dict = {
-                "S.No": idx + 1,
-                "Questions": q.question_text,
-                "Answers": anstext,
-                "Ratings": "",
-                "Comments": "",
+def _review_hashes(answers: pd.Series, scores: pd.Series, comments: pd.Series) -> pd.Series:
+    """
+    Hash of each (answer, score, comments) row, to find revised rows without
+    comparing the columns one by one.
+    """
+    return pd.util.hash_pandas_object(
+        pd.DataFrame(
+            {
+                "answer": answers.fillna("").astype(str).to_numpy(),
+                "score": scores.astype("Int64").astype(str).to_numpy(),
+                "comments": comments.fillna("").astype(str).to_numpy(),
             }
-            question_dicts.append(question_dict)
-        writer.write_to_sheet(question_dicts)
-
-        wb = load_workbook(writer.path)
-        ws = wb.active
+        ),
+        index=False,
+    ).to_numpy()
 
-        for col in ws.columns:
-            max_length = 0
-            col_letter = col[0].column_letter
-            for cell in col:
-                try:
-                    if cell.value:
-                        # Wrap text for all cells
-                        cell.alignment = Alignment(wrap_text=True, vertical="top")
-                        max_length = max(max_length, len(str(cell.value)))
-                except Exception:
-                    pass
-            adjusted_width = min(
-                max_length + 2, 60
-            )  # cap width so it doesn't get too wide
-            ws.column_dimensions[col_letter].width = adjusted_width
-
-        wb.save(writer.path)
-
-        logger.info("Questions for RFP %s written to %s", rfp_id, writer.path)
 
-
-async def register_revision_for_rfp(file_path: str, rfp_id: int):
+def read_revision(file_path: str) -> pd.DataFrame:
     """
-    Reads an Excel file with questions, answers, ratings, comments,
-    and creates/updates Evaluations for the given RFP.
+    Reads a revised answer sheet.
 
     Args:
         file_path (str): Path to Excel file
-        rfp_id (int): The RFP ID
+
+    Returns:
+        pd.DataFrame: question_text, key (normalized question text), answer,
+        score and comments of every row.
+    Raises:
+        ValueError: If a required column is missing, or a rating is not a number.
     """
     df = pd.read_excel(file_path)
 
@@ -290,59 +392,130 @@ async def register_revision_for_rfp(file_path: str, rfp_id: int):
             f"Missing required columns: {required_columns - set(df.columns)}"
         )
 
+    question_text = df["questions"].astype(str).str.strip()
+    scores = pd.to_numeric(df["ratings"])
+    return pd.DataFrame(
+        {
+            "question_text": question_text,
+            "key": question_text.str.lower(),
+            "answer": _text_or_none(df["answers"]),
+            "score": np.trunc(scores).astype("Int64"),
+            "comments": _text_or_none(df["comments"]),
+        }
+    )
+
+
+async def register_revision_for_rfp(file_path: str, rfp_id: int):
+    """
+    Reads an Excel file with questions, answers, ratings, comments,
+    and creates Evaluations for the given RFP.
+
+    The sheet is joined with the RFP's questions on their normalized text.
+    Questions the SME added get a question and a response. A row gets an
+    evaluation only when its answer, rating or comments differ from the latest
+    evaluation of its response, so re-importing a sheet records nothing twice;
+    a question listed more than once is revised by its last row.
+    Everything is written in bulk, in one transaction.
+
+    Args:
+        file_path (str): Path to Excel file
+        rfp_id (int): The RFP ID
+
+    Returns:
+        List[int]: The IDs of the new evaluations.
+    """
+    sheet = read_revision(file_path)
+
     async with async_session_factory() as session:
-        result = await session.execute(
-            select(models.Question)
-            .where(models.Question.rfp_id == rfp_id)
-            .options(selectinload(models.Question.llm_responses))
+        state = pd.DataFrame(
+            await evaluations.get_review_state(session, rfp_id),
+            columns=REVIEW_STATE_COLUMNS,
         )
-        question_list = result.scalars().all()
-
-        question_map = {}
-        for q in question_list:
-            if q.llm_responses:
-                llm_response = q.llm_responses[-1]
-                question_map[q.question_text.strip().lower()] = llm_response
-
-        created_ids = []
-
-        for _, row in df.iterrows():
-            q_text = str(row["questions"]).strip()
-            q_key = q_text.lower()
-
-            llm_response = question_map.get(q_key)
-
-            if not llm_response:
-                new_question = await questions.create_question(session, rfp_id, q_text)
-
-                new_response = await llm_responses.create_llm_response(
-                    session,
-                    new_question.question_id,
-                    str(row["answers"]) if not pd.isna(row["answers"]) else "",
-                    retrieved_context="N/A Human provided question",
-                )
-
-                llm_response = new_response
-                question_map[q_key] = llm_response
-
-                logger.info(f"Created new Question + LLMResponse for: {q_text}")
-
-            new_eval = await evaluations.create_evaluation(
-                db=session,
-                response_id=llm_response.response_id,
-                original_response=llm_response.response,
-                fine_tuned_response=str(row["answers"])
-                if not pd.isna(row["answers"])
-                else None,
-                score=int(row["ratings"]) if not pd.isna(row["ratings"]) else None,
-                sme_comments=str(row["comments"])
-                if not pd.isna(row["comments"])
-                else None,
+        state["key"] = state["question_text"].str.strip().str.lower()
+        # Of questions sharing a text, the latest answered one takes the revision.
+        state = (
+            state.assign(answered=state["response_id"].notna())
+            .sort_values(["answered", "question_id"])
+            .drop_duplicates("key", keep="last")
+            .drop(columns=["question_text", "answered"])
+        )
+        rows = sheet.merge(state, on="key", how="left")
+
+        try:
+            new_questions = rows[rows["question_id"].isna()].drop_duplicates("key")
+            question_ids = await questions.create_questions(
+                session,
+                rfp_id,
+                new_questions["question_text"].tolist(),
+                status=QuestionStatus.REVIEWED,
+                commit=False,
+            )
+            rows["question_id"] = rows["question_id"].fillna(
+                rows["key"].map(dict(zip(new_questions["key"], question_ids)))
+            )
+
+            unanswered = rows[rows["response_id"].isna()].drop_duplicates("key")
+            answers = unanswered["answer"].fillna("").tolist()
+            response_ids = await llm_responses.create_llm_responses(
+                session,
+                [
+                    {
+                        "question_id": int(question_id),
+                        "response": answer,
+                        "retrieved_context": "N/A Human provided question",
+                    }
+                    for question_id, answer in zip(unanswered["question_id"], answers)
+                ],
+                question_status=QuestionStatus.REVIEWED,
+                commit=False,
+            )
+            rows["response_id"] = rows["response_id"].fillna(
+                rows["key"].map(dict(zip(unanswered["key"], response_ids)))
+            )
+            rows["response"] = rows["response"].fillna(
+                rows["key"].map(dict(zip(unanswered["key"], answers)))
+            )
+            logger.info(
+                f"Created {len(question_ids)} new Questions and {len(response_ids)} "
+                f"LLMResponses for RFP {rfp_id}"
+            )
+
+            rows["hash"] = _review_hashes(rows["answer"], rows["score"], rows["comments"])
+            previous = _review_hashes(
+                rows["previous_answer"], rows["previous_score"], rows["previous_comments"]
+            )
+            # A question listed twice is revised by its last row.
+            changed = rows[rows["eval_id"].isna() | (rows["hash"] != previous)]
+            changed = changed[~rows["key"].duplicated(keep="last")[changed.index]]
+
+            created_ids = await evaluations.create_evaluations(
+                session,
+                [
+                    {
+                        "response_id": int(response_id),
+                        "original_response": response,
+                        "fine_tuned_response": answer,
+                        "score": None if pd.isna(score) else int(score),
+                        "sme_comments": comments,
+                    }
+                    for response_id, response, answer, score, comments in zip(
+                        changed["response_id"],
+                        changed["response"],
+                        changed["answer"],
+                        changed["score"],
+                        changed["comments"],
+                    )
+                ],
+                commit=False,
             )
-            created_ids.append(new_eval.eval_id)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
 
         logger.info(
-            f"Registered/updated {len(created_ids)} evaluations for RFP {rfp_id} from {file_path}"
+            f"Registered {len(created_ids)} evaluations for RFP {rfp_id} from {file_path}; "
+            f"{len(rows) - len(changed)} rows were unchanged"
         )
 
         await rfps.update_rfp_status(session, rfp_id, RFPStatus.REVIEWED)
@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+import logging
+
+from ..crud import jobs, questions
+from ..database import async_session_factory
+from ..services.dedup import estimate_calls_saved
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/jobs",
+)
+
+
+def _seconds_between(start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
+    if start is None:
+        return None
+    # SQLite hands back naive datetimes; every timestamp we store is UTC.
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    end = end or datetime.now(timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    return round((end - start).total_seconds(), 3)
+
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: int):
+    """
+    State, progress and timing of a generation job, and the LLM calls saved
+    by answering repeated questions once.
+    """
+    async with async_session_factory() as session:
+        job = await jobs.get_job(session, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        duplicates = await questions.count_duplicate_questions(session, job.rfp_id)
+
+    return {
+        "job_id": job.job_id,
+        "rfp_id": job.rfp_id,
+        "mode": job.mode,
+        "priority": job.priority,
+        "status": job.status.value,
+        "total_questions": job.total_questions,
+        "processed_questions": job.processed_questions,
+        "duplicate_questions": duplicates,
+        "llm_calls_saved": estimate_calls_saved(job.mode, duplicates),
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "queued_s": _seconds_between(job.created_at, job.started_at),
+        "elapsed_s": _seconds_between(job.started_at, job.finished_at),
+    }
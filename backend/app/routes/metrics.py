@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends
+import logging
+
+from ..database import pool_stats
+from ..services.generation_service import GenerationService, get_generation_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/metrics",
+)
+
+
+@router.get("/")
+async def get_metrics(service: GenerationService = Depends(get_generation_service)):
+    """
+    Live counters of the shared generation components.
+    """
+    return {
+        "llm": service.llm.stats(),
+        "llm_cache": service.cache.stats() if service.cache else None,
+        "answer_library": (
+            service.answer_library.stats() if service.answer_library else None
+        ),
+        "jobs": service.jobs.stats(),
+        "scheduler": service.scheduler.stats(),
+        "pipeline": service.pipeline.stats(),
+        "progress": service.progress.stats(),
+        "db_pool": pool_stats(),
+        "work_queue_workers": {
+            worker.worker_id: worker.stats() for worker in service.workers
+        },
+    }
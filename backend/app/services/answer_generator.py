@@ -1,10 +1,9 @@
 from langchain_core.messages import HumanMessage, SystemMessage
 from openai import AsyncAzureOpenAI
 import PyPDF2
-import fitz
-import os
 from pydantic import SecretStr
 from ..core.config import settings
+from ..knowledge.extraction import extract_many, get_all_supported_files
 from typing import Dict
 from langchain_google_genai import ChatGoogleGenerativeAI
 
@@ -28,20 +27,17 @@ class Generator:
 
         content = " "
 
-        supported_files = self.get_all_supported_files("knowledge/")
+        supported_files = get_all_supported_files("knowledge/")
     
         if not supported_files:
             print(" No supported files found.")
     
-        for file_path in supported_files:
-            print(f"\n📄 File: {file_path}")
-            tempcontent = self.load_file_text(file_path)
-    
-            if not content or "[ERROR]" in content:
-                print(f"⚠️ Could not load content from: {file_path}")
+        for result in extract_many(supported_files):
+            print(f"\n📄 File: {result.path}")
+            if result.error:
+                print(f"⚠️ Could not load content from: {result.path}")
                 continue
-            else:
-                content += tempcontent
+            content += "\n".join(text for _, text in result.segments)
 
 
         self.knowledge = content
@@ -67,50 +63,6 @@ class Generator:
         )
         return response.choices[0].message.content.strip()
 
-    def load_pdf_text(self, file_path):
-        try:
-            doc = fitz.open(file_path)
-            return "\n".join(page.get_text() for page in doc)
-        except Exception as e:
-            return f"[PDF READ ERROR]: {e}"
-    
-    def load_txt_text(self, file_path):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            return f"[TEXT READ ERROR]: {e}"
-    
-    def load_pptx_text(self, file_path):
-        try:
-            prs = Presentation(file_path)
-            text = ""
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        text += shape.text + "\n"
-            return text
-        except Exception as e:
-            return f"[PPT READ ERROR]: {e}"
-    
-    def load_file_text(self, file_path):
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == ".pdf":
-            return self.load_pdf_text(file_path)
-        elif ext == ".txt":
-            return self.load_txt_text(file_path)
-        elif ext in [".ppt", ".pptx"]:
-            return self.load_pptx_text(file_path)
-        return None
-
-    def get_all_supported_files(self, root_folder, extensions=[".pdf", ".txt", ".ppt", ".pptx"]):
-        matched_files = []
-        for root, dirs, files in os.walk(root_folder):
-            for file in files:
-                if os.path.splitext(file)[1].lower() in extensions:
-                    matched_files.append(os.path.join(root, file))
-        return matched_files
-
     def read_pdf(self, pdf_path):
         text = ""
         try:
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..crud import evaluations
+from ..database import async_session_factory
+from ..knowledge.chunking import tokenize
+from ..knowledge.embeddings import Embedder, HashingEmbedder
+
+logger = logging.getLogger("rfpai.services.answer_library")
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_NUMBER = re.compile(r"\d+")
+
+# Nearest questions by embedding checked against the term rules per lookup.
+_CANDIDATES = 5
+
+
+def normalize_question(text: str) -> str:
+    """
+    Lowercases a question and collapses punctuation and whitespace.
+    """
+    return _NON_WORD.sub(" ", str(text).lower()).strip()
+
+
+def question_terms(key: str) -> Tuple[List[str], Set[str]]:
+    """
+    The numbers and the index terms of a normalized question.
+    """
+    return _NUMBER.findall(key), set(tokenize(key))
+
+
+def term_similarity(
+    own: Tuple[List[str], Set[str]], theirs: Tuple[List[str], Set[str]]
+) -> float:
+    """
+    Jaccard similarity of the terms of two questions, 0.0 if they mention
+    different numbers.
+    """
+    if own[0] != theirs[0]:
+        return 0.0
+    union = own[1] | theirs[1]
+    return len(own[1] & theirs[1]) / len(union) if union else 1.0
+
+
+@dataclass
+class LibraryMatch:
+    """
+    A previously reviewed question that matches a new one.
+    """
+
+    eval_id: int
+    question_text: str
+    answer: str
+    score: int
+    similarity: float
+    # True if the vetted answer can be used verbatim, False if it only
+    # serves as a draft to be adapted to the new question.
+    reusable: bool
+
+
+class AnswerLibrary:
+    """
+    Index of SME-approved answers from past evaluations.
+
+    Lookups take an exact match on the normalized question text, or else the
+    cosine similarity of question embeddings capped by the Jaccard similarity
+    of the questions' terms. Questions that mention different numbers never
+    match: "ISO 9001" and "ISO 27001" differ however close the embeddings are,
+    and so do "SSL" and "SSO" once their terms are compared. Matches at or
+    above reuse_threshold are returned as reusable, matches at or above
+    adapt_threshold as drafts.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        min_score: int = 4,
+        reuse_threshold: float = 0.92,
+        adapt_threshold: float = 0.8,
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.min_score = min_score
+        self.reuse_threshold = reuse_threshold
+        self.adapt_threshold = adapt_threshold
+        self._entries: List[Tuple[int, str, str, int]] = []
+        self._terms: List[Tuple[List[str], Set[str]]] = []
+        self._exact: Dict[str, int] = {}
+        self._matrix = np.zeros((0, self.embedder.dimension), dtype=np.float32)
+        self._stats = {"lookups": 0, "reused": 0, "adapted": 0, "misses": 0}
+
+    async def refresh(self) -> None:
+        """
+        Reloads the approved answers from the database and re-indexes them.
+        """
+        async with async_session_factory() as session:
+            rows = await evaluations.get_approved_answers(session, self.min_score)
+        await asyncio.to_thread(self._index, rows)
+        logger.info("Answer library loaded with %d approved answers.", len(self._entries))
+
+    def _index(self, rows: List[Tuple[int, str, str, int]]) -> None:
+        # Rows arrive newest first; keep the newest answer per question.
+        entries, normalized, terms, exact = [], [], [], {}
+        for row in rows:
+            key = normalize_question(row[1])
+            if not key or key in exact:
+                continue
+            exact[key] = len(entries)
+            entries.append(row)
+            normalized.append(key)
+            terms.append(question_terms(key))
+        matrix = (
+            self.embedder.embed(normalized)
+            if normalized
+            else np.zeros((0, self.embedder.dimension), dtype=np.float32)
+        )
+        self._entries, self._terms, self._exact, self._matrix = (
+            entries,
+            terms,
+            exact,
+            matrix,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def match_many(self, questions: List[str]) -> List[Optional[LibraryMatch]]:
+        """
+        Finds the best approved answer for every question.
+
+        Args:
+            questions (List[str]): The new questions.
+
+        Returns:
+            List[Optional[LibraryMatch]]: A match per question, None if nothing
+            in the library is similar enough to be used even as a draft.
+        """
+        matches: List[Optional[LibraryMatch]] = [None] * len(questions)
+        if self._entries and questions:
+            keys = [normalize_question(q) for q in questions]
+            similarities = self.embedder.embed(keys) @ self._matrix.T
+            nearest = np.argsort(-similarities, axis=1)[:, :_CANDIDATES]
+            for row, key in enumerate(keys):
+                if key in self._exact:
+                    matches[row] = self._match(self._exact[key], 1.0)
+                    continue
+                terms = question_terms(key)
+                best, best_similarity = -1, 0.0
+                for candidate in nearest[row]:
+                    similarity = min(
+                        float(similarities[row, candidate]),
+                        term_similarity(terms, self._terms[candidate]),
+                    )
+                    if similarity > best_similarity:
+                        best, best_similarity = int(candidate), similarity
+                if best_similarity >= self.adapt_threshold:
+                    matches[row] = self._match(best, best_similarity)
+
+        self._stats["lookups"] += len(questions)
+        for match in matches:
+            if match is None:
+                self._stats["misses"] += 1
+            elif match.reusable:
+                self._stats["reused"] += 1
+            else:
+                self._stats["adapted"] += 1
+        return matches
+
+    def _match(self, index: int, similarity: float) -> LibraryMatch:
+        eval_id, question_text, answer, score = self._entries[index]
+        return LibraryMatch(
+            eval_id,
+            question_text,
+            answer,
+            score,
+            similarity,
+            reusable=similarity >= self.reuse_threshold,
+        )
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Lookup counters and hit rate of the library.
+        """
+        lookups = self._stats["lookups"]
+        hits = self._stats["reused"] + self._stats["adapted"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+def create_answer_library(embedder: Optional[Embedder]) -> Optional[AnswerLibrary]:
+    """
+    Creates the answer library configured in the settings, or None if disabled.
+    """
+    if not settings.ANSWER_LIBRARY_ENABLED:
+        return None
+    return AnswerLibrary(
+        embedder=embedder,
+        min_score=settings.ANSWER_LIBRARY_MIN_SCORE,
+        reuse_threshold=settings.ANSWER_LIBRARY_REUSE_THRESHOLD,
+        adapt_threshold=settings.ANSWER_LIBRARY_ADAPT_THRESHOLD,
+    )
@@ -0,0 +1,168 @@
+import logging
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from ..core.config import settings
+from .answer_library import normalize_question
+
+logger = logging.getLogger("rfpai.services.dedup")
+
+_NUMBER = re.compile(r"\d+")
+
+# Modulus of the MinHash permutations, and the mask keeping hashes at 32 bits.
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# LLM calls one question costs in each generation mode; a batched completion
+# answers up to LLM_BATCH_MAX_QUESTIONS questions.
+CALLS_PER_QUESTION = {
+    "two_pass": 2.0,
+    "single_pass": 1.0,
+    "batched": 1.0 / max(1, settings.LLM_BATCH_MAX_QUESTIONS),
+}
+
+
+def shingles(text: str, size: int) -> Set[int]:
+    """
+    Hashed character shingles of a normalized question. Character shingles,
+    unlike word ones, keep short questions that differ by a word or two close.
+    """
+    if len(text) <= size:
+        return {zlib.crc32(text.encode())}
+    return {zlib.crc32(text[i : i + size].encode()) for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash signatures estimating the Jaccard similarity of shingle sets.
+
+    The permutations come from a fixed seed, so every process computes the
+    same signatures for the same text.
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: Set[int]) -> np.ndarray:
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        permuted = (values[:, None] * self._a + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+def find_duplicates(
+    texts: List[str],
+    threshold: float = 0.85,
+    shingle_size: int = 5,
+    num_perm: int = 128,
+    bands: int = 16,
+) -> Dict[int, int]:
+    """
+    Finds exact and near-duplicate questions.
+
+    Questions are normalized (case, punctuation, whitespace) and compared by
+    the Jaccard similarity of their character shingles. Candidate pairs come
+    from locality-sensitive hashing of MinHash signatures, so the cost grows
+    with the number of questions rather than the number of pairs; candidates
+    are then checked against the exact similarity. Every member of a group is
+    similar to the group's first question directly, so near-duplicates do not
+    chain into groups of unrelated questions. Near-duplicates must also
+    mention the same numbers: "section 3" and "section 4" are different
+    questions however similar the rest of the text is.
+
+    Args:
+        texts (List[str]): The questions, e.g. of one RFP ordered by id.
+        threshold (float): Jaccard similarity from which questions count as
+            duplicates.
+        shingle_size (int): Characters per shingle.
+        num_perm (int): MinHash permutations; must be a multiple of bands.
+        bands (int): LSH bands. More bands find less similar candidates.
+
+    Returns:
+        Dict[int, int]: Index of each duplicate question to the index of the
+        earlier question it duplicates. Questions without duplicates, and the
+        first question of each group, are absent.
+    """
+    keys = [normalize_question(text) for text in texts]
+    duplicate_of: Dict[int, int] = {}
+
+    # Exact duplicates after normalization need no hashing.
+    first: Dict[str, int] = {}
+    for index, key in enumerate(keys):
+        if key in first:
+            duplicate_of[index] = first[key]
+        else:
+            first[key] = index
+    unique = sorted(first.values())
+    if len(unique) < 2:
+        return duplicate_of
+
+    hasher = MinHasher(num_perm)
+    shingle_sets = {index: shingles(keys[index], shingle_size) for index in unique}
+    numbers = {index: _NUMBER.findall(keys[index]) for index in unique}
+    signatures = np.stack([hasher.signature(shingle_sets[index]) for index in unique])
+
+    rows = num_perm // bands
+    candidates: Dict[int, Set[int]] = defaultdict(set)
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        for position, index in enumerate(unique):
+            buckets[signatures[position, band * rows : (band + 1) * rows].tobytes()].append(
+                index
+            )
+        for bucket in buckets.values():
+            for position, index in enumerate(bucket):
+                candidates[index].update(bucket[position + 1 :])
+
+    for index in unique:
+        if index in duplicate_of:
+            continue
+        own = shingle_sets[index]
+        for other in sorted(candidates.get(index, ())):
+            if other in duplicate_of:
+                continue
+            if numbers[other] != numbers[index]:
+                continue
+            theirs = shingle_sets[other]
+            if len(own & theirs) / len(own | theirs) >= threshold:
+                duplicate_of[other] = index
+
+    # Exact duplicates of a question that itself became a duplicate follow it.
+    for index, original in list(duplicate_of.items()):
+        duplicate_of[index] = duplicate_of.get(original, original)
+    return duplicate_of
+
+
+def find_question_duplicates(question_texts: Dict[int, str]) -> Dict[int, int]:
+    """
+    find_duplicates with the configured thresholds, keyed by question id.
+
+    Args:
+        question_texts (Dict[int, str]): Text of each question, by id.
+
+    Returns:
+        Dict[int, int]: The id of each duplicate question to the id of the
+        lowest-numbered question of its group.
+    """
+    ids = sorted(question_texts)
+    duplicates = find_duplicates(
+        [question_texts[question_id] for question_id in ids],
+        threshold=settings.DEDUP_THRESHOLD,
+        shingle_size=settings.DEDUP_SHINGLE_SIZE,
+        num_perm=settings.DEDUP_NUM_PERM,
+        bands=settings.DEDUP_BANDS,
+    )
+    return {ids[index]: ids[original] for index, original in duplicates.items()}
+
+
+def estimate_calls_saved(mode: Optional[str], duplicates: int) -> int:
+    """
+    LLM calls saved by answering duplicate questions once per group.
+    """
+    return round(CALLS_PER_QUESTION.get(mode, 0.0) * duplicates)
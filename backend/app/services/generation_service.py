@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from fastapi import Request
+from .llm_dispatcher import create_llm_dispatcher
+from .llm_cache import create_llm_cache
+from .answer_library import create_answer_library
+from .job_queue import GenerationJobQueue
+from .pipeline import GenerationPipeline
+from .scheduler import FairScheduler
+from .progress import ProgressBroker
+from .work_queue import create_work_queue_worker
+from ..core.config import settings
+from ..knowledge.store import load_knowledge_store
+from ..agents.question_processing_agent import QuestionProcessingAgent
+from ..agents.data_retrieval_agent import DataRetrievalAgent
+from ..agents.data_contextualization_agent import DataContextualizationAgent
+from ..agents.presentation_generation_agent import PresentationGenerationAgent
+
+logger = logging.getLogger("rfpai.services.generation_service")
+
+# "two_pass": draft with DataRetrievalAgent, then rewrite with
+# DataContextualizationAgent. "single_pass": one structured completion
+# producing the final answer. "batched": one structured completion answering
+# many questions at once, with the single_pass contextualization instructions.
+GENERATION_MODES = ("two_pass", "single_pass", "batched")
+
+
+class GenerationService:
+    """
+    Process-wide owner of the knowledge index, the LLM dispatcher and the agents.
+
+    Created once at application start-up and shared by every request, so the
+    knowledge index is held in memory once, no request pays for loading it or
+    for opening a new client connection pool, and all LLM traffic shares one
+    set of rate limits.
+    """
+
+    def __init__(self):
+        self.knowledge = None
+        self.llm = None
+        self.cache = None
+        self.answer_library = None
+        self.progress = ProgressBroker()
+        self.scheduler = FairScheduler(settings.GENERATION_MAX_IN_FLIGHT)
+        self.question_processing_agent = None
+        self.data_retrieval_agent = None
+        self.contextualization_agent = None
+        self.presentation_agent = None
+        self.pipeline = None
+        self.jobs = None
+        self.workers = []
+        self._worker_tasks = []
+
+    async def startup(self, run_jobs: bool = True) -> None:
+        """
+        Loads the knowledge index off the event loop and builds the agents.
+
+        Args:
+            run_jobs (bool): Whether to run the generation job queue and the
+                in-process work queue workers. Standalone workers (app.worker)
+                only need the agents.
+        """
+        self.knowledge = await asyncio.to_thread(load_knowledge_store)
+        self.llm = create_llm_dispatcher()
+        self.cache = create_llm_cache(self.knowledge.version)
+        self.question_processing_agent = QuestionProcessingAgent()
+        self.data_retrieval_agent = DataRetrievalAgent(
+            knowledge=self.knowledge,
+            llm=self.llm,
+            cache=self.cache,
+            progress=self.progress,
+        )
+        self.contextualization_agent = DataContextualizationAgent(
+            llm=self.llm, cache=self.cache, progress=self.progress
+        )
+        self.presentation_agent = PresentationGenerationAgent()
+        self.pipeline = GenerationPipeline(self)
+        self.pipeline.start()
+        self.answer_library = create_answer_library(self.knowledge.embedder)
+        await self.refresh_answer_library()
+        self.jobs = GenerationJobQueue(
+            self,
+            workers=settings.GENERATION_WORKERS,
+            heartbeat_s=settings.GENERATION_JOB_HEARTBEAT_S,
+            stale_s=settings.GENERATION_JOB_STALE_S,
+        )
+        if run_jobs:
+            await self.jobs.start()
+            if settings.WORK_QUEUE_ENABLED:
+                self.start_workers(settings.WORK_QUEUE_LOCAL_WORKERS)
+        logger.info(
+            "Generation service started with %d knowledge chunks.",
+            len(self.knowledge.chunks),
+        )
+
+    def start_workers(self, count: int) -> None:
+        """
+        Starts work queue workers in this process.
+        """
+        for _ in range(count):
+            worker = create_work_queue_worker(self)
+            self.workers.append(worker)
+            self._worker_tasks.append(asyncio.create_task(worker.run()))
+
+    async def stop_workers(self) -> None:
+        """
+        Lets the in-process work queue workers release their claimed items and
+        stops them.
+        """
+        for worker in self.workers:
+            worker.stop()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def refresh_answer_library(self) -> None:
+        """
+        Reloads the approved answers, e.g. after a revision has been registered.
+        """
+        if self.answer_library is None:
+            return
+        try:
+            await self.answer_library.refresh()
+        except Exception as e:
+            logger.warning("Could not load the answer library: %s", e)
+
+    async def shutdown(self) -> None:
+        """
+        Stops the job workers and the pipeline and releases the LLM client's connections and the
+        cache file.
+        """
+        # Leases of interrupted work items expire and are claimed by other workers.
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self.jobs is not None:
+            await self.jobs.stop()
+        if self.pipeline is not None:
+            await self.pipeline.stop()
+        if self.llm is not None:
+            await self.llm.client.close()
+        if self.cache is not None:
+            self.cache.close()
+        logger.info("Generation service stopped.")
+
+
+def get_generation_service(request: Request) -> GenerationService:
+    """
+    FastAPI dependency returning the service created in the app lifespan.
+    """
+    return request.app.state.generation_service
@@ -0,0 +1,336 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..crud import jobs, rfps, work_items
+from ..database import async_session_factory
+from ..models import JobStatus, RFPStatus
+from ..core.config import settings
+from .rfp_generation import generate_rfp_answers
+from .work_queue import enqueue_rfp_work
+
+if TYPE_CHECKING:
+    from .generation_service import GenerationService
+
+logger = logging.getLogger("rfpai.services.job_queue")
+
+
+class GenerationJobQueue:
+    """
+    In-process queue of RFP generation jobs drained by a pool of worker tasks.
+    Higher priority jobs are started first; the service's FairScheduler then
+    shares the generation capacity between the jobs running at once.
+
+    Job state lives in the generation_jobs table: a job is QUEUED when it is
+    submitted, RUNNING while a worker generates its answers and SUCCEEDED or
+    FAILED when done. An RFP has at most one QUEUED or RUNNING job. Progress
+    is written back at most every progress_interval_s.
+
+    A RUNNING job belongs to the process running it, which renews the job's
+    heartbeat every heartbeat_s. Jobs whose owner missed its heartbeats for
+    stale_s, e.g. because the process died, are queued again by any other
+    process (and on start-up), so a restart does not lose work while jobs still
+    alive in another process are left alone. Only a QUEUED job can be started,
+    so each job runs in one process at a time.
+
+    With WORK_QUEUE_ENABLED a job is instead split into work items that
+    WorkQueueWorkers on any node answer; the worker finishing the last item
+    finishes the job.
+
+    cancel stops the jobs of an RFP: queued jobs are skipped and running ones
+    are cancelled mid-flight, so no further LLM calls are made for them.
+    """
+
+    def __init__(
+        self,
+        service: "GenerationService",
+        workers: int = 2,
+        progress_interval_s: float = 1.0,
+        heartbeat_s: float = 15.0,
+        stale_s: float = 60.0,
+    ):
+        self.service = service
+        self.workers = workers
+        self.progress_interval_s = progress_interval_s
+        self.heartbeat_s = heartbeat_s
+        self.stale_s = stale_s
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # (-priority, job_id): highest priority, then oldest job first
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._tasks: List[asyncio.Task] = []
+        # job_id -> task running the job in this process
+        self._running: Dict[int, asyncio.Task] = {}
+        # job_id -> (questions answered, questions in the job)
+        self._progress: Dict[int, tuple] = {}
+
+    async def start(self) -> None:
+        """
+        Queues the jobs waiting in the database, reclaims those orphaned by a
+        dead process and starts the workers.
+        """
+        try:
+            async with async_session_factory() as session:
+                await jobs.requeue_orphaned_jobs(session, self._stale_before())
+                queued = await jobs.get_jobs_by_status(session, [JobStatus.QUEUED])
+            for job in queued:
+                self._queue.put_nowait((-job.priority, job.job_id))
+            if queued:
+                logger.info("Queued %d waiting generation jobs.", len(queued))
+        except Exception as e:
+            logger.error("Could not re-queue unfinished generation jobs: %s", e)
+
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"generation-worker-{n}")
+            for n in range(self.workers)
+        ]
+        self._tasks.append(
+            asyncio.create_task(self._heartbeat(), name="generation-heartbeat")
+        )
+
+    async def stop(self) -> None:
+        """
+        Stops the workers. Jobs they were running stay RUNNING in the database
+        and are queued again once their heartbeat is stale_s old.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self, rfp_id: int, mode: str, priority: int = 0
+    ) -> Tuple[models.GenerationJob, bool]:
+        """
+        Persists a new job and queues it, unless the RFP already has a queued
+        or running job: generating the same questions twice at once would
+        only pay for every LLM call twice.
+
+        Args:
+            rfp_id (int): The RFP to generate answers for.
+            mode (str): The generation mode, one of GENERATION_MODES.
+            priority (int): Between MIN_PRIORITY and MAX_PRIORITY; higher
+                priority jobs start first and get a larger share of the
+                generation capacity.
+
+        Returns:
+            Tuple[models.GenerationJob, bool]: The queued job and True, or the
+            RFP's active job and False.
+        """
+        async with async_session_factory() as session:
+            job, created = await jobs.create_job_unless_active(
+                session, rfp_id, mode, priority
+            )
+        if not created:
+            logger.info(
+                "RFP ID %s already has generation job %s (%s)",
+                rfp_id,
+                job.job_id,
+                job.status.value,
+            )
+            return job, False
+        self.service.progress.queue_rfp(rfp_id)
+        self._queue.put_nowait((-priority, job.job_id))
+        logger.info(
+            "Queued generation job %s for RFP ID %s (priority %d)",
+            job.job_id,
+            rfp_id,
+            priority,
+        )
+        return job, True
+
+    async def cancel(self, rfp_id: int) -> List[int]:
+        """
+        Cancels the queued and running generation jobs of an RFP.
+
+        Pending question tasks and LLM calls of the jobs are dropped, answers
+        already stored are kept, and the RFP is marked CANCELLED. Generating
+        again resumes with the questions that were not answered.
+
+        Args:
+            rfp_id (int): The RFP whose generation to stop.
+
+        Returns:
+            List[int]: The ids of the cancelled jobs; empty if none was active.
+        """
+        async with async_session_factory() as session:
+            active = await jobs.get_jobs_by_status(
+                session, [JobStatus.QUEUED, JobStatus.RUNNING], rfp_id=rfp_id
+            )
+            cancelled = [
+                job.job_id for job in active if await jobs.cancel_job(session, job.job_id)
+            ]
+            for job_id in cancelled:
+                # Stops workers on every node from claiming the job's questions.
+                await work_items.cancel_work_items(session, job_id)
+        if not cancelled:
+            return []
+
+        for job_id in cancelled:
+            task = self._running.get(job_id)
+            if task is not None:
+                task.cancel()
+        for worker in self.service.workers:
+            worker.cancel_rfp(rfp_id)
+
+        async with async_session_factory() as session:
+            await rfps.update_rfp_status(session, rfp_id, RFPStatus.CANCELLED)
+        self.service.progress.finish_rfp(rfp_id, error="Generation cancelled")
+        logger.info("Cancelled generation jobs %s of RFP ID %s", cancelled, rfp_id)
+        return cancelled
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Queue length and number of jobs being worked on.
+        """
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize(),
+            "running": len(self._progress),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            _, job_id = await self._queue.get()
+            run = asyncio.create_task(self._run(job_id), name=f"generation-job-{job_id}")
+            self._running[job_id] = run
+            try:
+                # wait() leaves run alone when it is cancelled, so a cancelled
+                # job does not stop its worker.
+                await asyncio.wait({run})
+            except asyncio.CancelledError:
+                run.cancel()
+                await asyncio.gather(run, return_exceptions=True)
+                raise
+            finally:
+                self._running.pop(job_id, None)
+                self._queue.task_done()
+            if run.cancelled():
+                logger.info("Generation job %s was cancelled", job_id)
+            elif run.exception() is not None:
+                logger.error(
+                    "Generation worker failed on job %s",
+                    job_id,
+                    exc_info=run.exception(),
+                )
+
+    async def _run(self, job_id: int) -> None:
+        # One session serves every RFP level step of the job, in this task;
+        # the question tasks and the progress flusher use their own.
+        async with async_session_factory() as session:
+            # Conditional, so a cancel landing after the job was queued wins,
+            # and a job queued by several processes runs in one of them.
+            if not await jobs.start_job(session, job_id, self.owner):
+                return
+            job = await jobs.get_job(session, job_id)
+            rfp_id, mode, priority = job.rfp_id, job.mode, job.priority
+            logger.info(
+                "Starting generation job %s for RFP ID %s (%s)", job_id, rfp_id, mode
+            )
+
+            if settings.WORK_QUEUE_ENABLED:
+                try:
+                    await enqueue_rfp_work(
+                        self.service, session, job_id, rfp_id, mode, priority
+                    )
+                    # Work items have leases of their own; whichever worker
+                    # finishes the last one finishes the job.
+                    await jobs.clear_job_owner(session, job_id)
+                except Exception as e:
+                    await self._fail(session, job_id, rfp_id, e)
+                return
+
+            self._progress[job_id] = (0, None)
+            flusher = asyncio.create_task(self._flush_progress(job_id))
+            start = time.perf_counter()
+            try:
+                count = await generate_rfp_answers(
+                    self.service,
+                    session,
+                    rfp_id,
+                    mode,
+                    on_progress=lambda done, total: self._progress.__setitem__(
+                        job_id, (done, total)
+                    ),
+                    priority=priority,
+                )
+            except asyncio.CancelledError:
+                flusher.cancel()
+                self._progress.pop(job_id, None)
+                raise
+            except Exception as e:
+                flusher.cancel()
+                await self._fail(session, job_id, rfp_id, e)
+                return
+
+            flusher.cancel()
+            self.service.progress.finish_rfp(rfp_id)
+            await jobs.update_job_progress(session, job_id, count, count)
+            await jobs.finish_running_job(session, job_id, JobStatus.SUCCEEDED)
+        self._progress.pop(job_id, None)
+        logger.info(
+            "Generation job %s answered %d questions in %.1fs",
+            job_id,
+            count,
+            time.perf_counter() - start,
+        )
+
+    async def _fail(
+        self, session: AsyncSession, job_id: int, rfp_id: int, error: Exception
+    ) -> None:
+        self.service.progress.finish_rfp(rfp_id, error=str(error))
+        logger.error("Generation job %s failed: %s", job_id, error, exc_info=error)
+        # The failed step may have left a transaction behind.
+        await session.rollback()
+        await self._write_progress(session, job_id)
+        # A cancelled job stays cancelled.
+        if await jobs.finish_running_job(
+            session, job_id, JobStatus.FAILED, error=str(error)
+        ):
+            await rfps.update_rfp_status(session, rfp_id, RFPStatus.FAILED)
+        self._progress.pop(job_id, None)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_s)
+            try:
+                async with async_session_factory() as session:
+                    await jobs.renew_job_heartbeats(
+                        session, self.owner, list(self._running)
+                    )
+                await self._requeue_orphaned()
+            except Exception as e:
+                logger.warning("Generation job heartbeat failed: %s", e)
+
+    def _stale_before(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=self.stale_s)
+
+    async def _requeue_orphaned(self) -> None:
+        async with async_session_factory() as session:
+            orphaned = await jobs.requeue_orphaned_jobs(session, self._stale_before())
+        for job in orphaned:
+            self._queue.put_nowait((-job.priority, job.job_id))
+        if orphaned:
+            logger.info("Re-queued %d orphaned generation jobs.", len(orphaned))
+
+    async def _flush_progress(self, job_id: int) -> None:
+        written: Optional[tuple] = None
+        async with async_session_factory() as session:
+            while True:
+                await asyncio.sleep(self.progress_interval_s)
+                if self._progress.get(job_id) != written:
+                    written = await self._write_progress(session, job_id)
+
+    async def _write_progress(self, session, job_id: int) -> Optional[tuple]:
+        progress = self._progress.get(job_id)
+        if progress is not None:
+            done, total = progress
+            await jobs.update_job_progress(session, job_id, done, total)
+        return progress
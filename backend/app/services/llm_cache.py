@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from ..core.config import settings
+
+logger = logging.getLogger("rfpai.services.llm_cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class LLMResponseCache:
+    """
+    Content-addressed, size-bounded store of LLM completions in a local SQLite file.
+
+    Keys are derived from the model, temperature, whitespace-normalized prompt
+    and the version of the knowledge index, so a completion is only reused for
+    an identical request made against identical knowledge. When the stored
+    completions exceed max_bytes the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int, knowledge_version: str = ""):
+        """
+        Args:
+            path (str): Location of the SQLite file.
+            max_bytes (int): Upper bound on the total size of stored completions.
+            knowledge_version (str): Version of the knowledge index the cached
+                completions were grounded in; part of every key.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.knowledge_version = knowledge_version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_completions_last_access "
+            "ON completions (last_access)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()[0]
+
+    def make_key(self, model: str, temperature: float, prompt: str) -> str:
+        """
+        Fingerprints a completion request.
+        """
+        normalized = _WHITESPACE.sub(" ", prompt).strip()
+        payload = json.dumps(
+            [model, round(float(temperature), 4), normalized, self.knowledge_version]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached completion for a key, or None on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE completions SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Stores a completion, evicting least recently used entries if needed.
+        """
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[str]:
+        """
+        get, in a worker thread: the SQLite calls would block the event loop
+        while other lookups hold the lock.
+        """
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: str) -> None:
+        """
+        put, in a worker thread.
+        """
+        await asyncio.to_thread(self.put, key, value)
+
+    def _evict(self) -> None:
+        # Evict down to 90% so a full cache doesn't evict on every insert.
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = self._conn.execute(
+            "SELECT key, size FROM completions ORDER BY last_access"
+        ).fetchall()
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        logger.info("Evicted %d cached completions.", evicted)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters and current size of the cache.
+        """
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM completions"
+            ).fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_llm_cache(knowledge_version: str) -> Optional[LLMResponseCache]:
+    """
+    Creates the cache configured in the settings, or None if caching is disabled.
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return LLMResponseCache(
+        settings.LLM_CACHE_PATH,
+        settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+        knowledge_version=knowledge_version,
+    )
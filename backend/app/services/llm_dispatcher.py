@@ -0,0 +1,256 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from typing import Dict, List, Optional
+
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncAzureOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+
+from ..core.config import settings
+from ..core.llm import create_llm_client
+
+logger = logging.getLogger("rfpai.services.llm_dispatcher")
+
+RETRYABLE_ERRORS = (
+    RateLimitError,
+    APITimeoutError,
+    APIConnectionError,
+    InternalServerError,
+)
+
+# Budget reserved for the completion when the caller does not set max_tokens.
+DEFAULT_COMPLETION_TOKENS = 600
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at capacity_per_minute / 60 per second.
+
+    Waiters are served in arrival order so a large request is not starved by a
+    stream of small ones.
+    """
+
+    def __init__(self, capacity_per_minute: int):
+        self.capacity = float(capacity_per_minute)
+        self._rate = capacity_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> None:
+        """
+        Waits until amount tokens are available and takes them.
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self._rate)
+
+    def adjust(self, amount: float) -> None:
+        """
+        Returns (positive) or charges (negative) tokens after the fact, e.g. once
+        the real usage of a request is known.
+        """
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class LLMDispatcher:
+    """
+    Single gateway for chat completion calls to Azure OpenAI.
+
+    Every call waits for a slot under the in-flight limit and for room in the
+    requests-per-minute and tokens-per-minute budgets before it is sent, so a
+    large RFP runs at the deployment's quota instead of bursting into 429s.
+    Throttled and transient failures are retried with jittered exponential
+    backoff; a Retry-After from the service pauses all callers, not just the
+    one that was throttled.
+    """
+
+    def __init__(
+        self,
+        client: AsyncAzureOpenAI,
+        max_concurrency: int = 16,
+        requests_per_minute: int = 300,
+        tokens_per_minute: int = 150_000,
+        max_retries: int = 6,
+        base_delay_s: float = 1.0,
+        max_delay_s: float = 60.0,
+    ):
+        self.client = client
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "throttled": 0,
+            "cancelled": 0,
+            "in_flight": 0,
+            "tokens_used": 0,
+        }
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict],
+        temperature: float,
+        max_tokens: Optional[int] = None,
+        **kwargs,
+    ):
+        """
+        Sends a chat completion request through the limiter.
+
+        Args:
+            model (str): The deployment to call.
+            messages (List[Dict]): The chat messages.
+            temperature (float): Sampling temperature.
+            max_tokens (Optional[int]): Completion token limit; also used to size
+                the token budget reservation.
+            **kwargs: Passed through to chat.completions.create.
+
+        Returns:
+            The ChatCompletion returned by the client.
+        Raises:
+            openai.APIError: If the request fails with a non-retryable error or
+                still fails after max_retries retries.
+        """
+        estimate = self.estimate_tokens(messages) + (
+            max_tokens or DEFAULT_COMPLETION_TOKENS
+        )
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_pause()
+            await self._requests.acquire(1)
+            await self._tokens.acquire(estimate)
+            async with self._semaphore:
+                self._stats["requests"] += 1
+                self._stats["in_flight"] += 1
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        **kwargs,
+                    )
+                except RETRYABLE_ERRORS as e:
+                    delay = self._retry_delay(e, attempt)
+                    if attempt == self.max_retries:
+                        self._stats["failed"] += 1
+                        logger.error(
+                            "LLM request failed after %d attempts: %s", attempt + 1, e
+                        )
+                        raise
+                    self._stats["retries"] += 1
+                    logger.warning(
+                        "LLM request failed (%s), retrying in %.1fs (attempt %d/%d)",
+                        type(e).__name__,
+                        delay,
+                        attempt + 1,
+                        self.max_retries,
+                    )
+                except asyncio.CancelledError:
+                    # The caller gave up, e.g. its generation was cancelled.
+                    self._stats["cancelled"] += 1
+                    raise
+                except Exception:
+                    self._stats["failed"] += 1
+                    raise
+                else:
+                    self._stats["succeeded"] += 1
+                    usage = getattr(response, "usage", None)
+                    if usage is not None and usage.total_tokens:
+                        self._stats["tokens_used"] += usage.total_tokens
+                        self._tokens.adjust(estimate - usage.total_tokens)
+                    return response
+                finally:
+                    self._stats["in_flight"] -= 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters describing the dispatcher's traffic so far.
+        """
+        return dict(self._stats)
+
+    @staticmethod
+    def estimate_tokens(messages: List[Dict]) -> int:
+        """
+        Rough prompt size estimate (about 4 characters per token).
+        """
+        return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 8 * len(
+            messages
+        )
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            self._stats["throttled"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            return retry_after
+        if isinstance(error, RateLimitError):
+            self._stats["throttled"] += 1
+        backoff = min(self.max_delay_s, self.base_delay_s * 2**attempt)
+        return random.uniform(backoff / 2, backoff)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000
+            if "retry-after" in headers:
+                value = headers["retry-after"]
+                try:
+                    return float(value)
+                except ValueError:
+                    when = email.utils.parsedate_to_datetime(value)
+                    return max(0.0, when.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+        return None
+
+    async def _wait_for_pause(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def create_llm_dispatcher() -> LLMDispatcher:
+    """
+    Creates a dispatcher with the limits configured in the settings.
+    """
+    return LLMDispatcher(
+        create_llm_client(),
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+        max_retries=settings.LLM_MAX_RETRIES,
+    )
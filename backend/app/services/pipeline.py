@@ -0,0 +1,377 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional
+
+from ..core.config import settings
+from ..core.llm import DEFAULT_MODEL
+from ..crud import llm_responses, questions
+from ..database import async_session_factory
+from ..models import QuestionStatus
+
+if TYPE_CHECKING:
+    from .generation_service import GenerationService
+
+logger = logging.getLogger("rfpai.services.pipeline")
+
+# Latency samples kept per stage for the percentiles in stats().
+LATENCY_SAMPLES = 1000
+
+
+@dataclass
+class PipelineItem:
+    """
+    One question travelling through the generation pipeline.
+
+    Stages fill in the fields they produce; a stage whose output is already
+    present (e.g. a draft left by an interrupted run) passes the item on.
+    """
+
+    question_id: int
+    question_text: str
+    mode: str
+    context: Optional[str] = None
+    draft: Optional[str] = None
+    answer: Optional[str] = None
+    tokens_used: Optional[int] = None
+    generation_time_ms: int = 0
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+    enqueued_at: float = field(default=0.0, repr=False)
+
+
+# Handlers take the items a worker took off its queue, at most batch_size.
+StageHandler = Callable[[List[PipelineItem]], Awaitable[None]]
+
+
+class Stage:
+    """
+    A pipeline stage: a bounded input queue drained by its own workers.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: StageHandler,
+        concurrency: int,
+        queue_size: int,
+        batch_size: int = 1,
+        cancellable: bool = True,
+    ):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        # Whether a handler may be interrupted once its callers gave up.
+        # Interrupting a DB write can leave its connection holding locks.
+        self.cancellable = cancellable
+        self.queue: asyncio.Queue = asyncio.Queue(max(1, queue_size))
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.max_depth = 0
+        self._waits = deque(maxlen=LATENCY_SAMPLES)
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    async def put(self, item: PipelineItem) -> None:
+        # Blocks while the stage is backed up, which holds up the stage before it.
+        await self.queue.put(item)
+        item.enqueued_at = time.monotonic()
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def take(self) -> List[PipelineItem]:
+        items = [await self.queue.get()]
+        while len(items) < self.batch_size and not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        now = time.monotonic()
+        self._waits.extend(now - item.enqueued_at for item in items)
+        return items
+
+    def record(self, items: List[PipelineItem], elapsed: float, ok: bool) -> None:
+        if ok:
+            self.processed += len(items)
+        else:
+            self.failed += len(items)
+        self._latencies.extend([elapsed] * len(items))
+
+    def stats(self) -> Dict:
+        latencies = sorted(self._latencies)
+
+        def ms(values, q=None):
+            if not values:
+                return None
+            if q is None:
+                return round(1000 * sum(values) / len(values), 1)
+            return round(1000 * values[min(len(values) - 1, int(q * len(values)))], 1)
+
+        return {
+            "workers": self.concurrency,
+            "busy": self.busy,
+            "queue_depth": self.queue.qsize(),
+            "queue_max_depth": self.max_depth,
+            "queue_capacity": self.queue.maxsize,
+            "processed": self.processed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "wait_avg_ms": ms(list(self._waits)),
+            "latency_avg_ms": ms(latencies),
+            "latency_p95_ms": ms(latencies, 0.95),
+        }
+
+
+class StagePipeline:
+    """
+    Chain of stages linked by bounded asyncio queues.
+
+    Every stage runs its own pool of workers, so a stage's concurrency can be
+    tuned on its own and a cheap stage never waits behind a slow one: a run
+    finishes at the pace of its slowest stage instead of the sum of all of
+    them. When a stage falls behind, its full input queue makes the stage
+    before it wait (backpressure) instead of piling up work in memory.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self._tasks: List[asyncio.Task] = []
+        self._pending = set()
+
+    def start(self) -> None:
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.concurrency):
+                self._tasks.append(
+                    asyncio.create_task(
+                        self._worker(index), name=f"pipeline-{stage.name}-{n}"
+                    )
+                )
+
+    async def stop(self) -> None:
+        """
+        Stops the workers and cancels items still in the pipeline.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for future in list(self._pending):
+            future.cancel()
+
+    async def run(self, item: PipelineItem) -> PipelineItem:
+        """
+        Sends an item through every stage.
+
+        Returns:
+            PipelineItem: The item once the last stage handled it.
+        Raises:
+            Exception: Whatever the failing stage raised. Cancelling the caller
+                drops the item at the next stage it reaches.
+        """
+        item.future = asyncio.get_running_loop().create_future()
+        self._pending.add(item.future)
+        item.future.add_done_callback(self._pending.discard)
+        await self.stages[0].put(item)
+        return await item.future
+
+    def stats(self) -> Dict[str, Dict]:
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    @staticmethod
+    async def _handle(stage: Stage, items: List[PipelineItem]) -> bool:
+        handler = asyncio.ensure_future(stage.handler(items))
+
+        def abandon(_):
+            # Once every caller gave up (e.g. its job was cancelled), the
+            # handler's LLM call or DB write is not worth finishing.
+            if all(item.future.done() for item in items):
+                handler.cancel()
+
+        if stage.cancellable:
+            for item in items:
+                item.future.add_done_callback(abandon)
+        try:
+            await asyncio.wait({handler})
+        except asyncio.CancelledError:
+            handler.cancel()
+            raise
+        finally:
+            if stage.cancellable:
+                for item in items:
+                    item.future.remove_done_callback(abandon)
+        if handler.cancelled():
+            logger.info(
+                "Pipeline stage %s dropped cancelled question IDs %s",
+                stage.name,
+                [item.question_id for item in items],
+            )
+            return False
+        handler.result()
+        return True
+
+    async def _worker(self, index: int) -> None:
+        stage = self.stages[index]
+        last = index == len(self.stages) - 1
+        while True:
+            taken = await stage.take()
+            try:
+                # Items whose caller gave up are not worth any more work.
+                items = [item for item in taken if not item.future.done()]
+                stage.cancelled += len(taken) - len(items)
+                if not items:
+                    continue
+                stage.busy += 1
+                start = time.monotonic()
+                try:
+                    handled = await self._handle(stage, items)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    stage.record(items, time.monotonic() - start, ok=False)
+                    logger.warning(
+                        "Pipeline stage %s failed for question IDs %s: %s",
+                        stage.name,
+                        [item.question_id for item in items],
+                        e,
+                    )
+                    for item in items:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    continue
+                finally:
+                    stage.busy -= 1
+                if not handled:
+                    stage.cancelled += len(items)
+                    continue
+                stage.record(items, time.monotonic() - start, ok=True)
+
+                for item in items:
+                    if item.future.done():
+                        continue
+                    if last:
+                        item.future.set_result(item)
+                    else:
+                        await self.stages[index + 1].put(item)
+            finally:
+                for _ in taken:
+                    stage.queue.task_done()
+
+
+class GenerationPipeline(StagePipeline):
+    """
+    The two_pass and single_pass answer pipeline:
+
+    retrieval      knowledge index lookup, batched across questions
+    draft          DataRetrievalAgent's draft answer (two_pass only), stored at once
+    contextualize  DataContextualizationAgent's final answer
+    persist        stores answers, batched, and marks the questions for review
+    """
+
+    def __init__(self, service: "GenerationService"):
+        self.service = service
+        queue_size = settings.PIPELINE_QUEUE_SIZE
+        super().__init__(
+            [
+                Stage(
+                    "retrieval",
+                    self._retrieve,
+                    settings.PIPELINE_RETRIEVAL_WORKERS,
+                    queue_size,
+                    batch_size=settings.PIPELINE_RETRIEVAL_BATCH,
+                ),
+                Stage(
+                    "draft", self._draft, settings.PIPELINE_DRAFT_WORKERS, queue_size
+                ),
+                Stage(
+                    "contextualize",
+                    self._contextualize,
+                    settings.PIPELINE_CONTEXTUALIZATION_WORKERS,
+                    queue_size,
+                ),
+                Stage(
+                    "persist",
+                    self._persist,
+                    settings.PIPELINE_PERSISTENCE_WORKERS,
+                    queue_size,
+                    batch_size=settings.PIPELINE_PERSISTENCE_BATCH,
+                    cancellable=False,
+                ),
+            ]
+        )
+
+    def _report(self, item: PipelineItem, stage: str) -> None:
+        self.service.progress.question_event(item.question_id, stage)
+
+    async def _retrieve(self, items: List[PipelineItem]) -> None:
+        needed = [item for item in items if item.draft is None]
+        if needed:
+            contexts = await self.service.data_retrieval_agent.retrieve_contexts(
+                [item.question_text for item in needed]
+            )
+            for item, context in zip(needed, contexts):
+                item.context = context
+        for item in items:
+            if item.mode != "two_pass":
+                # Two-pass reports retrieval once the draft is written.
+                self._report(item, "retrieved")
+
+    async def _draft(self, items: List[PipelineItem]) -> None:
+        for item in items:
+            if item.mode != "two_pass" or item.draft is not None:
+                continue
+            start = time.perf_counter()
+            response = await self.service.data_retrieval_agent.generate_response(
+                item.question_text, item.context
+            )
+            item.generation_time_ms += int((time.perf_counter() - start) * 1000)
+            item.draft = response["Answer"]
+            # Stored straight away, so an interrupted run resumes from the draft.
+            await asyncio.shield(self._store_draft(item))
+            self._report(item, "retrieved")
+
+    @staticmethod
+    async def _store_draft(item: PipelineItem) -> None:
+        async with async_session_factory() as session:
+            await questions.update_question_context(
+                session, item.question_id, item.draft
+            )
+
+    async def _contextualize(self, items: List[PipelineItem]) -> None:
+        agent = self.service.contextualization_agent
+        for item in items:
+            start = time.perf_counter()
+            if item.mode == "two_pass":
+                item.answer = await agent.rewrite_with_mphasis(
+                    item.question_text, item.draft
+                )
+            else:
+                item.answer, item.tokens_used = await agent.generate_final_answer(
+                    item.question_text, item.context
+                )
+            item.generation_time_ms += int((time.perf_counter() - start) * 1000)
+            self._report(item, "contextualized")
+
+    async def _persist(self, items: List[PipelineItem]) -> None:
+        # Answers of the batch are stored in one transaction.
+        async with async_session_factory() as session:
+            await llm_responses.create_llm_responses(
+                session,
+                [
+                    {
+                        "question_id": item.question_id,
+                        "response": item.answer,
+                        "model_id": DEFAULT_MODEL,
+                        "retrieved_context": (
+                            item.draft if item.mode == "two_pass" else item.context
+                        ),
+                        "generation_time_ms": item.generation_time_ms,
+                        "tokens_used": item.tokens_used,
+                        "status": (
+                            "initial_draft" if item.mode == "two_pass" else "single_pass"
+                        ),
+                    }
+                    for item in items
+                ],
+                question_status=QuestionStatus.PENDING_REVIEW,
+            )
+        for item in items:
+            self._report(item, "persisted")
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from ..crud import jobs, work_items
+from ..database import async_session_factory
+from ..models import JobStatus, WorkStatus
+
+logger = logging.getLogger("rfpai.services.progress")
+
+# Question stages, in the order a question normally moves through them. A
+# failed question is not a failed run, so the two events are named apart.
+STAGES = ("retrieved", "contextualized", "persisted", "question_failed")
+
+# Events that end a run; nothing of the run follows them.
+TERMINAL_EVENTS = ("finished", "failed")
+
+# Run status reported for each state of a generation job.
+JOB_RUN_STATUS = {
+    JobStatus.QUEUED: "running",
+    JobStatus.RUNNING: "running",
+    JobStatus.SUCCEEDED: "finished",
+    JobStatus.FAILED: "failed",
+    JobStatus.CANCELLED: "failed",
+}
+
+
+class RFPProgress:
+    """
+    Running totals of one RFP generation, used to derive throughput and ETA.
+    """
+
+    def __init__(self, rfp_id: int, total: int, completed: int = 0):
+        self.rfp_id = rfp_id
+        self.total = total
+        self.completed = completed
+        self.failed = 0
+        self.status = "running"
+        self.error: Optional[str] = None
+        self._resumed = completed
+        self._started = time.monotonic()
+        self._finished: Optional[float] = None
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self.status = "failed" if error else "finished"
+        self.error = error
+        self._finished = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        end = self._finished or time.monotonic()
+        elapsed = end - self._started
+        # Questions answered by an earlier run don't count towards throughput.
+        done_here = self.completed - self._resumed
+        throughput = done_here / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.completed - self.failed)
+        eta = remaining / throughput if throughput > 0 else None
+        return {
+            "rfp_id": self.rfp_id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_qps": round(throughput, 3),
+            "eta_s": round(eta, 1) if eta is not None and self.status == "running" else None,
+            "error": self.error,
+        }
+
+
+class ProgressBroker:
+    """
+    In-process pub/sub of generation progress.
+
+    Agents report question level events by question_id; the broker maps them
+    to the RFP registered with start_rfp, updates its running totals and fans
+    every event out to that RFP's subscribers (e.g. the SSE endpoint). Slow
+    subscribers lose their oldest events rather than holding up generation.
+    Every run ends with a "finished" or "failed" event, and the totals of the
+    max_finished most recently finished runs are kept for snapshot.
+    """
+
+    def __init__(self, max_queue: int = 1000, max_finished: int = 100):
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self._rfps: Dict[int, RFPProgress] = {}
+        self._question_rfp: Dict[int, int] = {}
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def start_rfp(
+        self, rfp_id: int, question_ids: Iterable[int], total: int, completed: int = 0
+    ) -> None:
+        """
+        Starts tracking a generation run.
+
+        Args:
+            rfp_id (int): The RFP being generated.
+            question_ids (Iterable[int]): The questions this run will answer.
+            total (int): Questions in the RFP.
+            completed (int): Questions already answered by an earlier run.
+        """
+        for question_id in [q for q, r in self._question_rfp.items() if r == rfp_id]:
+            del self._question_rfp[question_id]
+        for question_id in question_ids:
+            self._question_rfp[question_id] = rfp_id
+        self._rfps.pop(rfp_id, None)
+        self._rfps[rfp_id] = RFPProgress(rfp_id, total, completed)
+        self._publish(rfp_id, "started")
+
+    def queue_rfp(self, rfp_id: int) -> None:
+        """
+        Registers a run that is queued but not started, so that a snapshot
+        taken from now on belongs to it rather than to the RFP's previous run.
+        """
+        progress = self._rfps.get(rfp_id)
+        if progress is None or progress.status != "running":
+            self._rfps.pop(rfp_id, None)
+            self._rfps[rfp_id] = RFPProgress(rfp_id, 0)
+
+    def question_event(self, question_id: int, stage: str) -> None:
+        """
+        Reports that a question reached a stage, one of STAGES.
+        """
+        rfp_id = self._question_rfp.get(question_id)
+        if rfp_id is None:
+            return
+        progress = self._rfps[rfp_id]
+        if stage == "persisted":
+            progress.completed += 1
+            del self._question_rfp[question_id]
+        elif stage == "question_failed":
+            progress.failed += 1
+            del self._question_rfp[question_id]
+        self._publish(rfp_id, stage, question_id)
+
+    def finish_rfp(self, rfp_id: int, error: Optional[str] = None) -> None:
+        """
+        Marks a generation run as finished, or failed if error is given.
+
+        A run that ended before it was started, e.g. one without questions,
+        is finished all the same, so its subscribers are not left waiting.
+        """
+        progress = self._rfps.pop(rfp_id, None) or RFPProgress(rfp_id, 0)
+        progress.finish(error)
+        self._rfps[rfp_id] = progress
+        for question_id in [q for q, r in self._question_rfp.items() if r == rfp_id]:
+            del self._question_rfp[question_id]
+        self._publish(rfp_id, progress.status)
+        # Runs are kept in the order they finished; forget the oldest ones.
+        finished = [r for r, p in self._rfps.items() if p.status != "running"]
+        for old in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._rfps[old]
+
+    def snapshot(self, rfp_id: int) -> Optional[Dict]:
+        """
+        Current totals of the latest run of an RFP, None if it was never run.
+        """
+        progress = self._rfps.get(rfp_id)
+        return progress.snapshot() if progress is not None else None
+
+    def subscribe(self, rfp_id: int) -> asyncio.Queue:
+        """
+        Returns a queue that receives every event of an RFP published from now
+        on. Pass it to unsubscribe when done.
+        """
+        queue: asyncio.Queue = asyncio.Queue(self.max_queue)
+        self._subscribers.setdefault(rfp_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, rfp_id: int, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(rfp_id, set())
+        subscribers.discard(queue)
+        if not subscribers:
+            self._subscribers.pop(rfp_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tracked_rfps": len(self._rfps),
+            "running_rfps": sum(p.status == "running" for p in self._rfps.values()),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
+
+    def _publish(self, rfp_id: int, event: str, question_id: Optional[int] = None):
+        subscribers: List[asyncio.Queue] = list(self._subscribers.get(rfp_id, ()))
+        if not subscribers:
+            return
+        message = {"event": event, "question_id": question_id, **self._rfps[rfp_id].snapshot()}
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+
+async def poll_job_events(rfp_id: int, interval_s: float) -> AsyncIterator[Optional[Dict]]:
+    """
+    Progress of the latest generation job of an RFP, read from the database.
+
+    With the work queue, questions are answered by workers in other processes
+    whose question events never reach this process's broker; the job's
+    counters are the record every process shares. Yields a "snapshot" of the
+    job, then a "progress" event whenever its counters change, and stops after
+    the "finished" or "failed" event of the job. Polls that find nothing new
+    yield None, so the caller can keep its connection alive.
+
+    Args:
+        rfp_id (int): The RFP to follow.
+        interval_s (float): Seconds between two reads of the job.
+    """
+    progress: Optional[RFPProgress] = None
+    last = None
+    while True:
+        async with async_session_factory() as session:
+            job = await jobs.get_latest_job(session, rfp_id)
+            if job is not None:
+                counts = await work_items.count_work_items(session, job.job_id)
+        event = None
+        if job is not None:
+            status = JOB_RUN_STATUS[job.status]
+            if progress is None:
+                progress = RFPProgress(rfp_id, 0, job.processed_questions)
+            progress.total = job.total_questions or 0
+            progress.completed = job.processed_questions
+            progress.failed = counts[WorkStatus.FAILED]
+            if status != "running":
+                progress.finish(
+                    (job.error or "Generation failed") if status == "failed" else None
+                )
+            state = (status, progress.total, progress.completed, progress.failed)
+            if last is None:
+                event = "snapshot"
+            elif state != last:
+                event = status if status != "running" else "progress"
+            last = state
+        yield {"event": event, "question_id": None, **progress.snapshot()} if event else None
+        if job is not None and status != "running":
+            return
+        await asyncio.sleep(interval_s)
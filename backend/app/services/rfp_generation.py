@@ -0,0 +1,455 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..crud import llm_responses, questions, rfps
+from ..database import async_session_factory
+from .. import models
+from ..models import QuestionStatus, RFPStatus
+from .dedup import find_question_duplicates
+from .pipeline import PipelineItem
+from .spreadsheet_parser import MAX_COLUMN_WIDTH, SpreadsheetHandler
+
+if TYPE_CHECKING:
+    from .generation_service import GenerationService
+
+logger = logging.getLogger("rfpai.services.rfp_generation")
+
+# Called with (questions answered so far, questions in the RFP).
+ProgressCallback = Callable[[int, int], None]
+
+# Questions without a completed response.
+PENDING_STATUSES = (QuestionStatus.EXTRACTED, QuestionStatus.FAILED)
+
+
+class SharingError(RuntimeError):
+    """
+    Raised by share_answers when the originals were answered but their
+    answers could not be stored for the duplicates; only question_ids, the
+    duplicates, went unanswered.
+    """
+
+    def __init__(self, message: str, question_ids: List[int]):
+        super().__init__(message)
+        self.question_ids = question_ids
+
+
+def failed_question_ids(error: Exception, question_ids: List[int]) -> List[int]:
+    """
+    The questions a task answering question_ids left unanswered when it
+    raised error.
+    """
+    if isinstance(error, SharingError):
+        return error.question_ids
+    return question_ids
+
+
+async def generate_rfp_answers(
+    service: "GenerationService",
+    session: AsyncSession,
+    rfp_id: int,
+    mode: str,
+    on_progress: Optional[ProgressCallback] = None,
+    priority: int = 0,
+) -> int:
+    """
+    Generate answers for all questions in the specified RFP by processing them through
+    the data retrieval and data contextualization agents, then writes the answer
+    spreadsheet.
+
+    Only questions without a completed response are processed, so re-running an
+    interrupted generation picks up where it stopped. Questions that fail are
+    marked FAILED and retried by the next run.
+
+    Args:
+        service (GenerationService): The shared agents and knowledge.
+        session (AsyncSession): The job's session, used for the RFP level
+            steps before and after the questions are answered. Each question
+            task uses a short-lived session of its own.
+        rfp_id (int): The RFP to answer.
+        mode (str): The generation mode, one of GENERATION_MODES.
+        on_progress (Optional[ProgressCallback]): Called as questions complete.
+        priority (int): The RFP's share of the generation capacity, see
+            FairScheduler.
+
+    Returns:
+        int: The number of questions in the RFP.
+    Raises:
+        RuntimeError: If some questions could not be answered.
+    """
+    question_count, rfp_questions = await prepare_rfp(service, session, rfp_id)
+    if not question_count:
+        return 0
+    answered = question_count - len(rfp_questions)
+    service.progress.start_rfp(
+        rfp_id, [q.question_id for q in rfp_questions], question_count, answered
+    )
+
+    tasks = await plan_question_tasks(service, rfp_questions, mode, priority)
+    failed: List[int] = []
+
+    async def track(task: Awaitable, question_ids: List[int]):
+        nonlocal answered
+        try:
+            await task
+        except Exception as e:
+            unanswered = failed_question_ids(e, question_ids)
+            logger.error(
+                "Failed to answer question IDs %s for RFP ID %s: %s",
+                unanswered,
+                rfp_id,
+                e,
+            )
+            failed.extend(unanswered)
+            for question_id in unanswered:
+                service.progress.question_event(question_id, "question_failed")
+            async with async_session_factory() as session:
+                for question_id in unanswered:
+                    await questions.update_question_status(
+                        session, question_id, QuestionStatus.FAILED
+                    )
+            answered += len(question_ids) - len(unanswered)
+            if on_progress is not None and len(unanswered) < len(question_ids):
+                on_progress(answered, question_count)
+            return
+        answered += len(question_ids)
+        if on_progress is not None:
+            on_progress(answered, question_count)
+
+    if on_progress is not None:
+        on_progress(answered, question_count)
+    await asyncio.gather(*(track(task, ids) for task, ids in tasks))
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {question_count} questions could not be answered; "
+            "generate again to retry them"
+        )
+
+    await finalize_rfp(session, rfp_id)
+    logger.info(
+        "Completed processing %d questions for RFP ID %s", question_count, rfp_id
+    )
+    return question_count
+
+
+async def prepare_rfp(
+    service: "GenerationService", session: AsyncSession, rfp_id: int
+) -> Tuple[int, List[models.Question]]:
+    """
+    Extracts the questions of an RFP if needed, links repeated questions to
+    the first one of their group (see find_duplicates) and marks the RFP as
+    processing.
+
+    Args:
+        service (GenerationService): The shared agents and knowledge.
+        session (AsyncSession): The job's session.
+        rfp_id (int): The RFP to answer.
+
+    Returns:
+        Tuple[int, List[models.Question]]: The number of questions in the RFP and
+        those without a completed response. Questions that already have one are
+        left alone, so a re-run only pays for what an earlier, interrupted run
+        did not finish.
+    """
+    # Extraction costs no LLM calls; a cancelled job lets it finish rather than
+    # leave a partial set of questions behind for the next run to skip.
+    await asyncio.shield(service.question_processing_agent.process(rfp_id))
+    rfp_questions = await questions.get_questions_by_rfp(session, rfp_id)
+
+    if not rfp_questions:
+        # Ends the read, returning the connection to the pool.
+        await session.rollback()
+        logger.info("No questions found for RFP ID %s", rfp_id)
+        return 0, []
+
+    logger.info("Found %d questions for RFP ID %s", len(rfp_questions), rfp_id)
+    rfp_questions = [q for q in rfp_questions if q is not None]
+    if settings.DEDUP_ENABLED:
+        await link_duplicates(session, rfp_questions)
+    await rfps.update_rfp_status(session, rfp_id, RFPStatus.PROCESSING)
+
+    question_count = len(rfp_questions)
+    pending = [q for q in rfp_questions if q.status in PENDING_STATUSES]
+    if len(pending) < question_count:
+        logger.info(
+            "Resuming RFP ID %s: %d of %d questions already answered",
+            rfp_id,
+            question_count - len(pending),
+            question_count,
+        )
+    return question_count, pending
+
+
+async def link_duplicates(session, rfp_questions: List[models.Question]) -> int:
+    """
+    Sets duplicate_of on the repeated questions of an RFP.
+
+    Returns:
+        int: The number of questions that duplicate an earlier one.
+    """
+    duplicate_of = await asyncio.to_thread(
+        find_question_duplicates, {q.question_id: q.question_text for q in rfp_questions}
+    )
+    changed = {
+        q.question_id: duplicate_of.get(q.question_id)
+        for q in rfp_questions
+        if q.duplicate_of != duplicate_of.get(q.question_id)
+    }
+    await questions.update_question_duplicates(session, changed)
+    for question in rfp_questions:
+        question.duplicate_of = duplicate_of.get(question.question_id)
+    if duplicate_of:
+        logger.info(
+            "%d of %d questions repeat an earlier question and share its answer",
+            len(duplicate_of),
+            len(rfp_questions),
+        )
+    return len(duplicate_of)
+
+
+async def plan_question_tasks(
+    service: "GenerationService",
+    rfp_questions: List[models.Question],
+    mode: str,
+    priority: int = 0,
+) -> List[Tuple[Awaitable, List[int]]]:
+    """
+    Builds the agent calls that answer a set of questions in the given mode.
+
+    Questions close to an SME-approved answer are answered from the answer
+    library. In the batched mode the knowledge context of the others is
+    retrieved in one pass and every batched completion is a task of its own;
+    the other modes send each question through the service's stage pipeline.
+
+    A question linked to an earlier duplicate is not generated: it gets a
+    copy of that question's answer once it is stored. Every call waits for a
+    slot of the service's FairScheduler, so the questions of concurrent RFPs
+    take turns.
+
+    Args:
+        service (GenerationService): The shared agents and knowledge.
+        rfp_questions (List[models.Question]): The questions to answer.
+        mode (str): The generation mode, one of GENERATION_MODES.
+        priority (int): The RFP's share of the generation capacity.
+
+    Returns:
+        List[Tuple[Awaitable, List[int]]]: Coroutines to await, each with the ids
+        of the questions it answers.
+    """
+    by_id = {q.question_id: q for q in rfp_questions}
+    shared: Dict[int, List[int]] = defaultdict(list)
+    generated: List[models.Question] = []
+    waiting: List[models.Question] = []
+    for question in rfp_questions:
+        original = question.duplicate_of
+        if original is None:
+            generated.append(question)
+        elif original in by_id and by_id[original].duplicate_of is None:
+            shared[original].append(question.question_id)
+        else:
+            waiting.append(question)
+
+    tasks = []
+    if waiting:
+        # The original was answered by an earlier run, or is being answered
+        # elsewhere (another work queue batch); the latter are answered here.
+        async with async_session_factory() as session:
+            originals = {
+                q.question_id: q
+                for q in [
+                    await questions.get_question(session, original)
+                    for original in {q.duplicate_of for q in waiting}
+                ]
+                if q is not None
+            }
+        copies: Dict[int, List[int]] = defaultdict(list)
+        for question in waiting:
+            original = originals.get(question.duplicate_of)
+            if original is not None and original.status not in PENDING_STATUSES:
+                copies[original.question_id].append(question.question_id)
+            else:
+                generated.append(question)
+        if copies:
+            tasks.append(
+                (
+                    share_answers(service, None, copies),
+                    [q for members in copies.values() for q in members],
+                )
+            )
+
+    for task, ids in await _plan_question_tasks(service, generated, mode):
+        groups = {i: shared[i] for i in ids if i in shared}
+        if groups:
+            task = share_answers(service, task, groups)
+            ids = ids + [q for members in groups.values() for q in members]
+        tasks.append((task, ids))
+
+    rfp_of = {q.question_id: q.rfp_id for q in rfp_questions}
+    return [
+        (service.scheduler.run(rfp_of[ids[0]], task, priority), ids)
+        for task, ids in tasks
+    ]
+
+
+async def _plan_question_tasks(
+    service: "GenerationService", rfp_questions: List[models.Question], mode: str
+) -> List[Tuple[Awaitable, List[int]]]:
+    data_retrieval_agent = service.data_retrieval_agent
+    tasks: List[Tuple[Awaitable, List[int]]] = []
+
+    # Questions close to an SME-approved answer skip the full generation.
+    matches = [None] * len(rfp_questions)
+    if service.answer_library is not None and rfp_questions:
+        matches = await asyncio.to_thread(
+            service.answer_library.match_many,
+            [q.question_text for q in rfp_questions],
+        )
+    for question, match in zip(rfp_questions, matches):
+        if match is not None:
+            tasks.append(
+                (
+                    service.contextualization_agent.process_library_match(
+                        question.question_id, question.question_text, match
+                    ),
+                    [question.question_id],
+                )
+            )
+    rfp_questions = [q for q, match in zip(rfp_questions, matches) if match is None]
+    logger.info("Answer library matched %d questions", len(tasks))
+
+    if mode == "batched":
+        contexts = await data_retrieval_agent.retrieve_contexts(
+            [q.question_text for q in rfp_questions]
+        )
+        for question in rfp_questions:
+            service.progress.question_event(question.question_id, "retrieved")
+        # One task per completion, each stored as soon as it is answered and
+        # each taking its own turn with the scheduler.
+        for batch in data_retrieval_agent.plan_batches(
+            [
+                (question.question_id, question.question_text, context)
+                for question, context in zip(rfp_questions, contexts)
+            ]
+        ):
+            tasks.append(
+                (
+                    data_retrieval_agent.process_batch(
+                        batch, service.contextualization_agent.generate_final_answer
+                    ),
+                    [question_id for question_id, _, _ in batch],
+                )
+            )
+        return tasks
+
+    for question in rfp_questions:
+        logger.info("Processing question ID %s", question.question_id)
+        item = PipelineItem(
+            question_id=question.question_id,
+            question_text=question.question_text,
+            mode=mode,
+            # A draft left by an interrupted run is contextualized as is.
+            draft=(question.question_context or None) if mode == "two_pass" else None,
+        )
+        tasks.append((service.pipeline.run(item), [question.question_id]))
+    return tasks
+
+
+async def share_answers(
+    service: "GenerationService",
+    task: Optional[Awaitable],
+    groups: Dict[int, List[int]],
+) -> None:
+    """
+    Awaits task, then stores the answer of each original question for its
+    duplicates.
+
+    Args:
+        service (GenerationService): The shared agents and knowledge.
+        task (Optional[Awaitable]): The call answering the originals, if they
+            still need answering.
+        groups (Dict[int, List[int]]): Original question ID to the IDs of its
+            duplicates.
+
+    Raises:
+        SharingError: If the originals were answered but their answers could
+            not be shared, e.g. an original has no stored answer. Errors of
+            task itself are raised as they are.
+    """
+    if task is not None:
+        await task
+    try:
+        async with async_session_factory() as session:
+            answers = await llm_responses.get_latest_llm_responses(session, list(groups))
+            copies = []
+            for original, duplicates in groups.items():
+                answer = answers.get(original)
+                if answer is None:
+                    raise RuntimeError(f"Question ID {original} has no answer to share")
+                copies.extend(
+                    {
+                        "question_id": question_id,
+                        "response": answer.response,
+                        "model_id": answer.model_id,
+                        "retrieved_context": f"Shared answer of duplicate question ID {original}",
+                        "status": "duplicate",
+                    }
+                    for question_id in duplicates
+                )
+            await llm_responses.create_llm_responses(
+                session, copies, question_status=QuestionStatus.PENDING_REVIEW
+            )
+    except Exception as e:
+        raise SharingError(
+            str(e), [q for duplicates in groups.values() for q in duplicates]
+        ) from e
+    for copy in copies:
+        service.progress.question_event(copy["question_id"], "persisted")
+
+
+async def finalize_rfp(session: AsyncSession, rfp_id: int) -> None:
+    """
+    Writes the answer spreadsheet of a fully answered RFP and hands it over
+    for review.
+    """
+    await write_questions(session, rfp_id)
+    await rfps.update_rfp_status(session, rfp_id, RFPStatus.PENDING_REVIEW)
+
+
+async def write_questions(session: AsyncSession, rfp_id: int) -> None:
+    """
+    Writes every question of an RFP with its latest answer to the answer
+    spreadsheet.
+
+    Rows are streamed from a single query straight into the sheet, so the
+    export costs one round-trip whatever the number of questions.
+
+    Args:
+        session: Database session to read the questions with.
+        rfp_id: The RFP ID to fetch questions for.
+    """
+    writer = SpreadsheetHandler(str(rfp_id) + ".xlsx")
+
+    written = 0
+    async for _, question_text, answer in llm_responses.stream_answer_sheet(
+        session, rfp_id
+    ):
+        if not written:
+            writer.open_sheet(
+                ["S.No", "Questions", "Answers", "Ratings", "Comments"],
+                widths={"Questions": MAX_COLUMN_WIDTH, "Answers": MAX_COLUMN_WIDTH},
+            )
+        written += 1
+        writer.append_row([written, question_text, answer or "", "", ""])
+    # Ends the read, returning the connection to the pool.
+    await session.rollback()
+
+    if not written:
+        logger.warning("No questions found for RFP ID %s", rfp_id)
+        return
+    writer.save()
+
+    logger.info("Questions for RFP %s written to %s", rfp_id, writer.path)
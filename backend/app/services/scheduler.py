@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Deque, Dict, Optional, TypeVar
+
+logger = logging.getLogger("rfpai.services.scheduler")
+
+# Job priorities accepted by the generate endpoint. An RFP of priority p gets
+# p + 1 times the share of a priority 0 RFP.
+MIN_PRIORITY = 0
+MAX_PRIORITY = 9
+
+T = TypeVar("T")
+
+
+class _Tenant:
+    def __init__(self, rfp_id: int, priority: int, virtual_time: float):
+        self.rfp_id = rfp_id
+        self.priority = priority
+        # Work received so far divided by weight; the lowest goes next.
+        self.virtual_time = virtual_time
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.running = 0
+        self.admitted = 0
+
+    @property
+    def weight(self) -> int:
+        return self.priority + 1
+
+
+class FairScheduler:
+    """
+    Weighted fair share of generation capacity across concurrent RFPs.
+
+    At most capacity question tasks run at once. When tasks wait for a slot,
+    the next one is taken from the RFP that received the least work relative
+    to its weight (stride scheduling), so the tasks of active RFPs are
+    interleaved round-robin and a small RFP is not queued behind every
+    question of a big one. A higher priority RFP gets proportionally more of
+    the slots, without starving the others. An RFP joining late starts level
+    with the RFPs already running rather than catching up on their history.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._running = 0
+        self._tenants: Dict[int, _Tenant] = {}
+
+    async def run(self, rfp_id: int, task: Awaitable[T], priority: int = 0) -> T:
+        """
+        Waits for a slot for the RFP, then awaits task while holding it.
+        """
+        tenant = self._tenant(rfp_id, priority)
+        if self._running < self.capacity and not self._waiting():
+            self._admit(tenant)
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            tenant.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Admitted just before being cancelled; pass the slot on.
+                    self._release(tenant)
+                else:
+                    if waiter in tenant.waiters:
+                        tenant.waiters.remove(waiter)
+                    self._forget(tenant)
+                if asyncio.iscoroutine(task):
+                    task.close()
+                raise
+        try:
+            return await task
+        finally:
+            self._release(tenant)
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "running": self._running,
+            "waiting": self._waiting(),
+            "rfps": {
+                rfp_id: {
+                    "priority": tenant.priority,
+                    "running": tenant.running,
+                    "waiting": len(tenant.waiters),
+                    "admitted": tenant.admitted,
+                }
+                for rfp_id, tenant in self._tenants.items()
+            },
+        }
+
+    def _tenant(self, rfp_id: int, priority: int) -> _Tenant:
+        tenant = self._tenants.get(rfp_id)
+        if tenant is None:
+            tenant = _Tenant(rfp_id, priority, self._min_virtual_time() or 0.0)
+            self._tenants[rfp_id] = tenant
+        tenant.priority = priority
+        return tenant
+
+    def _min_virtual_time(self) -> Optional[float]:
+        if not self._tenants:
+            return None
+        return min(tenant.virtual_time for tenant in self._tenants.values())
+
+    def _waiting(self) -> int:
+        return sum(len(tenant.waiters) for tenant in self._tenants.values())
+
+    def _admit(self, tenant: _Tenant) -> None:
+        self._running += 1
+        tenant.running += 1
+        tenant.admitted += 1
+        tenant.virtual_time += 1 / tenant.weight
+
+    def _release(self, tenant: _Tenant) -> None:
+        self._running -= 1
+        tenant.running -= 1
+        self._dispatch()
+        self._forget(tenant)
+
+    def _dispatch(self) -> None:
+        while self._running < self.capacity:
+            candidates = [t for t in self._tenants.values() if t.waiters]
+            if not candidates:
+                return
+            tenant = min(candidates, key=lambda t: t.virtual_time)
+            waiter = tenant.waiters.popleft()
+            if waiter.done():
+                continue
+            self._admit(tenant)
+            waiter.set_result(None)
+
+    def _forget(self, tenant: _Tenant) -> None:
+        # Idle RFPs are dropped, so a new run starts level with the others.
+        if not tenant.running and not tenant.waiters:
+            self._tenants.pop(tenant.rfp_id, None)
@@ -1,6 +1,13 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 import os
 import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
+
+# Widest a column of a written sheet gets; longer text wraps.
+MAX_COLUMN_WIDTH = 60
 
 
 class SpreadsheetHandler:
@@ -33,3 +40,44 @@ class SpreadsheetHandler:
         """
         self.responses_df = pd.DataFrame(input)
         self.responses_df.to_excel(self.path, index=False, engine="openpyxl")
+
+    def open_sheet(
+        self, columns: List[str], widths: Optional[Dict[str, int]] = None
+    ) -> None:
+        """
+        Starts writing the output spreadsheet row by row. The workbook is write
+        only, so rows are flushed as they are appended instead of held in memory.
+
+        Args:
+            columns: Header of the sheet.
+            widths: Width of each column; a column without one fits its header.
+        """
+        widths = widths or {}
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet()
+        self._alignment = Alignment(wrap_text=True, vertical="top")
+        # Column widths must be set before the first row is written.
+        for index, column in enumerate(columns, start=1):
+            self._sheet.column_dimensions[get_column_letter(index)].width = min(
+                widths.get(column, len(column) + 2), MAX_COLUMN_WIDTH
+            )
+        self.append_row(columns)
+
+    def append_row(self, values: List[Any]) -> None:
+        """
+        Appends a row to the sheet started with open_sheet, wrapping its text.
+        """
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(self._sheet, value=value)
+            if value not in (None, ""):
+                cell.alignment = self._alignment
+            row.append(cell)
+        self._sheet.append(row)
+
+    def save(self) -> None:
+        """
+        Saves the sheet started with open_sheet to the output path.
+        """
+        self._workbook.save(self.path)
+        self._workbook = self._sheet = None
@@ -0,0 +1,376 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..core.config import settings
+from ..crud import jobs, questions, rfps, work_items
+from ..database import async_session_factory
+from ..models import JobStatus, QuestionStatus, RFPStatus, WorkStatus
+from .rfp_generation import (
+    PENDING_STATUSES,
+    failed_question_ids,
+    finalize_rfp,
+    plan_question_tasks,
+    prepare_rfp,
+)
+
+if TYPE_CHECKING:
+    from .generation_service import GenerationService
+
+logger = logging.getLogger("rfpai.services.work_queue")
+
+
+async def enqueue_rfp_work(
+    service: "GenerationService",
+    session: AsyncSession,
+    job_id: int,
+    rfp_id: int,
+    mode: str,
+    priority: int = 0,
+) -> int:
+    """
+    Splits a generation job into one work item per unanswered question, for
+    WorkQueueWorkers on any node to claim.
+
+    Does nothing if the job was already split, e.g. when it is re-queued after
+    a restart. A job without unanswered questions is finalized at once.
+
+    Args:
+        service (GenerationService): The shared agents and knowledge.
+        session (AsyncSession): The job's session.
+        job_id (int): The generation job.
+        rfp_id (int): The RFP to answer.
+        mode (str): The generation mode, one of GENERATION_MODES.
+        priority (int): The job's priority, copied to its work items.
+
+    Returns:
+        int: The number of work items created.
+    """
+    if sum((await work_items.count_work_items(session, job_id)).values()):
+        logger.info("GenerationJob %s already has work items", job_id)
+        return 0
+
+    question_count, pending = await prepare_rfp(service, session, rfp_id)
+    # Duplicates follow their original, so they are usually claimed in the
+    # same batch and get its answer instead of being generated again.
+    pending.sort(key=lambda q: (q.duplicate_of or q.question_id, q.question_id))
+    await jobs.update_job_progress(
+        session, job_id, question_count - len(pending), question_count
+    )
+    if pending:
+        await work_items.create_work_items(
+            session,
+            job_id,
+            rfp_id,
+            [q.question_id for q in pending],
+            mode,
+            priority,
+        )
+    service.progress.start_rfp(
+        rfp_id,
+        [q.question_id for q in pending],
+        question_count,
+        question_count - len(pending),
+    )
+    if not pending:
+        await complete_job(service, session, job_id, rfp_id)
+    return len(pending)
+
+
+async def complete_job(
+    service: "GenerationService", session: AsyncSession, job_id: int, rfp_id: int
+) -> bool:
+    """
+    Finishes a job whose work items are all DONE or FAILED.
+
+    Several workers may see the last item finish; only the one that moves the
+    job out of RUNNING writes the spreadsheet.
+
+    Returns:
+        bool: True if this call finished the job.
+    """
+    counts = await work_items.count_work_items(session, job_id)
+    if counts[WorkStatus.PENDING] or counts[WorkStatus.LEASED]:
+        await session.rollback()
+        return False
+    failed = counts[WorkStatus.FAILED]
+    error = f"{failed} questions could not be answered" if failed else None
+    status = JobStatus.FAILED if failed else JobStatus.SUCCEEDED
+    if not await jobs.finish_running_job(session, job_id, status, error):
+        return False
+
+    if failed:
+        await rfps.update_rfp_status(session, rfp_id, RFPStatus.FAILED)
+        logger.warning("GenerationJob %s finished with %d failed questions", job_id, failed)
+    else:
+        await finalize_rfp(session, rfp_id)
+        logger.info("GenerationJob %s finished", job_id)
+    service.progress.finish_rfp(rfp_id, error=error)
+    return True
+
+
+class WorkQueueWorker:
+    """
+    Answers questions claimed from the work_items table.
+
+    Any number of workers, in the API process or started with
+    `python -m app.worker` on other nodes, share the queue. Each claims a
+    batch of items under a lease, renews its leases while it works
+    (heartbeat) and releases every item as DONE, or back to PENDING on
+    failure until max_attempts is reached. Items of a worker that stops
+    heartbeating are claimed again by others once the lease expires; items
+    whose last allowed lease expired are failed every reap_s by whichever
+    worker gets there first. When the heartbeat finds some of its items
+    cancelled, the worker stops working on their RFP.
+    """
+
+    def __init__(
+        self,
+        service: "GenerationService",
+        worker_id: Optional[str] = None,
+        batch_size: int = 10,
+        lease_s: float = 120,
+        max_attempts: int = 3,
+        poll_s: float = 2.0,
+        reap_s: float = 30.0,
+    ):
+        self.service = service
+        self.worker_id = (
+            worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+        self.batch_size = batch_size
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.poll_s = poll_s
+        self.reap_s = reap_s
+        self._reaped_at: Optional[float] = None
+        self._held: Set[int] = set()
+        # rfp_id -> tasks answering the RFP's claimed items
+        self._groups: Dict[int, Set[asyncio.Task]] = defaultdict(set)
+        self._stopping = asyncio.Event()
+        self._stats = {"claimed": 0, "done": 0, "failed": 0}
+
+    def stop(self) -> None:
+        """
+        Asks the worker to stop once its current batch is released.
+        """
+        self._stopping.set()
+
+    def cancel_rfp(self, rfp_id: int) -> None:
+        """
+        Stops working on the claimed items of an RFP, e.g. after its job was
+        cancelled.
+        """
+        for task in self._groups.get(rfp_id, ()):
+            task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "held": len(self._held)}
+
+    async def run(self) -> None:
+        """
+        Claims and processes batches until stop is called.
+        """
+        logger.info("Work queue worker %s started", self.worker_id)
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not self._stopping.is_set():
+                now = time.monotonic()
+                if self._reaped_at is None or now - self._reaped_at >= self.reap_s:
+                    self._reaped_at = now
+                    await self._fail_expired()
+                try:
+                    async with async_session_factory() as session:
+                        items = await work_items.claim_work_items(
+                            session,
+                            self.worker_id,
+                            self.batch_size,
+                            self.lease_s,
+                            self.max_attempts,
+                        )
+                except Exception as e:
+                    logger.error("Worker %s could not claim work: %s", self.worker_id, e)
+                    items = []
+                if not items:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), self.poll_s)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self._stats["claimed"] += len(items)
+                await self._process(items)
+        finally:
+            heartbeat.cancel()
+            logger.info("Work queue worker %s stopped", self.worker_id)
+
+    async def _process(self, items: List[models.WorkItem]) -> None:
+        self._held.update(item.item_id for item in items)
+        try:
+            groups: Dict[Tuple[int, str, int], List[models.WorkItem]] = defaultdict(
+                list
+            )
+            for item in items:
+                groups[(item.rfp_id, item.mode, item.priority)].append(item)
+            tasks = []
+            for (rfp_id, mode, priority), group in groups.items():
+                task = asyncio.create_task(self._process_group(mode, priority, group))
+                self._groups[rfp_id].add(task)
+                task.add_done_callback(self._groups[rfp_id].discard)
+                tasks.append(task)
+            # A cancelled group comes back as a CancelledError result.
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self._held.difference_update(item.item_id for item in items)
+            for rfp_id in [r for r, tasks in self._groups.items() if not tasks]:
+                del self._groups[rfp_id]
+
+        for job_id, rfp_id in {(item.job_id, item.rfp_id) for item in items}:
+            await self._update_job(job_id, rfp_id)
+
+    async def _process_group(
+        self, mode: str, priority: int, items: List[models.WorkItem]
+    ) -> None:
+        by_question = {item.question_id: item for item in items}
+        async with async_session_factory() as session:
+            result = await session.execute(
+                select(models.Question).where(
+                    models.Question.question_id.in_(list(by_question))
+                )
+            )
+            group_questions = result.scalars().all()
+
+        # A question answered under an earlier, expired lease is not answered again.
+        pending = [q for q in group_questions if q.status in PENDING_STATUSES]
+        for question in group_questions:
+            if question.status not in PENDING_STATUSES:
+                await self._release(by_question[question.question_id])
+
+        try:
+            tasks = await plan_question_tasks(self.service, pending, mode, priority)
+        except Exception as e:
+            logger.error("Worker %s could not plan its batch: %s", self.worker_id, e)
+            for question in pending:
+                await self._release(by_question[question.question_id], error=str(e))
+            return
+
+        async def run(task, question_ids: List[int]):
+            try:
+                await task
+            except Exception as e:
+                unanswered = failed_question_ids(e, question_ids)
+                logger.error(
+                    "Worker %s failed to answer question IDs %s: %s",
+                    self.worker_id,
+                    unanswered,
+                    e,
+                )
+                for question_id in question_ids:
+                    error = str(e) if question_id in unanswered else None
+                    await asyncio.shield(
+                        self._release(by_question[question_id], error=error)
+                    )
+                return
+            # Shielded, so cancelling the RFP does not interrupt a DB write.
+            for question_id in question_ids:
+                await asyncio.shield(self._release(by_question[question_id]))
+
+        await asyncio.gather(*(run(task, ids) for task, ids in tasks))
+
+    async def _release(self, item: models.WorkItem, error: Optional[str] = None) -> None:
+        async with async_session_factory() as session:
+            await work_items.finish_work_item(
+                session, item.item_id, self.worker_id, error, self.max_attempts
+            )
+            if error is None:
+                self._stats["done"] += 1
+            elif item.attempts >= self.max_attempts:
+                self._stats["failed"] += 1
+                self.service.progress.question_event(
+                    item.question_id, "question_failed"
+                )
+                await questions.update_question_status(
+                    session, item.question_id, QuestionStatus.FAILED
+                )
+
+    async def _fail_expired(self) -> None:
+        # Items another worker leased for the last time and never released.
+        try:
+            async with async_session_factory() as session:
+                expired = await work_items.fail_expired_work_items(
+                    session, self.max_attempts
+                )
+                for _, _, _, question_id in expired:
+                    self._stats["failed"] += 1
+                    self.service.progress.question_event(question_id, "question_failed")
+                    await questions.update_question_status(
+                        session, question_id, QuestionStatus.FAILED
+                    )
+        except Exception as e:
+            logger.error(
+                "Worker %s could not fail expired work items: %s", self.worker_id, e
+            )
+            return
+        for job_id, rfp_id in {(job_id, rfp_id) for _, job_id, rfp_id, _ in expired}:
+            await self._update_job(job_id, rfp_id)
+
+    async def _update_job(self, job_id: int, rfp_id: int) -> None:
+        try:
+            async with async_session_factory() as session:
+                job = await jobs.get_job(session, job_id)
+                counts = await work_items.count_work_items(session, job_id)
+                if job is not None and job.total_questions is not None:
+                    answered_before = job.total_questions - sum(counts.values())
+                    await jobs.update_job_progress(
+                        session, job_id, answered_before + counts[WorkStatus.DONE]
+                    )
+                await complete_job(self.service, session, job_id, rfp_id)
+        except Exception as e:
+            logger.error("Worker %s could not update job %s: %s", self.worker_id, job_id, e)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_s / 3)
+            if not self._held:
+                continue
+            held = list(self._held)
+            try:
+                async with async_session_factory() as session:
+                    renewed = await work_items.renew_leases(
+                        session, self.worker_id, held, self.lease_s
+                    )
+                    cancelled = set()
+                    if renewed < len(held):
+                        cancelled = await work_items.get_cancelled_rfp_ids(session, held)
+            except Exception as e:
+                logger.warning("Worker %s missed a heartbeat: %s", self.worker_id, e)
+                continue
+            for rfp_id in cancelled:
+                logger.info(
+                    "Worker %s stops on RFP ID %s, its job was cancelled",
+                    self.worker_id,
+                    rfp_id,
+                )
+                self.cancel_rfp(rfp_id)
+
+
+def create_work_queue_worker(service: "GenerationService") -> WorkQueueWorker:
+    """
+    Creates a worker with the lease and batch settings from the configuration.
+    """
+    return WorkQueueWorker(
+        service,
+        batch_size=settings.WORK_QUEUE_BATCH_SIZE,
+        lease_s=settings.WORK_QUEUE_LEASE_S,
+        max_attempts=settings.WORK_QUEUE_MAX_ATTEMPTS,
+        poll_s=settings.WORK_QUEUE_POLL_S,
+        reap_s=settings.WORK_QUEUE_REAP_S,
+    )
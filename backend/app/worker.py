@@ -0,0 +1,58 @@
+"""
+Standalone work queue worker.
+
+Answers questions from the shared work_items table, so generation load can be
+spread over several processes or nodes. Run it from the backend folder:
+
+    python -m app.worker --concurrency 4
+
+The API must run with WORK_QUEUE_ENABLED=true for jobs to be split into work
+items.
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.logger import setup_logger
+from app.services.generation_service import GenerationService
+
+logger = logging.getLogger("rfpai.worker")
+
+
+async def run(concurrency: int) -> None:
+    service = GenerationService()
+    await service.startup(run_jobs=False)
+    service.start_workers(concurrency)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    logger.info("Started %d work queue workers.", concurrency)
+    await stopping.wait()
+    logger.info("Stopping; finishing claimed work items first.")
+    await service.stop_workers()
+    await service.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="number of workers, each claiming its own batch of work items",
+    )
+    args = parser.parse_args()
+    setup_logger()
+    asyncio.run(run(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Seeds a SQLite database with a large RFP history and measures the latency and
+query plan of the queries behind each endpoint, to catch missing indexes and
+queries that stopped using them.
+
+    python benchmark_db.py                      # 1M questions in benchmark.db
+    python benchmark_db.py --questions 100000 --budget-ms 20
+    python benchmark_db.py --without-indexes    # see what a regression looks like
+
+Exits with status 1 when a query scans a whole large table or its p95 latency
+is over budget. The database is seeded once and reused while its size matches.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import models
+from app.crud import evaluations, llm_responses, questions, rfps
+from app.migrations import HOT_INDEXES, create_indexes, migrate
+from app.models import RFPStatus
+
+QUESTIONS_PER_RFP = 500
+# Share of questions answered twice, and of responses an SME evaluated.
+REANSWERED = 0.2
+EVALUATED = 0.1
+SEED_BATCH = 50_000
+# Statuses of the seeded RFPs, most of them done with.
+RFP_STATUSES = ["COMPLETED"] * 6 + ["REVIEWED"] * 2 + ["PENDING_REVIEW", "FAILED"]
+
+# Tables whose full scan makes a query grow with the whole history.
+LARGE_TABLES = ("questions", "llm_responses", "evaluations")
+FULL_SCAN = re.compile(rf"^SCAN ({'|'.join(LARGE_TABLES)})\b")
+
+
+async def _insert(conn, sql: str, rows) -> None:
+    await conn.exec_driver_sql(sql, rows)
+
+
+async def seed(engine, total_questions: int) -> None:
+    """
+    Fills the database with total_questions questions in RFPs of
+    QUESTIONS_PER_RFP, their responses and evaluations.
+    """
+    rng = random.Random(7)
+    rfp_count = max(1, total_questions // QUESTIONS_PER_RFP)
+    async with engine.begin() as conn:
+        await _insert(
+            conn,
+            "INSERT INTO rfps (rfp_id, filename, status) VALUES (?, ?, ?)",
+            [
+                (rfp_id, f"rfp-{rfp_id}.xlsx", rng.choice(RFP_STATUSES))
+                for rfp_id in range(1, rfp_count + 1)
+            ],
+        )
+
+    response_id = 0
+    eval_id = 0
+    for start in range(0, total_questions, SEED_BATCH):
+        question_rows, response_rows, evaluation_rows = [], [], []
+        for question_id in range(start + 1, min(total_questions, start + SEED_BATCH) + 1):
+            rfp_id = min(rfp_count, (question_id - 1) // QUESTIONS_PER_RFP + 1)
+            question_rows.append(
+                (question_id, rfp_id, f"Question {question_id} about control {rng.random()}?")
+            )
+            for _ in range(2 if rng.random() < REANSWERED else 1):
+                response_id += 1
+                response_rows.append((response_id, question_id, f"Answer {response_id}"))
+                if rng.random() < EVALUATED:
+                    eval_id += 1
+                    evaluation_rows.append(
+                        (eval_id, response_id, f"Revised {response_id}", rng.randint(1, 5))
+                    )
+        async with engine.begin() as conn:
+            await _insert(
+                conn,
+                "INSERT INTO questions (question_id, rfp_id, question_text, status) "
+                "VALUES (?, ?, ?, 'PENDING_REVIEW')",
+                question_rows,
+            )
+            await _insert(
+                conn,
+                "INSERT INTO llm_responses (response_id, question_id, response, status) "
+                "VALUES (?, ?, ?, 'single_pass')",
+                response_rows,
+            )
+            await _insert(
+                conn,
+                "INSERT INTO evaluations (eval_id, response_id, fine_tuned_response, score) "
+                "VALUES (?, ?, ?, ?)",
+                evaluation_rows,
+            )
+        print(f"  seeded {start + len(question_rows):,} questions", end="\r", flush=True)
+    async with engine.begin() as conn:
+        summaries = rfps.summary_counts(models.RFP.rfp_id)
+        await conn.execute(models.RFP.__table__.update().values(**summaries))
+        await conn.exec_driver_sql("ANALYZE")
+    print()
+
+
+async def _answer_sheet(session: AsyncSession, rfp_id: int) -> None:
+    async for _ in llm_responses.stream_answer_sheet(session, rfp_id):
+        pass
+
+
+def _first_question(rfp_id: int) -> int:
+    return (rfp_id - 1) * QUESTIONS_PER_RFP + 1
+
+
+# Endpoint or job step -> the queries it runs for an RFP.
+CASES: Dict[str, Callable[[AsyncSession, int], Awaitable]] = {
+    "GET /files/ (RFP list)": lambda db, rfp_id: rfps.list_rfps(db, 20),
+    "GET /files/ (RFP list, later page)": lambda db, rfp_id: (
+        rfps.list_rfps(db, 20, before_id=rfp_id)
+    ),
+    "GET /files/ (RFP list by status)": lambda db, rfp_id: (
+        rfps.list_rfps(db, 20, before_id=rfp_id, status=RFPStatus.PENDING_REVIEW)
+    ),
+    "generation: questions of an RFP": questions.get_questions_by_rfp,
+    "generation: share duplicate answers": lambda db, rfp_id: (
+        llm_responses.get_latest_llm_responses(
+            db, list(range(_first_question(rfp_id), _first_question(rfp_id) + 20))
+        )
+    ),
+    "generation: latest response": lambda db, rfp_id: (
+        llm_responses.get_llm_responses_by_question(db, _first_question(rfp_id))
+    ),
+    "answer sheet export": _answer_sheet,
+    "POST /files/revise (review state)": evaluations.get_review_state,
+    "GET /jobs (duplicate count)": questions.count_duplicate_questions,
+    "evaluations of a response": lambda db, rfp_id: (
+        evaluations.get_evaluations_by_response(db, _first_question(rfp_id))
+    ),
+}
+
+
+async def explain(engine, statements: List[Tuple[str, tuple]]) -> List[str]:
+    plan = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + statement, parameters
+            )
+            plan.extend(row[3] for row in result.all())
+    return plan
+
+
+async def run(args) -> int:
+    expected = max(1, args.questions // QUESTIONS_PER_RFP)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.abspath(args.db)}")
+    await migrate(engine)
+    async with engine.connect() as conn:
+        seeded = (await conn.execute(text("SELECT count(*) FROM rfps"))).scalar_one()
+    if seeded != expected:
+        await engine.dispose()
+        os.remove(args.db)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.abspath(args.db)}")
+        await migrate(engine)
+        print(f"Seeding {args.questions:,} questions into {args.db}")
+        start = time.perf_counter()
+        await seed(engine, args.questions)
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+    async with engine.begin() as conn:
+        if args.without_indexes:
+            for name in HOT_INDEXES:
+                await conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        else:
+            # Recreates the indexes an earlier --without-indexes run dropped.
+            await conn.run_sync(create_indexes(*HOT_INDEXES))
+
+    captured: List[Tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, tuple(parameters or ())))
+
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    rng = random.Random(1)
+    failures = 0
+    print(f"\n{'case':<40}{'p50 ms':>9}{'p95 ms':>9}  plan")
+    for name, case in CASES.items():
+        timings = []
+        for run_index in range(args.runs):
+            rfp_id = rng.randint(1, expected)
+            if run_index == 0:
+                captured.clear()
+                event.listen(engine.sync_engine, "before_cursor_execute", capture)
+            async with sessions() as session:
+                start = time.perf_counter()
+                await case(session, rfp_id)
+                timings.append(1000 * (time.perf_counter() - start))
+            if run_index == 0:
+                event.remove(engine.sync_engine, "before_cursor_execute", capture)
+                plan = await explain(engine, list(captured))
+        p50 = statistics.median(timings)
+        p95 = sorted(timings)[min(len(timings) - 1, int(0.95 * len(timings)))]
+        scans = [step for step in plan if FULL_SCAN.match(step)]
+        slow = p95 > args.budget_ms
+        failures += bool(scans or slow)
+        flag = " <- FULL SCAN" if scans else (" <- OVER BUDGET" if slow else "")
+        print(f"{name:<40}{p50:>9.2f}{p95:>9.2f}  {' | '.join(plan)}{flag}")
+
+    await engine.dispose()
+    if failures:
+        print(f"\n{failures} case(s) scan a large table or exceed {args.budget_ms} ms p95")
+        return 1
+    print(f"\nAll cases use indexes and stay within {args.budget_ms} ms p95")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    parser.add_argument("--db", default="benchmark.db")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--without-indexes", action="store_true")
+    sys.exit(asyncio.run(run(parser.parse_args())))
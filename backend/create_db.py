@@ -1,13 +1,15 @@
 import asyncio
-from app.database import async_engine, Base, DATABASE_URL
-from app import models
+from app.database import async_engine
+from app.migrations import migrate
 
 
 async def init_db():
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    versions = await migrate(async_engine)
 
-    print("✅ Tables created successfully")
+    if versions:
+        print(f"✅ Applied migrations {versions}")
+    else:
+        print("✅ Database is up to date")
 
 
 if __name__ == "__main__":
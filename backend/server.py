@@ -1,14 +1,27 @@
 import logging
+from contextlib import asynccontextmanager
 from app.logger import setup_logger
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import generation
+from app.routes import generation, jobs, metrics
+from app.services.generation_service import GenerationService
 
 setup_logger()
-app = FastAPI()
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    service = GenerationService()
+    await service.startup()
+    app.state.generation_service = service
+    yield
+    await service.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
 origins = [
     "http://localhost",
     "http://localhost:5173",
@@ -22,3 +35,5 @@ app.add_middleware(
 )
 
 app.include_router(generation.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
@@ -0,0 +1,68 @@
+import os
+
+# Settings are read on import of the app; the tests never reach Azure.
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+os.environ.setdefault("AZURE_OPENAI_KEY", "test")
+os.environ.setdefault("AZURE_SQL_CONNECTION_STRING", "sqlite+aiosqlite:///:memory:")
+
+import importlib
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.crud import jobs, questions, rfps
+from app.migrations import migrate
+
+# Modules that open their own sessions with app.database.async_session_factory.
+SESSION_FACTORY_USERS = [
+    "app.agents.data_contextualization_agent",
+    "app.agents.data_retrieval_agent",
+    "app.routes.generation",
+    "app.services.job_queue",
+    "app.services.pipeline",
+    "app.services.progress",
+    "app.services.rfp_generation",
+    "app.services.work_queue",
+]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine():
+    # One shared connection, so every session sees the same in-memory database.
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    await migrate(engine)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def session(engine):
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+
+
+@pytest.fixture
+def session_factory(engine, monkeypatch):
+    """
+    Points the sessions the app opens on its own at the test database.
+    """
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    for name in SESSION_FACTORY_USERS:
+        monkeypatch.setattr(importlib.import_module(name), "async_session_factory", factory)
+    return factory
+
+
+@pytest.fixture
+async def job(session):
+    """
+    A queued job of an RFP with three questions.
+    """
+    rfp = await rfps.create_rfp(session, "rfp.xlsx")
+    await questions.create_questions(session, rfp.rfp_id, ["Q1?", "Q2?", "Q3?"])
+    return await jobs.create_job(session, rfp.rfp_id, "single_pass")
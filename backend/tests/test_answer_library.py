@@ -0,0 +1,49 @@
+import pytest
+
+from app.services.answer_library import AnswerLibrary
+
+
+@pytest.fixture
+def library():
+    library = AnswerLibrary()
+    library._index(
+        [
+            (1, "Do you support SSO?", "Yes, via SAML 2.0.", 5),
+            (2, "Are you ISO 27001 certified?", "Yes, since 2019.", 5),
+            (3, "Do you have data centers in Europe?", "Yes, in Frankfurt.", 4),
+            (4, "Do you encrypt customer data at rest with AES 256?", "Yes.", 5),
+        ]
+    )
+    return library
+
+
+def test_same_question_is_reused(library):
+    (match,) = library.match_many(["do you support SSO"])
+    assert match.eval_id == 1
+    assert match.reusable
+
+
+def test_reworded_question_is_adapted(library):
+    (match,) = library.match_many(["Do you encrypt all customer data at rest with AES 256?"])
+    assert match.eval_id == 4
+    assert not match.reusable
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Do you support SSL?",
+        "Are you ISO 9001 certified?",
+        "Are you SOC 2 certified?",
+        "Do you have data centers in Asia?",
+        "Do you encrypt customer data at rest with AES 128?",
+    ],
+)
+def test_near_miss_is_not_matched(library, question):
+    assert library.match_many([question]) == [None]
+
+
+def test_stats_count_hits_and_misses(library):
+    library.match_many(["Do you support SSO?", "Do you support SSL?"])
+    stats = library.stats()
+    assert (stats["reused"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
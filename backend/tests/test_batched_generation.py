@@ -0,0 +1,76 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents.data_retrieval_agent import DataRetrievalAgent
+from app.core.config import settings
+from app.crud import llm_responses, questions
+from app.services.progress import ProgressBroker
+from app.services.rfp_generation import plan_question_tasks
+from app.services.scheduler import FairScheduler
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeLLM:
+    """
+    Answers every question of a batched prompt, failing the prompts that
+    mention fail_on.
+    """
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.prompts = []
+
+    async def complete(self, messages, **kwargs):
+        prompt = messages[0]["content"]
+        self.prompts.append(prompt)
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("LLM unavailable")
+        ids = re.findall(r'"id": "(\d+)"', prompt)
+        content = json.dumps({"answers": [{"id": i, "answer": f"A{i}"} for i in ids]})
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _service(llm):
+    knowledge = SimpleNamespace(get_contexts=lambda texts, k: ["context"] * len(texts))
+    progress = ProgressBroker()
+    return SimpleNamespace(
+        data_retrieval_agent=DataRetrievalAgent(knowledge, llm, progress=progress),
+        contextualization_agent=SimpleNamespace(generate_final_answer=None),
+        answer_library=None,
+        progress=progress,
+        scheduler=FairScheduler(4),
+    )
+
+
+@pytest.fixture
+async def rfp_questions(session, job, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BATCH_MAX_QUESTIONS", 2)
+    await questions.create_questions(session, job.rfp_id, ["Q4?", "Q5?"])
+    return await questions.get_questions_by_rfp(session, job.rfp_id)
+
+
+async def test_every_batch_is_a_task_of_its_own(session_factory, rfp_questions):
+    llm = FakeLLM()
+    tasks = await plan_question_tasks(_service(llm), rfp_questions, "batched")
+    assert [len(ids) for _, ids in tasks] == [2, 2, 1]
+    await asyncio.gather(*(task for task, _ in tasks))
+    assert len(llm.prompts) == 3
+
+
+async def test_failed_batch_keeps_the_answers_of_the_others(
+    session, session_factory, rfp_questions
+):
+    service = _service(FakeLLM(fail_on="Q3?"))
+    tasks = await plan_question_tasks(service, rfp_questions, "batched")
+    results = await asyncio.gather(*(task for task, _ in tasks), return_exceptions=True)
+    assert [isinstance(r, Exception) for r in results] == [False, True, False]
+
+    ids = [q.question_id for q in rfp_questions]
+    answers = await llm_responses.get_latest_llm_responses(session, ids)
+    assert sorted(answers) == ids[:2] + ids[4:]
@@ -0,0 +1,94 @@
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents.data_retrieval_agent import DataRetrievalAgent
+from app.crud import llm_responses, questions, rfps
+from app.models import QuestionStatus
+from app.services import rfp_generation
+from app.services.dedup import find_duplicates
+from app.services.progress import ProgressBroker
+from app.services.scheduler import FairScheduler
+
+pytestmark = pytest.mark.anyio
+
+
+def test_exact_duplicates_after_normalization():
+    texts = ["Do you support SSO?", "do you support  SSO", "Describe your backups."]
+    assert find_duplicates(texts) == {1: 0}
+
+
+def test_near_duplicates_are_grouped():
+    texts = [
+        "Describe your approach to disaster recovery for the hosted platform.",
+        "Describe your approach to disaster recovery for the hosted platforms.",
+        "List the certifications your data centres hold.",
+    ]
+    assert find_duplicates(texts) == {1: 0}
+
+
+def test_questions_with_different_numbers_are_kept_apart():
+    texts = [
+        "Please confirm compliance with the requirements of section 3 of the contract.",
+        "Please confirm compliance with the requirements of section 4 of the contract.",
+    ]
+    assert find_duplicates(texts) == {}
+
+
+def test_near_duplicates_do_not_chain():
+    # The second question is close to both others, which are far apart.
+    base = "describe the encryption used for customer data at rest in storage"
+    texts = [base, base + " and in backup", base + " and in backup copies kept offsite"]
+    assert find_duplicates(texts, threshold=0.75) == {1: 0}
+
+
+class FakeLLM:
+    async def complete(self, messages, **kwargs):
+        ids = re.findall(r'"id": "(\d+)"', messages[0]["content"])
+        content = json.dumps({"answers": [{"id": i, "answer": f"A{i}"} for i in ids]})
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+async def test_failed_sharing_fails_only_the_duplicates(
+    session, session_factory, monkeypatch
+):
+    rfp_id = (await rfps.create_rfp(session, "rfp.xlsx")).rfp_id
+    await questions.create_questions(
+        session, rfp_id, ["Do you support SSO?", "Do you support SSO?"]
+    )
+    original, duplicate = [
+        q.question_id for q in await questions.get_questions_by_rfp(session, rfp_id)
+    ]
+
+    async def no_answers(session, question_ids):
+        return {}
+
+    monkeypatch.setattr(llm_responses, "get_latest_llm_responses", no_answers)
+
+    async def extracted(rfp_id):
+        return None
+
+    progress = ProgressBroker()
+    knowledge = SimpleNamespace(get_contexts=lambda texts, k: ["context"] * len(texts))
+    service = SimpleNamespace(
+        question_processing_agent=SimpleNamespace(process=extracted),
+        data_retrieval_agent=DataRetrievalAgent(knowledge, FakeLLM(), progress=progress),
+        contextualization_agent=SimpleNamespace(generate_final_answer=None),
+        answer_library=None,
+        progress=progress,
+        scheduler=FairScheduler(4),
+    )
+    with pytest.raises(RuntimeError, match="1 of 2 questions"):
+        await rfp_generation.generate_rfp_answers(service, session, rfp_id, "batched")
+
+    session.expire_all()
+    assert (await questions.get_question(session, original)).status == (
+        QuestionStatus.PENDING_REVIEW
+    )
+    assert (await questions.get_question(session, duplicate)).status == (
+        QuestionStatus.FAILED
+    )
+    assert progress.snapshot(rfp_id)["completed"] == 1
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+
+from app import models
+from app.crud import jobs
+from app.models import JobStatus
+from app.services import job_queue
+from app.services.job_queue import GenerationJobQueue
+from app.services.progress import ProgressBroker
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def queue(session_factory):
+    service = SimpleNamespace(progress=ProgressBroker(), workers=[])
+    return GenerationJobQueue(service, workers=1, heartbeat_s=60, stale_s=30)
+
+
+async def _beat(session, job_id, seconds_ago):
+    await session.execute(
+        update(models.GenerationJob)
+        .where(models.GenerationJob.job_id == job_id)
+        .values(heartbeat_at=datetime.now(timezone.utc) - timedelta(seconds=seconds_ago))
+    )
+    await session.commit()
+
+
+async def test_second_job_of_an_rfp_is_not_created(session, job):
+    again, created = await jobs.create_job_unless_active(session, job.rfp_id, "batched")
+    assert not created and again.job_id == job.job_id
+
+    await jobs.cancel_job(session, job.job_id)
+    new, created = await jobs.create_job_unless_active(session, job.rfp_id, "batched")
+    assert created and new.job_id != job.job_id and new.status == JobStatus.QUEUED
+
+
+async def _get(session, job_id):
+    session.expire_all()
+    return await jobs.get_job(session, job_id)
+
+
+async def test_job_starts_once(session, job):
+    assert await jobs.start_job(session, job.job_id, "a")
+    assert not await jobs.start_job(session, job.job_id, "b")
+    assert (await _get(session, job.job_id)).owner == "a"
+
+
+async def test_cancelled_job_does_not_start(session, job):
+    await jobs.cancel_job(session, job.job_id)
+    assert not await jobs.start_job(session, job.job_id, "a")
+
+
+async def test_only_jobs_of_a_silent_owner_are_requeued(session, job):
+    job_id = job.job_id
+    await jobs.start_job(session, job_id, "a")
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert await jobs.requeue_orphaned_jobs(session, stale_before) == []
+
+    await _beat(session, job_id, 60)
+    assert await jobs.renew_job_heartbeats(session, "b", [job_id]) == 0
+    requeued = await jobs.requeue_orphaned_jobs(session, stale_before)
+    assert [j.job_id for j in requeued] == [job_id]
+    assert (await _get(session, job_id)).status == JobStatus.QUEUED
+
+
+async def test_job_handed_to_the_work_queue_is_not_requeued(session, job):
+    await jobs.start_job(session, job.job_id, "a")
+    await jobs.clear_job_owner(session, job.job_id)
+    far_future = datetime.now(timezone.utc) + timedelta(days=1)
+    assert await jobs.requeue_orphaned_jobs(session, far_future) == []
+
+
+async def test_submit_returns_the_active_job(queue, job):
+    active, created = await queue.submit(job.rfp_id, "batched")
+    assert not created and active.job_id == job.job_id
+    assert queue.stats()["queued"] == 0
+
+
+async def test_start_requeues_only_jobs_of_dead_processes(session, queue, job):
+    job_id = job.job_id
+    await jobs.start_job(session, job_id, "other-process")
+    await queue.start()
+    await queue.stop()
+    assert queue.stats()["queued"] == 0
+    assert (await _get(session, job_id)).owner == "other-process"
+
+    await _beat(session, job_id, 60)
+    await queue.start()
+    queued = queue.stats()["queued"]
+    await queue.stop()
+    assert queued == 1
+    assert (await _get(session, job_id)).status == JobStatus.QUEUED
+
+
+async def test_job_started_elsewhere_is_not_run_again(session, queue, job, monkeypatch):
+    runs = []
+
+    async def generate(*args, **kwargs):
+        runs.append(args)
+        return 0
+
+    monkeypatch.setattr(job_queue, "generate_rfp_answers", generate)
+    await jobs.start_job(session, job.job_id, "other-process")
+    await queue._run(job.job_id)
+    assert runs == []
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from app.knowledge.lexical_index import BM25Index
+
+WORDS = "cloud data security backup region audit encryption network sso iso".split()
+
+
+@pytest.fixture
+def index():
+    rng = random.Random(7)
+    documents = [rng.choices(WORDS, k=rng.randint(3, 30)) for _ in range(200)]
+    return BM25Index.build(documents)
+
+
+def test_rarer_terms_rank_higher():
+    index = BM25Index.build([["cloud", "data"], ["cloud"], ["cloud", "sso"]])
+    assert [doc_id for doc_id, _ in index.search(["cloud", "sso"], 3)][0] == 2
+
+
+def test_search_many_matches_search(index):
+    rng = random.Random(11)
+    queries = [rng.choices(WORDS, k=rng.randint(1, 4)) for _ in range(50)]
+    for query, hits in zip(queries, index.search_many(queries, 5)):
+        expected = index.search(query, 5)
+        assert [score for _, score in hits] == pytest.approx(
+            [score for _, score in expected]
+        )
+        assert len(hits) == 5
+
+
+def test_search_many_without_matches(index):
+    assert index.search_many([[], ["unknown"], ["sso"]], 3)[:2] == [[], []]
+    assert index.search_many([["sso"]], 0) == [[]]
+    assert index.search_many([], 3) == []
+
+
+def test_search_many_returns_fewer_than_k_matches():
+    index = BM25Index.build([["sso"], ["cloud"], ["sso", "cloud"]])
+    (hits,) = index.search_many([["sso"]], 10)
+    assert sorted(doc_id for doc_id, _ in hits) == [0, 2]
+
+
+def test_index_round_trips_through_a_dict(index):
+    copy = BM25Index.from_dict(index.to_dict())
+    assert copy.search_many([["audit", "iso"]], 4) == index.search_many(
+        [["audit", "iso"]], 4
+    )
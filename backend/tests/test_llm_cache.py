@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite3"), 1000, "v1")
+    yield cache
+    cache.close()
+
+
+def test_key_ignores_whitespace_but_not_the_request(tmp_path, cache):
+    key = cache.make_key("gpt", 0.2, "Answer  the\nquestion.")
+    assert key == cache.make_key("gpt", 0.2, " Answer the question. ")
+    assert key != cache.make_key("gpt", 0.3, "Answer the question.")
+    assert key != cache.make_key("gpt-mini", 0.2, "Answer the question.")
+    newer = LLMResponseCache(str(tmp_path / "newer.sqlite3"), 1000, "v2")
+    assert key != newer.make_key("gpt", 0.2, "Answer the question.")
+    newer.close()
+
+
+def test_get_counts_hits_and_misses(cache):
+    assert cache.get("missing") is None
+    cache.put("key", "answer")
+    assert cache.get("key") == "answer"
+    assert asyncio.run(cache.aget("key")) == "answer"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for key in "abcd":
+        cache.put(key, "x" * 200)
+        time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.put("e", "x" * 300)
+    # 1100 bytes is over the limit; the least recently used go until 900 are left.
+    assert cache.stats()["entries"] == 4 and cache.stats()["bytes"] == 900
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acde")
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    cache = LLMResponseCache(path, 1000)
+    cache.put("key", "answer")
+    cache.put("key", "a longer answer")
+    cache.close()
+    reopened = LLMResponseCache(path, 1000)
+    assert reopened.get("key") == "a longer answer"
+    assert reopened.stats()["bytes"] == len("a longer answer")
+    reopened.close()
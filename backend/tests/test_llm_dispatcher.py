@@ -0,0 +1,94 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+
+from app.services.llm_dispatcher import LLMDispatcher, TokenBucket
+
+pytestmark = pytest.mark.anyio
+
+MESSAGES = [{"role": "user", "content": "Q?"}]
+
+
+def _error(cls, status, headers=None):
+    request = httpx.Request("POST", "https://example.openai.azure.com")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls("error", response=response, body=None)
+
+
+class FakeClient:
+    """
+    Chat completions client raising the given errors before answering.
+    """
+
+    def __init__(self, *errors, delay_s=0.0):
+        self.errors = list(errors)
+        self.delay_s = delay_s
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay_s)
+            if self.errors:
+                raise self.errors.pop(0)
+            return SimpleNamespace(usage=SimpleNamespace(total_tokens=10))
+        finally:
+            self.in_flight -= 1
+
+
+def _dispatcher(client, **kwargs):
+    return LLMDispatcher(client, base_delay_s=0.001, max_delay_s=0.01, **kwargs)
+
+
+async def test_throttled_request_is_retried_after_retry_after():
+    client = FakeClient(_error(RateLimitError, 429, {"retry-after-ms": "50"}))
+    dispatcher = _dispatcher(client)
+    start = time.monotonic()
+    await dispatcher.complete("gpt", MESSAGES, 0.2)
+    assert time.monotonic() - start >= 0.05
+    stats = dispatcher.stats()
+    assert (client.calls, stats["retries"], stats["throttled"]) == (2, 1, 1)
+    assert stats["succeeded"] == 1 and stats["tokens_used"] == 10
+
+
+async def test_request_fails_after_max_retries():
+    errors = [_error(RateLimitError, 429) for _ in range(3)]
+    dispatcher = _dispatcher(FakeClient(*errors), max_retries=2)
+    with pytest.raises(RateLimitError):
+        await dispatcher.complete("gpt", MESSAGES, 0.2)
+    assert dispatcher.stats()["retries"] == 2 and dispatcher.stats()["failed"] == 1
+
+
+async def test_bad_request_is_not_retried():
+    client = FakeClient(_error(BadRequestError, 400))
+    dispatcher = _dispatcher(client)
+    with pytest.raises(BadRequestError):
+        await dispatcher.complete("gpt", MESSAGES, 0.2)
+    assert client.calls == 1 and dispatcher.stats()["failed"] == 1
+
+
+async def test_in_flight_requests_are_bounded():
+    client = FakeClient(delay_s=0.01)
+    dispatcher = _dispatcher(client, max_concurrency=3)
+    await asyncio.gather(*(dispatcher.complete("gpt", MESSAGES, 0.2) for _ in range(10)))
+    assert client.peak == 3 and dispatcher.stats()["in_flight"] == 0
+
+
+async def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(600)  # 10 tokens a second
+    await bucket.acquire(600)
+    start = time.monotonic()
+    await bucket.acquire(1)
+    assert time.monotonic() - start >= 0.09
+    # Unused reservations are returned, but never beyond capacity.
+    bucket.adjust(10_000)
+    await asyncio.wait_for(bucket.acquire(600), 0.05)
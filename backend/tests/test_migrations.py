@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.migrations import MIGRATIONS, applied_versions, migrate
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_migrate_applies_every_version_once(engine):
+    assert await applied_versions(engine) == [m.version for m in MIGRATIONS]
+    assert await migrate(engine) == []
+
+
+async def test_migrations_create_hot_indexes(engine):
+    async with engine.connect() as conn:
+        indexes = await conn.run_sync(
+            lambda sync: {
+                index["name"]
+                for table in ("rfps", "questions", "llm_responses", "evaluations")
+                for index in inspect(sync).get_indexes(table)
+            }
+        )
+    assert {
+        "ix_rfps_status_rfp_id",
+        "ix_questions_rfp_id_question_id",
+        "ix_llm_responses_question_id_response_id",
+        "ix_evaluations_response_id_eval_id",
+    } <= indexes
+
+
+# The tables as databases created before the first migration have them.
+BASELINE_SCHEMA = [
+    """
+    CREATE TABLE rfps (
+        rfp_id INTEGER PRIMARY KEY, filename VARCHAR(255) NOT NULL,
+        storage_path VARCHAR(255), uploaded_at DATETIME, updated_at DATETIME,
+        status VARCHAR(23) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE questions (
+        question_id INTEGER PRIMARY KEY,
+        rfp_id INTEGER NOT NULL REFERENCES rfps (rfp_id),
+        question_text TEXT NOT NULL, question_context TEXT, page_number INTEGER,
+        extracted_at DATETIME, updated_at DATETIME, status VARCHAR(14) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE llm_responses (
+        response_id INTEGER PRIMARY KEY,
+        question_id INTEGER NOT NULL REFERENCES questions (question_id),
+        model_id VARCHAR(100), retrieved_context TEXT, response TEXT NOT NULL,
+        generated_at DATETIME, retrieval_time_ms INTEGER,
+        generation_time_ms INTEGER, tokens_used INTEGER, updated_at DATETIME,
+        status VARCHAR(50) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE evaluations (
+        eval_id INTEGER PRIMARY KEY,
+        response_id INTEGER NOT NULL REFERENCES llm_responses (response_id),
+        original_response TEXT, fine_tuned_response TEXT, score INTEGER,
+        sme_comments TEXT, evaluated_at DATETIME, updated_at DATETIME
+    )
+    """,
+]
+
+BASELINE_ROWS = [
+    "INSERT INTO rfps (rfp_id, filename, status) VALUES"
+    " (1, 'a.pdf', 'PENDING_REVIEW'), (2, 'b.pdf', 'UPLOADED')",
+    "INSERT INTO questions (question_id, rfp_id, question_text, status) VALUES"
+    " (1, 1, 'q1', 'PENDING_REVIEW'), (2, 1, 'q2', 'PENDING_REVIEW'),"
+    " (3, 1, 'q3', 'EXTRACTED')",
+    "INSERT INTO llm_responses (response_id, question_id, response, status) VALUES"
+    " (1, 1, 'a1', 'final'), (2, 2, 'a2', 'final')",
+    # Only the latest evaluation of a response counts, and only if it is scored.
+    "INSERT INTO evaluations (eval_id, response_id, score) VALUES"
+    " (1, 1, 2), (2, 1, 4), (3, 2, 5), (4, 2, NULL)",
+]
+
+
+async def test_migrate_upgrades_a_baseline_database():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA + BASELINE_ROWS:
+            await conn.exec_driver_sql(statement)
+
+    assert await migrate(engine) == [m.version for m in MIGRATIONS]
+
+    async with engine.connect() as conn:
+        summaries = (
+            await conn.exec_driver_sql(
+                "SELECT rfp_id, question_count, answered_count, score_total, score_count"
+                " FROM rfps ORDER BY rfp_id"
+            )
+        ).all()
+        schema = await conn.run_sync(
+            lambda sync: {
+                table: (
+                    {c["name"] for c in inspect(sync).get_columns(table)},
+                    {i["name"] for i in inspect(sync).get_indexes(table)},
+                )
+                for table in inspect(sync).get_table_names()
+            }
+        )
+    await engine.dispose()
+
+    assert [tuple(row) for row in summaries] == [(1, 3, 2, 4, 1), (2, 0, 0, 0, 0)]
+    assert "duplicate_of" in schema["questions"][0]
+    assert {"priority", "owner", "heartbeat_at"} <= schema["generation_jobs"][0]
+    assert "ix_rfps_status_rfp_id" in schema["rfps"][1]
+    assert "ix_questions_rfp_id_question_id" in schema["questions"][1]
+    assert "ix_llm_responses_question_id_response_id" in schema["llm_responses"][1]
+    assert "ix_evaluations_response_id_eval_id" in schema["evaluations"][1]
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from app.services.pipeline import PipelineItem, Stage, StagePipeline
+
+pytestmark = pytest.mark.anyio
+
+
+def _item(question_id):
+    return PipelineItem(
+        question_id=question_id, question_text=f"Q{question_id}?", mode="test"
+    )
+
+
+class Recorder:
+    """
+    Stage handler recording the questions it saw, and optionally blocking
+    until released.
+    """
+
+    def __init__(self, name, blocking=False):
+        self.name = name
+        self.seen = []
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.cancelled = False
+        if not blocking:
+            self.release.set()
+
+    async def __call__(self, items):
+        self.seen.append([item.question_id for item in items])
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        for item in items:
+            item.answer = (item.answer or "") + self.name
+
+
+@pytest.fixture
+async def running():
+    pipelines = []
+
+    def start(*stages):
+        pipeline = StagePipeline(list(stages))
+        pipeline.start()
+        pipelines.append(pipeline)
+        return pipeline
+
+    yield start
+    for pipeline in pipelines:
+        await pipeline.stop()
+
+
+async def test_run_passes_items_through_every_stage(running):
+    first, second = Recorder("a"), Recorder("b")
+    pipeline = running(Stage("first", first, 2, 4), Stage("second", second, 1, 4))
+    items = await asyncio.gather(*(pipeline.run(_item(n)) for n in range(5)))
+    assert [item.answer for item in items] == ["ab"] * 5
+    assert pipeline.stats()["second"]["processed"] == 5
+
+
+async def test_stage_batches_queued_items(running):
+    gate, batched = Recorder("a", blocking=True), Recorder("b")
+    pipeline = running(
+        Stage("gate", gate, 1, 8, batch_size=8),
+        Stage("batch", batched, 1, 8, batch_size=8),
+    )
+    runs = [asyncio.create_task(pipeline.run(_item(n))) for n in range(4)]
+    await gate.started.wait()
+    gate.release.set()
+    await asyncio.gather(*runs)
+    assert sorted(sum(batched.seen, [])) == [0, 1, 2, 3]
+    assert len(batched.seen) < 4
+
+
+async def test_full_queue_blocks_the_producer(running):
+    slow = Recorder("a", blocking=True)
+    pipeline = running(Stage("slow", slow, 1, 1))
+    runs = [asyncio.create_task(pipeline.run(_item(n))) for n in range(3)]
+    await slow.started.wait()
+    await asyncio.sleep(0.01)
+    # One item in the handler, one in the queue, the third waits to be queued.
+    stage = pipeline.stages[0]
+    assert stage.queue.qsize() == 1 and stage.max_depth == 1
+    assert not any(run.done() for run in runs)
+    slow.release.set()
+    await asyncio.gather(*runs)
+
+
+async def test_cancelling_the_caller_cancels_its_handler(running):
+    slow = Recorder("a", blocking=True)
+    pipeline = running(Stage("slow", slow, 1, 4))
+    run = asyncio.create_task(pipeline.run(_item(1)))
+    await slow.started.wait()
+    run.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await run
+    await asyncio.sleep(0.01)
+    assert slow.cancelled
+    assert pipeline.stats()["slow"]["cancelled"] == 1
+
+
+async def test_non_cancellable_stage_finishes_abandoned_items(running):
+    write = Recorder("a", blocking=True)
+    pipeline = running(Stage("persist", write, 1, 4, cancellable=False))
+    run = asyncio.create_task(pipeline.run(_item(1)))
+    await write.started.wait()
+    run.cancel()
+    await asyncio.sleep(0.01)
+    write.release.set()
+    await asyncio.sleep(0.01)
+    assert not write.cancelled
+    assert pipeline.stats()["persist"]["processed"] == 1
+
+
+async def test_cancelled_items_are_dropped_before_the_next_stage(running):
+    gate, after = Recorder("a", blocking=True), Recorder("b")
+    pipeline = running(
+        Stage("gate", gate, 1, 4, cancellable=False), Stage("after", after, 1, 4)
+    )
+    run = asyncio.create_task(pipeline.run(_item(1)))
+    await gate.started.wait()
+    run.cancel()
+    await asyncio.sleep(0)
+    gate.release.set()
+    await asyncio.sleep(0.01)
+    assert after.seen == []
+    assert pipeline.stats()["after"]["processed"] == 0
+
+
+async def test_failing_stage_raises_to_the_caller(running):
+    async def fail(items):
+        raise ValueError("boom")
+
+    pipeline = running(Stage("fail", fail, 1, 4))
+    with pytest.raises(ValueError, match="boom"):
+        await pipeline.run(_item(1))
+    assert pipeline.stats()["fail"]["failed"] == 1
+
+
+async def test_stop_cancels_pending_runs():
+    slow = Recorder("a", blocking=True)
+    pipeline = StagePipeline([Stage("slow", slow, 1, 4)])
+    pipeline.start()
+    runs = [asyncio.create_task(pipeline.run(_item(n))) for n in range(3)]
+    await slow.started.wait()
+    await pipeline.stop()
+    results = await asyncio.gather(*runs, return_exceptions=True)
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert slow.cancelled
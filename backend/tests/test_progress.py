@@ -0,0 +1,132 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.crud import jobs
+from app.models import JobStatus
+from app.routes import generation
+from app.services.progress import ProgressBroker, poll_job_events
+
+pytestmark = pytest.mark.anyio
+
+
+def _drain(queue):
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+async def test_question_failure_does_not_end_the_run():
+    broker = ProgressBroker()
+    queue = broker.subscribe(1)
+    broker.start_rfp(1, [10, 11], total=2)
+    broker.question_event(10, "question_failed")
+    broker.question_event(11, "persisted")
+    broker.finish_rfp(1)
+    events = _drain(queue)
+    assert [e["event"] for e in events] == [
+        "started",
+        "question_failed",
+        "persisted",
+        "finished",
+    ]
+    assert events[1]["status"] == "running"
+    assert (events[-1]["completed"], events[-1]["failed"]) == (1, 1)
+
+
+async def test_run_without_questions_still_finishes():
+    broker = ProgressBroker()
+    queue = broker.subscribe(1)
+    broker.queue_rfp(1)
+    broker.finish_rfp(1)
+    (event,) = _drain(queue)
+    assert (event["event"], event["total"]) == ("finished", 0)
+
+
+async def test_finished_runs_are_pruned():
+    broker = ProgressBroker(max_finished=2)
+    for rfp_id in range(4):
+        broker.start_rfp(rfp_id, [], total=0)
+        broker.finish_rfp(rfp_id)
+    broker.start_rfp(9, [], total=1)
+    assert broker.snapshot(0) is None and broker.snapshot(1) is None
+    assert broker.snapshot(3)["status"] == "finished"
+    assert broker.stats()["tracked_rfps"] == 3
+
+
+async def test_queued_run_hides_the_previous_runs_end():
+    broker = ProgressBroker()
+    broker.start_rfp(1, [], total=0)
+    broker.finish_rfp(1, error="boom")
+    broker.queue_rfp(1)
+    assert broker.snapshot(1)["status"] == "running"
+
+
+async def _stream(broker, rfp_id):
+    response = await generation.stream_generation_events(
+        rfp_id, service=SimpleNamespace(progress=broker)
+    )
+    return [chunk async for chunk in response.body_iterator]
+
+
+async def test_stream_ends_after_a_terminal_snapshot():
+    broker = ProgressBroker()
+    broker.start_rfp(1, [], total=0)
+    broker.finish_rfp(1)
+    chunks = await asyncio.wait_for(_stream(broker, 1), timeout=5)
+    assert len(chunks) == 1 and chunks[0].startswith("event: snapshot")
+
+
+async def test_stream_ends_on_the_run_event_not_a_question_failure():
+    broker = ProgressBroker()
+    broker.start_rfp(1, [10, 11], total=2)
+    stream = asyncio.create_task(_stream(broker, 1))
+    await asyncio.sleep(0.05)
+    broker.question_event(10, "question_failed")
+    await asyncio.sleep(0.05)
+    assert not stream.done()
+    broker.question_event(11, "persisted")
+    broker.finish_rfp(1)
+    chunks = await asyncio.wait_for(stream, timeout=5)
+    assert [c.split("\n")[0] for c in chunks] == [
+        "event: snapshot",
+        "event: question_failed",
+        "event: persisted",
+        "event: finished",
+    ]
+
+
+async def test_poll_follows_the_job_in_the_database(session, session_factory, job):
+    events = poll_job_events(job.rfp_id, interval_s=0.01)
+    snapshot = await anext(events)
+    assert (snapshot["event"], snapshot["status"]) == ("snapshot", "running")
+
+    # A worker in another process answers questions and finishes the job.
+    await jobs.start_job(session, job.job_id, "worker")
+    await jobs.update_job_progress(session, job.job_id, 2, 3)
+    progress = None
+    while progress is None:
+        progress = await anext(events)
+    assert (progress["event"], progress["completed"], progress["total"]) == (
+        "progress",
+        2,
+        3,
+    )
+
+    await jobs.finish_running_job(session, job.job_id, JobStatus.FAILED, "1 failed")
+    finished = None
+    while finished is None:
+        finished = await anext(events)
+    assert (finished["event"], finished["error"]) == ("failed", "1 failed")
+    with pytest.raises(StopAsyncIteration):
+        await anext(events)
+
+
+async def test_poll_of_an_ended_job_stops_after_the_snapshot(
+    session, session_factory, job
+):
+    await jobs.cancel_job(session, job.job_id)
+    events = [event async for event in poll_job_events(job.rfp_id, interval_s=0.01)]
+    assert [(e["event"], e["status"]) for e in events] == [("snapshot", "failed")]
@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from app.crud import evaluations, llm_responses, questions, rfps
+from app.models import RFPStatus
+from app.routes.generation import read_revision, register_revision_for_rfp
+
+pytestmark = pytest.mark.anyio
+
+
+def _sheet(path, rows, columns=("Questions", "Answers", "Ratings", "Comments")):
+    pd.DataFrame(rows, columns=list(columns)).to_excel(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+async def rfp_id(session, job):
+    rfp_id = job.rfp_id
+    first = (await questions.get_questions_by_rfp(session, rfp_id))[0]
+    await llm_responses.create_llm_responses(
+        session, [{"question_id": first.question_id, "response": "A1"}]
+    )
+    return rfp_id
+
+
+async def _review(session, rfp_id):
+    session.expire_all()
+    return {
+        text: (response, answer, score, comments)
+        for _, text, _, response, _, answer, score, comments in (
+            await evaluations.get_review_state(session, rfp_id)
+        )
+    }
+
+
+async def test_import_evaluates_existing_and_new_questions(
+    tmp_path, session, session_factory, rfp_id
+):
+    path = _sheet(
+        tmp_path / "revised.xlsx",
+        [
+            ["Q1?", "A1 revised", 4, "clearer"],
+            [" q2? ", "A2", 3.7, None],
+            ["Q9?", "Added by the SME", 5, "new"],
+        ],
+    )
+    assert len(await register_revision_for_rfp(path, rfp_id)) == 3
+
+    review = await _review(session, rfp_id)
+    assert review["Q1?"] == ("A1", "A1 revised", 4, "clearer")
+    assert review["Q2?"] == ("A2", "A2", 3, None)
+    assert review["Q9?"] == ("Added by the SME", "Added by the SME", 5, "new")
+    assert review["Q3?"] == (None, None, None, None)
+    assert (await rfps.get_rfp(session, rfp_id)).status == RFPStatus.REVIEWED
+
+
+async def test_reimport_records_only_changed_rows(tmp_path, session, session_factory, rfp_id):
+    rows = [["Q1?", "A1 revised", 4, "clearer"], ["Q2?", "A2", 3, None]]
+    path = _sheet(tmp_path / "revised.xlsx", rows)
+    assert len(await register_revision_for_rfp(path, rfp_id)) == 2
+    assert await register_revision_for_rfp(path, rfp_id) == []
+
+    rows[1][2] = 5
+    path = _sheet(tmp_path / "revised.xlsx", rows)
+    assert len(await register_revision_for_rfp(path, rfp_id)) == 1
+    assert (await _review(session, rfp_id))["Q2?"][2] == 5
+
+
+async def test_question_listed_twice_is_revised_by_its_last_row(
+    tmp_path, session, session_factory, rfp_id
+):
+    path = _sheet(
+        tmp_path / "revised.xlsx",
+        [["Q1?", "first", 2, None], ["Q1?", "second", 4, None]],
+    )
+    assert len(await register_revision_for_rfp(path, rfp_id)) == 1
+    assert (await _review(session, rfp_id))["Q1?"][1:3] == ("second", 4)
+
+
+def test_read_revision_rejects_malformed_sheets(tmp_path):
+    missing = _sheet(
+        tmp_path / "missing.xlsx", [["Q1?", "A1", 4]], ("Questions", "Answers", "Ratings")
+    )
+    with pytest.raises(ValueError, match="comments"):
+        read_revision(missing)
+
+    unrated = _sheet(tmp_path / "unrated.xlsx", [["Q1?", "A1", "good", None]])
+    with pytest.raises(ValueError):
+        read_revision(unrated)
@@ -0,0 +1,83 @@
+import pytest
+
+from app.crud import evaluations, llm_responses, questions, rfps
+from app.models import RFPStatus
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def rfp_ids(session):
+    ids = [(await rfps.create_rfp(session, f"rfp-{n}.xlsx")).rfp_id for n in range(5)]
+    await rfps.update_rfp_status(session, ids[1], RFPStatus.REVIEWED)
+    await rfps.update_rfp_status(session, ids[3], RFPStatus.REVIEWED)
+    return ids
+
+
+async def _pages(session, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = await rfps.list_rfps(session, limit, before_id=cursor, **filters)
+        pages.append([rfp.rfp_id for rfp in page])
+        if cursor is None:
+            return pages
+
+
+async def test_list_rfps_pages_newest_first(session, rfp_ids):
+    a, b, c, d, e = rfp_ids
+    assert await _pages(session, 2) == [[e, d], [c, b], [a]]
+
+
+async def test_list_rfps_last_page_is_exactly_full(session, rfp_ids):
+    a, b, c, d, e = rfp_ids
+    assert await _pages(session, 5) == [[e, d, c, b, a]]
+    page, cursor = await rfps.list_rfps(session, 1, before_id=b)
+    assert [rfp.rfp_id for rfp in page] == [a]
+    assert cursor is None
+
+
+async def test_list_rfps_before_the_oldest_is_empty(session, rfp_ids):
+    assert await rfps.list_rfps(session, 2, before_id=rfp_ids[0]) == ([], None)
+
+
+async def test_list_rfps_filters_by_status(session, rfp_ids):
+    a, b, c, d, e = rfp_ids
+    assert await _pages(session, 1, status=RFPStatus.REVIEWED) == [[d], [b]]
+    assert await _pages(session, 10, status=RFPStatus.FAILED) == [[]]
+
+
+async def test_summary_counts_match_a_recount(session):
+    rfp = await rfps.create_rfp(session, "rfp.xlsx")
+    question_ids = await questions.create_questions(
+        session, rfp.rfp_id, ["Q1?", "Q2?", "Q3?"]
+    )
+    response_ids = await llm_responses.create_llm_responses(
+        session,
+        [
+            {"question_id": question_ids[0], "response": "A1"},
+            {"question_id": question_ids[0], "response": "A1 again"},
+            {"question_id": question_ids[1], "response": "A2"},
+        ],
+    )
+    await evaluations.create_evaluations(
+        session,
+        [
+            {"response_id": response_ids[0], "score": 2},
+            {"response_id": response_ids[0], "score": 4},
+            {"response_id": response_ids[2], "score": 5},
+            {"response_id": response_ids[1], "score": None},
+        ],
+    )
+    await evaluations.create_evaluations(
+        session, [{"response_id": response_ids[2], "score": 3}]
+    )
+
+    def summary(rfp):
+        return rfp.question_count, rfp.answered_count, rfp.score_total, rfp.score_count
+
+    await session.refresh(rfp)
+    # The latest evaluation of each response counts: 4 and 3.
+    assert summary(rfp) == (3, 2, 7, 2)
+    await rfps.recount_summary(session, rfp.rfp_id)
+    await session.refresh(rfp)
+    assert summary(rfp) == (3, 2, 7, 2)
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.services.scheduler import FairScheduler
+
+pytestmark = pytest.mark.anyio
+
+
+async def _run_all(scheduler, jobs):
+    """
+    Runs (rfp_id, priority) tasks that each yield once, and returns the
+    order in which they started.
+    """
+    order = []
+
+    async def task(rfp_id):
+        order.append(rfp_id)
+        await asyncio.sleep(0)
+
+    await asyncio.gather(
+        *(scheduler.run(rfp_id, task(rfp_id), priority) for rfp_id, priority in jobs)
+    )
+    return order
+
+
+async def test_capacity_bounds_running_tasks():
+    scheduler = FairScheduler(2)
+    running, peak = 0, 0
+
+    async def task():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*(scheduler.run(1, task()) for _ in range(6)))
+    assert peak == 2
+    assert scheduler.stats()["running"] == 0 and scheduler.stats()["rfps"] == {}
+
+
+async def test_waiting_rfps_take_turns():
+    scheduler = FairScheduler(1)
+    # A big RFP submits everything first; the small one is not queued behind it.
+    order = await _run_all(scheduler, [(1, 0)] * 6 + [(2, 0)] * 2)
+    assert order[:5] == [1, 1, 2, 1, 2]
+
+
+async def test_priority_gets_a_larger_share():
+    scheduler = FairScheduler(1)
+    order = await _run_all(scheduler, [(1, 0)] * 8 + [(2, 2)] * 8)
+    # Priority 2 weighs three times priority 0 while both are waiting.
+    assert order[1:9].count(2) == 6
+
+
+async def test_cancelled_waiter_gives_up_its_place():
+    scheduler = FairScheduler(1)
+    release = asyncio.Event()
+    started = []
+
+    async def task(name):
+        started.append(name)
+        await release.wait()
+
+    first = asyncio.create_task(scheduler.run(1, task("first")))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(scheduler.run(2, task("cancelled")))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert 2 not in scheduler.stats()["rfps"]
+
+    release.set()
+    await first
+    await scheduler.run(3, task("next"))
+    assert started == ["first", "next"]
@@ -0,0 +1,65 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from app.knowledge.embeddings import HashingEmbedder
+from app.knowledge.files import replace_atomically
+from app.knowledge.vector_index import VectorIndex
+
+WORDS = "cloud data security backup region audit encryption network sso iso".split()
+
+
+@pytest.fixture
+def texts():
+    rng = random.Random(3)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(3, 20))) for _ in range(100)]
+
+
+def test_build_is_reopened_from_disk(tmp_path, texts):
+    embedder = HashingEmbedder(64)
+    built = VectorIndex.build(str(tmp_path), embedder, texts, "v1", batch_size=7)
+    opened = VectorIndex.open(str(tmp_path))
+    assert (opened.embedder_name, opened.fingerprint) == (embedder.name, "v1")
+    np.testing.assert_allclose(np.asarray(opened.matrix), embedder.embed(texts), rtol=1e-5)
+    assert len(built) == len(texts)
+    # Nothing but the index itself is left behind.
+    assert sorted(os.listdir(tmp_path)) == ["vectors.json", "vectors.npy"]
+
+
+def test_search_many_matches_search(tmp_path, texts):
+    embedder = HashingEmbedder(64)
+    index = VectorIndex.build(str(tmp_path), embedder, texts, "v1")
+    queries = embedder.embed(["cloud backup", "sso audit", "iso region network"])
+    for query, hits in zip(queries, index.search_many(queries, 5, block_size=2)):
+        expected = index.search(query, 5)
+        assert [chunk_id for chunk_id, _ in hits] == [chunk_id for chunk_id, _ in expected]
+
+
+def test_open_without_index_is_none(tmp_path):
+    assert VectorIndex.open(str(tmp_path)) is None
+
+
+def test_concurrent_writers_use_their_own_temp_files(tmp_path):
+    path = str(tmp_path / "index.json")
+    with replace_atomically(path) as first, replace_atomically(path) as second:
+        assert first != second
+        for tmp, content in ((first, "first"), (second, "second")):
+            with open(tmp, "w") as f:
+                f.write(content)
+    with open(path) as f:
+        assert f.read() == "first"
+    assert os.listdir(tmp_path) == ["index.json"]
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "index.json"
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with replace_atomically(str(path)) as tmp:
+            with open(tmp, "w") as f:
+                f.write("partial")
+            raise RuntimeError("interrupted")
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["index.json"]
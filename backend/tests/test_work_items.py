@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.crud import questions, work_items
+from app.models import WorkStatus
+from app.services.work_queue import WorkQueueWorker
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def queued(session, job):
+    question_ids = [
+        q.question_id for q in await questions.get_questions_by_rfp(session, job.rfp_id)
+    ]
+    await work_items.create_work_items(
+        session, job.job_id, job.rfp_id, question_ids, job.mode
+    )
+    return job
+
+
+async def test_claim_leases_each_item_once(session, queued):
+    first = await work_items.claim_work_items(session, "a", 2, 60, 3)
+    second = await work_items.claim_work_items(session, "b", 10, 60, 3)
+    assert len(first) == 2 and len(second) == 1
+    assert {i.item_id for i in first}.isdisjoint(i.item_id for i in second)
+    assert await work_items.claim_work_items(session, "c", 10, 60, 3) == []
+
+
+async def test_expired_lease_is_claimed_again(session, queued):
+    # Worker "a" stopped heartbeating: its lease is already over.
+    lost = await work_items.claim_work_items(session, "a", 10, -1, 3)
+    reclaimed = await work_items.claim_work_items(session, "b", 10, 60, 3)
+    assert {i.item_id for i in reclaimed} == {i.item_id for i in lost}
+    assert all(i.attempts == 2 and i.lease_owner == "b" for i in reclaimed)
+    # "a" can no longer renew or release what "b" holds.
+    lost_ids = [i.item_id for i in lost]
+    assert await work_items.renew_leases(session, "a", lost_ids, 60) == 0
+
+
+async def test_expired_lease_after_max_attempts_fails(session, queued):
+    await work_items.claim_work_items(session, "a", 10, -1, 2)
+    await work_items.claim_work_items(session, "b", 10, -1, 2)
+    assert await work_items.claim_work_items(session, "c", 10, 60, 2) == []
+
+    expired = await work_items.fail_expired_work_items(session, 2)
+    assert len(expired) == 3
+    assert {job_id for _, job_id, _, _ in expired} == {queued.job_id}
+    counts = await work_items.count_work_items(session, queued.job_id)
+    assert counts[WorkStatus.FAILED] == 3
+    assert await work_items.fail_expired_work_items(session, 2) == []
+
+
+async def test_live_lease_is_not_failed(session, queued):
+    await work_items.claim_work_items(session, "a", 10, 60, 1)
+    assert await work_items.fail_expired_work_items(session, 1) == []
+
+
+async def test_failed_attempt_returns_to_pending_until_max_attempts(session, queued):
+    (item,) = await work_items.claim_work_items(session, "a", 1, 60, 2)
+    await work_items.finish_work_item(session, item.item_id, "a", "boom", 2)
+    (again,) = await work_items.claim_work_items(session, "b", 1, 60, 2)
+    assert again.item_id == item.item_id
+    await work_items.finish_work_item(session, item.item_id, "b", "boom", 2)
+    counts = await work_items.count_work_items(session, queued.job_id)
+    assert counts[WorkStatus.FAILED] == 1
+
+
+async def test_worker_reaps_expired_items_on_its_own_interval(session_factory):
+    worker = WorkQueueWorker(SimpleNamespace(), poll_s=0.01, reap_s=60)
+    reaps = []
+
+    async def fail_expired():
+        reaps.append(True)
+
+    worker._fail_expired = fail_expired
+    run = asyncio.create_task(worker.run())
+    await asyncio.sleep(0.2)
+    worker.stop()
+    await run
+    # About twenty polls, one reap.
+    assert reaps == [True]
@@ -25,6 +25,12 @@ const FileList: React.FC<FileListProps> = ({ uploadedFiles, fileProcessingStatus
                                 <div className={styles.container}>
                                     <span className={styles.id}>ID: {file.rfp_id}</span>
                                     <span className={styles.filename}>{file.filename}</span>
+                                    {file.question_count > 0 && (
+                                        <span className={styles.summary}>
+                                            {file.answered_count}/{file.question_count} answered
+                                            {file.average_score !== null && `, avg score ${file.average_score}`}
+                                        </span>
+                                    )}
                                 </div>
                                 <ButtonArray file={file} fileProcessingStatus={fileProcessingStatus} handleFileDownload={handleFileDownload} handleReviseFile={handleReviseFile} generateAnswers={generateAnswers} handleDownloadPPT={handleDownloadPPT} handleGeneratePPT={handleGeneratePPT} />
                             </li>
@@ -42,7 +42,7 @@ const useFileManagement = (): UseFileUploadReturn => {
 
     const refreshFiles = useCallback(async () => {
         try {
-            const fetchedFiles = await getUploadedFiles();
+            const { items: fetchedFiles } = await getUploadedFiles();
             setUploadedFiles(fetchedFiles);
             console.log("FETCH: Files fetched:", fetchedFiles)
 
@@ -1,6 +1,6 @@
 import axios from 'axios';
 import { API_BASE_URL } from '../config/constants'
-import type { fileStatus } from '@/types/types';
+import type { fileListPage, fileListParams } from '@/types/types';
 
 interface UploadResponse {
     message: string
@@ -18,8 +18,8 @@ export const uploadFile = async (file: File): Promise<UploadResponse> => {
     return response.data;
 };
 
-export const getUploadedFiles = async (): Promise<fileStatus[]> => {
-    const response = await axios.get(`${API_BASE_URL}/files`);
+export const getUploadedFiles = async (params: fileListParams = {}): Promise<fileListPage> => {
+    const response = await axios.get(`${API_BASE_URL}/files`, { params });
     console.log(response.data)
     return response.data;
 };
@@ -71,16 +71,80 @@ export const generatePPT = async (rfpId: number) => {
     return response;
 }
 
-export const generateAnswers = async (rfpId: number) => {
+export interface GenerationJob {
+    job_id: number
+    priority: number
+    status: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled'
+    processed_questions: number
+    total_questions: number | null
+    error: string | null
+}
+
+export const getJob = async (jobId: number): Promise<GenerationJob> => {
+    const response = await axios.get(`${API_BASE_URL}/jobs/${jobId}`);
+    return response.data;
+}
+
+export const cancelGeneration = async (rfpId: number) => {
+    console.log("GENERATE: Cancelling generation for file: ", rfpId)
+    const response = await axios.post(`${API_BASE_URL}/files/generate/${rfpId}/cancel`);
+    console.log("GENERATE: Cancelled jobs: ", response.data.job_ids);
+    return response.data;
+}
+
+export interface GenerationProgress {
+    event: string
+    rfp_id: number
+    question_id: number | null
+    status: string
+    total: number
+    completed: number
+    failed: number
+    throughput_qps: number
+    eta_s: number | null
+    error: string | null
+}
+
+export const generateAnswers = async (
+    rfpId: number,
+    onProgress?: (progress: GenerationProgress) => void,
+    priority: number = 0,
+): Promise<GenerationProgress> => {
     console.log("GENERATE: Generating answers for file: ", rfpId)
     const generateURL = `${API_BASE_URL}/files/generate/${rfpId}`;
 
     const response = await axios.post(generateURL, null, {
+        params: { priority },
         headers: {
             'Content-type': 'application/json',
         },
     });
-    console.log("GENERATE: Successfully generated file: ", rfpId);
+    console.log("GENERATE: Queued job: ", response.data.job_id);
 
-    return response;
+    // The stream opens with a snapshot of the run, so nothing queued before
+    // subscribing is missed; a run that already ended closes it at once.
+    const events = new EventSource(`${generateURL}/events`);
+    const done = new Promise<GenerationProgress>((resolve, reject) => {
+        const handle = (message: MessageEvent) => {
+            const progress: GenerationProgress = JSON.parse(message.data);
+            onProgress?.(progress);
+            if (progress.status === 'finished') {
+                events.close();
+                resolve(progress);
+            } else if (progress.status === 'failed') {
+                events.close();
+                reject(new Error(progress.error ?? `Generation failed for RFP ${rfpId}`));
+            }
+        };
+        for (const name of [
+            'snapshot', 'started', 'retrieved', 'contextualized', 'persisted',
+            'question_failed', 'progress', 'finished', 'failed',
+        ]) {
+            events.addEventListener(name, handle as EventListener);
+        }
+    });
+
+    const result = await done;
+    console.log("GENERATE: Successfully generated file: ", rfpId);
+    return result;
 }
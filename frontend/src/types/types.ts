@@ -2,7 +2,23 @@ export interface fileStatus {
     rfp_id: number,
     filename: string,
     uploaded_at: string,
-    status: string
+    status: string,
+    question_count: number,
+    answered_count: number,
+    average_score: number | null
+}
+
+export interface fileListPage {
+    items: fileStatus[],
+    next_cursor: number | null
+}
+
+export interface fileListParams {
+    cursor?: number,
+    limit?: number,
+    status?: string,
+    uploaded_after?: string,
+    uploaded_before?: string
 }
 
 export type FileProcessingState = 'idle' | 'generating_spreadsheet' | 'revising_file' | 'generating_ppt';